@@ -0,0 +1,3 @@
+"""
+技术分析模块
+"""
@@ -0,0 +1,68 @@
+"""
+单次页面运行的分析上下文
+
+页面每次运行为当前的 (股票代码, 日期范围, 市场类型) 创建一个 AnalysisContext，
+各标签页、深度分析、主力行为分析和盘中面板都从这里读取K线和技术指标：
+K线只获取一次，技术指标只计算一次，首次读取时才执行。
+"""
+from functools import cached_property
+
+import pandas as pd
+
+
+class AnalysisContext:
+    """
+    分析上下文类，按需加载K线、计算技术指标并缓存结果
+    """
+    def __init__(self, symbol, start, end, market_type, load, compute):
+        """
+        初始化分析上下文
+
+        Args:
+            symbol (str): 股票代码
+            start (datetime): 开始日期
+            end (datetime): 结束日期
+            market_type (str): 市场类型
+            load (function): K线获取函数 load(symbol, start, end, market_type)，失败时返回None
+            compute (function): 技术指标计算函数 compute(df)，失败时返回None
+        """
+        self.symbol = symbol
+        self.start = start
+        self.end = end
+        self.market_type = market_type
+        self._load = load
+        self._compute = compute
+
+    @property
+    def key(self):
+        """
+        上下文对应的 (股票代码, 市场类型, 开始日期, 结束日期)
+        """
+        return (self.symbol, self.market_type, self.start, self.end)
+
+    @cached_property
+    def bars(self):
+        """
+        日期范围内的K线
+
+        Returns:
+            pd.DataFrame: K线，列为 date, Open, High, Low, Close, Volume, Amount, Turn，获取失败时为None
+        """
+        df = self._load(self.symbol, self.start, self.end, self.market_type)
+        if df is None:
+            return None
+        # 确保数据按照选择的日期范围进行筛选
+        mask = (df['date'] >= pd.Timestamp(self.start)) & (df['date'] <= pd.Timestamp(self.end))
+        return df[mask].reset_index(drop=True)
+
+    @cached_property
+    def indicators(self):
+        """
+        添加全部技术指标后的K线，各标签页共用，读取方不应修改已有列
+
+        Returns:
+            pd.DataFrame: K线及技术指标，K线获取失败或数据不足时为None
+        """
+        if self.bars is None or self.bars.empty:
+            return None
+        return self._compute(self.bars.copy())
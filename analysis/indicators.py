@@ -0,0 +1,263 @@
+"""
+技术指标注册表
+
+每个指标声明它依赖的列（行情字段或其他指标），调用方只请求需要的列，
+注册表按依赖关系计算所需的最少指标，共用的中间结果（滚动均值、TR、典型价格等）只算一次。
+以下划线开头的指标为中间结果，默认不写回DataFrame。
+"""
+import numpy as np
+import pandas as pd
+
+
+class IndicatorRegistry:
+    """
+    指标注册表类
+    """
+    def __init__(self):
+        # 输出列 -> (计算函数, 依赖列, 全部输出列)
+        self._specs = {}
+
+    def register(self, *outputs, deps=()):
+        """
+        注册指标计算函数的装饰器
+
+        计算函数按deps的顺序接收依赖列（pd.Series），只有一个输出列时返回Series，
+        有多个输出列时返回 {输出列: Series}。
+
+        Args:
+            *outputs (str): 计算函数产出的列
+            deps (tuple): 依赖的列
+
+        Returns:
+            function: 装饰器
+        """
+        def decorator(func):
+            spec = (func, tuple(deps), outputs)
+            for name in outputs:
+                self._specs[name] = spec
+            return func
+        return decorator
+
+    def __contains__(self, name):
+        return name in self._specs
+
+    def names(self):
+        """
+        获取全部对外的指标列（不含中间结果）
+
+        Returns:
+            list: 指标列名，按注册顺序
+        """
+        return [name for name in self._specs if not name.startswith('_')]
+
+    def resolve(self, names, available=()):
+        """
+        按依赖关系确定计算顺序
+
+        Args:
+            names (iterable): 请求的指标列
+            available (iterable): 已有的列，不需要计算
+
+        Returns:
+            list: 需要依次执行的 (计算函数, 依赖列, 输出列)
+        """
+        available = set(available)
+        plan, visiting = [], set()
+
+        def visit(name):
+            if name in available or name not in self._specs:
+                return
+            spec = self._specs[name]
+            if spec in visiting:
+                raise ValueError(f"指标依赖存在循环: {name}")
+            visiting.add(spec)
+            for dep in spec[1]:
+                visit(dep)
+            visiting.discard(spec)
+            if spec not in plan:
+                plan.append(spec)
+            available.update(spec[2])
+
+        for name in names:
+            visit(name)
+        return plan
+
+    def compute(self, df, names=None):
+        """
+        计算请求的指标并写入DataFrame
+
+        Args:
+            df (pd.DataFrame): 行情数据
+            names (iterable): 需要的指标列，None表示全部对外指标
+
+        Returns:
+            pd.DataFrame: 添加了请求指标的数据
+        """
+        names = self.names() if names is None else list(names)
+        values = {}
+        for func, deps, outputs in self.resolve(names, available=df.columns):
+            args = [values[dep] if dep in values else df[dep] for dep in deps]
+            result = func(*args)
+            if len(outputs) == 1:
+                result = {outputs[0]: result}
+            values.update(result)
+
+        for name in names:
+            if name in values:
+                df[name] = values[name]
+            elif name not in df.columns:
+                raise KeyError(f"未知的指标: {name}")
+        return df
+
+
+# 行情分析界面使用的指标（与calculate_indicators的列名一致）
+INDICATORS = IndicatorRegistry()
+
+
+def _register_period(period):
+    """
+    注册指定周期的收盘价滚动均值，均线和乖离率共用
+    """
+    mean = f'_MEAN{period}'
+    INDICATORS.register(mean, deps=('Close',))(lambda close: close.rolling(window=period).mean())
+    if period in (5, 10, 20, 30, 60):
+        INDICATORS.register(f'MA{period}', deps=(mean,))(lambda value: value)
+
+
+for _period in (5, 10, 20, 30, 60, 6, 12, 24):
+    _register_period(_period)
+
+
+@INDICATORS.register('_DELTA', deps=('Close',))
+def _delta(close):
+    return close.diff()
+
+
+@INDICATORS.register('_TP', deps=('High', 'Low', 'Close'))
+def _typical_price(high, low, close):
+    return (high + low + close) / 3
+
+
+# MACD
+@INDICATORS.register('MACD', 'Signal', 'Histogram', deps=('Close',))
+def _macd(close):
+    exp1 = close.ewm(span=12, adjust=False).mean()
+    exp2 = close.ewm(span=26, adjust=False).mean()
+    macd = exp1 - exp2
+    signal = macd.ewm(span=9, adjust=False).mean()
+    return {'MACD': macd, 'Signal': signal, 'Histogram': macd - signal}
+
+
+# RSI
+@INDICATORS.register('RSI', deps=('_DELTA',))
+def _rsi(delta):
+    gain = delta.where(delta > 0, 0)
+    loss = -delta.where(delta < 0, 0)
+    avg_gain = gain.rolling(window=14).mean()
+    avg_loss = loss.rolling(window=14).mean()
+    rs = avg_gain / avg_loss
+    return 100 - (100 / (1 + rs))
+
+
+# KDJ
+@INDICATORS.register('K', 'D', 'J', deps=('High', 'Low', 'Close'))
+def _kdj(high, low, close):
+    low_min = low.rolling(window=9).min()
+    high_max = high.rolling(window=9).max()
+    k = 100 * ((close - low_min) / (high_max - low_min))
+    d = k.rolling(window=3).mean()
+    return {'K': k, 'D': d, 'J': 3 * k - 2 * d}
+
+
+# 布林带
+@INDICATORS.register('BB_Middle', 'BB_Upper', 'BB_Lower', deps=('Close', '_MEAN20'))
+def _bbands(close, middle):
+    std = close.rolling(window=20).std()
+    return {'BB_Middle': middle, 'BB_Upper': middle + 2 * std, 'BB_Lower': middle - 2 * std}
+
+
+# OBV (On-Balance Volume)
+@INDICATORS.register('OBV', deps=('_DELTA', 'Volume'))
+def _obv(delta, volume):
+    return (np.sign(delta) * volume).fillna(0).cumsum()
+
+
+# CCI (Commodity Channel Index)
+@INDICATORS.register('CCI', deps=('_TP',))
+def _cci(typical_price):
+    deviation = typical_price - typical_price.rolling(window=20).mean()
+    mean_deviation = deviation.abs().rolling(window=20).mean()
+    return deviation / (0.015 * mean_deviation)
+
+
+# Williams %R
+@INDICATORS.register('Williams_R', deps=('High', 'Low', 'Close'))
+def _williams_r(high, low, close):
+    highest_high = high.rolling(window=14).max()
+    lowest_low = low.rolling(window=14).min()
+    return -100 * (highest_high - close) / (highest_high - lowest_low)
+
+
+# DMI (Directional Movement Index)
+@INDICATORS.register('TR', deps=('High', 'Low', 'Close'))
+def _tr(high, low, close):
+    prev_close = close.shift(1)
+    return np.maximum(high - low, np.maximum(abs(high - prev_close), abs(low - prev_close)))
+
+
+@INDICATORS.register('ATR', deps=('TR',))
+def _atr(tr):
+    return tr.rolling(window=14).mean()
+
+
+@INDICATORS.register('DM+', 'DM-', deps=('High', 'Low'))
+def _dm(high, low):
+    up_move = high - high.shift(1)
+    down_move = low.shift(1) - low
+    return {
+        'DM+': pd.Series(np.where(up_move > down_move, np.maximum(up_move, 0), 0), index=high.index),
+        'DM-': pd.Series(np.where(down_move > up_move, np.maximum(down_move, 0), 0), index=high.index)
+    }
+
+
+@INDICATORS.register('DI+', 'DI-', deps=('DM+', 'DM-', 'ATR'))
+def _di(dm_plus, dm_minus, atr):
+    return {
+        'DI+': 100 * (dm_plus.rolling(window=14).mean() / atr),
+        'DI-': 100 * (dm_minus.rolling(window=14).mean() / atr)
+    }
+
+
+@INDICATORS.register('DX', deps=('DI+', 'DI-'))
+def _dx(di_plus, di_minus):
+    return 100 * abs(di_plus - di_minus) / (di_plus + di_minus)
+
+
+@INDICATORS.register('ADX', deps=('DX',))
+def _adx(dx):
+    return dx.rolling(window=14).mean()
+
+
+# BIAS (Bias Ratio)
+def _register_bias(period):
+    """
+    注册指定周期的乖离率
+    """
+    INDICATORS.register(f'BIAS{period}', deps=('Close', f'_MEAN{period}'))(
+        lambda close, mean: (close - mean) / mean * 100
+    )
+
+
+for _period in (6, 12, 24):
+    _register_bias(_period)
+
+
+# 支撑位和阻力位：过去20天的最低价和最高价
+@INDICATORS.register('Support', deps=('Low',))
+def _support(low):
+    return low.rolling(window=20).min()
+
+
+@INDICATORS.register('Resistance', deps=('High',))
+def _resistance(high):
+    return high.rolling(window=20).max()
@@ -0,0 +1,470 @@
+"""
+盘中分时分析
+
+按交易时段把时间换算为开盘后的第几分钟（午休不计），分钟K线以结束时间对齐到周期边界。
+IntradaySession 用定长环形缓冲保存当日的分钟K线，每加入一根K线只做增量更新：
+分时均价（VWAP）、成交量分布（按价格分档）、按K线序号的累计成交量，
+盘中分析使用整个交易时段的数据，不需要重新下载当日全部K线。
+VolumeCurve 是由历史若干个交易日的分钟K线平均得到的累计成交量曲线，按开盘后的分钟数
+O(1) 查出同一时刻的预期累计成交量，用于计算按时段校正的相对成交量。
+"""
+import math
+from collections import deque, namedtuple
+
+import numpy as np
+import pandas as pd
+
+# 各市场交易时段（北京时间）：[(开始时, 开始分), (结束时, 结束分)]
+TRADING_SESSIONS = {
+    'A股': [((9, 30), (11, 30)), ((13, 0), (15, 0))],
+    '港股': [((9, 30), (12, 0)), ((13, 0), (16, 0))]
+}
+
+# 由行情合成的K线累计成交量不低于行情当日累计成交量的该比例时，视为包含全天成交量
+COMPLETE_VOLUME_RATIO = 0.99
+
+MinuteBar = namedtuple('MinuteBar', ['time', 'open', 'high', 'low', 'close', 'volume', 'amount'])
+
+MINUTE_COLUMNS = list(MinuteBar._fields)
+
+
+def _sessions(market_type):
+    """
+    获取交易时段，以当日零点起的分钟数表示
+    """
+    return [(start_h * 60 + start_m, end_h * 60 + end_m)
+            for (start_h, start_m), (end_h, end_m) in TRADING_SESSIONS[market_type]]
+
+
+def session_length(market_type='A股'):
+    """
+    获取一个交易日的交易分钟数
+
+    Args:
+        market_type (str): 市场类型
+
+    Returns:
+        int: 交易分钟数，如A股为240
+    """
+    return sum(end - start for start, end in _sessions(market_type))
+
+
+def session_minute(timestamp, market_type='A股'):
+    """
+    将时间换算为开盘后已经过的交易分钟数，午休不计
+
+    Args:
+        timestamp: 时间
+        market_type (str): 市场类型
+
+    Returns:
+        float: 0到session_length之间的分钟数，开盘前为0，收盘后为session_length
+    """
+    timestamp = pd.Timestamp(timestamp)
+    clock = timestamp.hour * 60 + timestamp.minute + timestamp.second / 60
+    elapsed = 0
+    for start, end in _sessions(market_type):
+        if clock <= start:
+            return elapsed
+        if clock < end:
+            return elapsed + clock - start
+        elapsed += end - start
+    return elapsed
+
+
+def minute_to_time(day, minute, market_type='A股'):
+    """
+    将开盘后的交易分钟数换算为时间，时段结束时刻归到该时段
+
+    Args:
+        day: 交易日
+        minute (float): 开盘后的交易分钟数
+        market_type (str): 市场类型
+
+    Returns:
+        pd.Timestamp: 时间
+    """
+    day = pd.Timestamp(day).normalize()
+    remaining = minute
+    sessions = _sessions(market_type)
+    for start, end in sessions:
+        if remaining <= end - start:
+            return day + pd.Timedelta(minutes=start + remaining)
+        remaining -= end - start
+    return day + pd.Timedelta(minutes=sessions[-1][1])
+
+
+def bar_slot(timestamp, freq, market_type='A股'):
+    """
+    获取时间所在的K线序号（从1开始，第n根K线覆盖开盘后 (n-1)*freq 到 n*freq 分钟）
+
+    Args:
+        timestamp: 时间
+        freq (int): K线周期（分钟）
+        market_type (str): 市场类型
+
+    Returns:
+        int: K线序号
+    """
+    return max(1, math.ceil(session_minute(timestamp, market_type) / freq))
+
+
+def bar_end(timestamp, freq, market_type='A股'):
+    """
+    获取时间所在K线的结束时间（与数据源分钟K线的时间戳一致）
+
+    Args:
+        timestamp: 时间
+        freq (int): K线周期（分钟）
+        market_type (str): 市场类型
+
+    Returns:
+        pd.Timestamp: K线结束时间
+    """
+    return minute_to_time(timestamp, bar_slot(timestamp, freq, market_type) * freq, market_type)
+
+
+def price_step(price):
+    """
+    根据价格选择成交量分布的价格分档宽度，约为价格的千分之一到千分之十
+
+    Args:
+        price (float): 参考价格
+
+    Returns:
+        float: 分档宽度
+    """
+    if not price or price <= 0 or price != price:
+        return 0.01
+    return max(0.01, 10 ** math.floor(math.log10(price * 0.002)))
+
+
+class IntradaySession:
+    """
+    单只股票一个交易日的分钟K线及增量分时统计
+    """
+    def __init__(self, symbol, day, market_type='A股', freq=5, step=None):
+        """
+        初始化分时会话
+
+        Args:
+            symbol (str): 股票代码
+            day: 交易日
+            market_type (str): 市场类型
+            freq (int): K线周期（分钟）
+            step (float): 成交量分布的价格分档宽度，默认按第一根K线的价格选择
+        """
+        self.symbol = symbol
+        self.day = pd.Timestamp(day).normalize()
+        self.market_type = market_type
+        self.freq = freq
+        self.step = step
+        self.slots = math.ceil(session_length(market_type) / freq)
+        # 环形缓冲：最多保存一个交易日的K线
+        self.bars = deque(maxlen=self.slots)
+        self.cum_volume = 0.0
+        self.cum_amount = 0.0
+        self.persisted = False
+        # 成交额：有成交额的K线用成交额，否则用典型价格乘成交量估算
+        self._cum_value = 0.0
+        # 按K线序号的成交量（序号从1开始，下标0不用）
+        self._slot_volume = np.zeros(self.slots + 1)
+        # 成交量分布 {价格档: 成交量}
+        self._profile = {}
+        # 上一条行情的累计成交量和成交额，用于由行情增量合成K线
+        self._last_quote = None
+
+    def _bar_value(self, bar):
+        """
+        K线的成交额，缺失时用典型价格估算
+        """
+        if bar.amount and bar.amount > 0:
+            return bar.amount
+        return (bar.high + bar.low + bar.close) / 3 * bar.volume
+
+    def _apply(self, bar, sign):
+        """
+        将一根K线的贡献加入（sign=1）或移出（sign=-1）各项统计
+        """
+        volume = sign * (bar.volume or 0)
+        self.cum_volume += volume
+        self.cum_amount += sign * (bar.amount or 0)
+        self._cum_value += sign * self._bar_value(bar)
+        slot = bar_slot(bar.time, self.freq, self.market_type)
+        if slot <= self.slots:
+            self._slot_volume[slot] += volume
+        if self.step is None:
+            self.step = price_step(bar.close)
+        level = round(round(((bar.high + bar.low + bar.close) / 3) / self.step) * self.step, 6)
+        self._profile[level] = self._profile.get(level, 0.0) + volume
+        if self._profile[level] <= 1e-9:
+            del self._profile[level]
+
+    def add_bar(self, time, open, high, low, close, volume, amount=0.0):
+        """
+        加入一根K线；与最后一根K线时间相同时视为同一根未走完K线的更新，早于最后一根的K线忽略
+
+        Args:
+            time: K线结束时间
+            open (float): 开盘价
+            high (float): 最高价
+            low (float): 最低价
+            close (float): 收盘价
+            volume (float): 成交量（股）
+            amount (float): 成交额（元）
+
+        Returns:
+            bool: 是否加入或更新了K线
+        """
+        bar = MinuteBar(pd.Timestamp(time), float(open), float(high), float(low), float(close),
+                        float(volume or 0), float(amount or 0))
+        if bar.time.normalize() != self.day:
+            return False
+        if self.bars and bar.time < self.bars[-1].time:
+            return False
+        if self.bars and bar.time == self.bars[-1].time:
+            self._apply(self.bars.pop(), -1)
+        self.bars.append(bar)
+        self._apply(bar, 1)
+        return True
+
+    def add_frame(self, df):
+        """
+        批量加入K线（如开盘后首次查看时下载的当日K线），已有的K线不重复加入
+
+        Args:
+            df (pd.DataFrame): 列为 time, open, high, low, close, volume, amount
+
+        Returns:
+            int: 加入或更新的K线数量
+        """
+        if df is None or df.empty:
+            return 0
+        added = 0
+        for row in df[MINUTE_COLUMNS].itertuples(index=False):
+            added += self.add_bar(*row)
+        return added
+
+    def update_from_quote(self, quote):
+        """
+        用实时行情合成当前K线：价格更新最高、最低、收盘价，成交量为与上一条行情的累计成交量之差
+
+        Args:
+            quote (dict): 实时行情，需包含 time, price, volume（当日累计，股）, amount（当日累计，元），
+                单位需与K线一致
+
+        Returns:
+            bool: 是否更新了K线
+        """
+        if not quote or not quote.get('time') or not quote.get('price'):
+            return False
+        timestamp = pd.Timestamp(quote['time'])
+        price = float(quote['price'])
+        volume, amount = float(quote.get('volume') or 0), float(quote.get('amount') or 0)
+        last_quote, self._last_quote = self._last_quote, (timestamp, volume, amount)
+        # 第一条行情只作为累计成交量的基准
+        if last_quote is None or timestamp <= last_quote[0]:
+            return False
+        delta_volume = max(0.0, volume - last_quote[1])
+        delta_amount = max(0.0, amount - last_quote[2])
+
+        end = bar_end(timestamp, self.freq, self.market_type)
+        if self.bars and self.bars[-1].time == end:
+            bar = self.bars[-1]
+            return self.add_bar(end, bar.open, max(bar.high, price), min(bar.low, price), price,
+                                bar.volume + delta_volume, bar.amount + delta_amount)
+        return self.add_bar(end, price, price, price, price, delta_volume, delta_amount)
+
+    @property
+    def vwap(self):
+        """
+        分时均价：当日累计成交额 / 累计成交量
+        """
+        return self._cum_value / self.cum_volume if self.cum_volume > 0 else float('nan')
+
+    @property
+    def complete(self):
+        """
+        会话K线是否包含当日全部成交量：没有行情时K线全部来自数据源；
+        有行情时K线的累计成交量需与行情的当日累计成交量一致，盘中才开始的会话缺少开始前的成交量
+        """
+        if not self.bars:
+            return False
+        if self._last_quote is None:
+            return True
+        return self.cum_volume >= self._last_quote[1] * COMPLETE_VOLUME_RATIO
+
+    @property
+    def last(self):
+        """
+        最后一根K线
+        """
+        return self.bars[-1] if self.bars else None
+
+    def volume_profile(self):
+        """
+        当日成交量分布
+
+        Returns:
+            pd.Series: 索引为价格档，值为成交量，按价格升序
+        """
+        return pd.Series(self._profile, dtype=float).sort_index()
+
+    def point_of_control(self):
+        """
+        成交量最大的价格档
+
+        Returns:
+            float: 价格，没有成交时为NaN
+        """
+        if not self._profile:
+            return float('nan')
+        return max(self._profile.items(), key=lambda item: item[1])[0]
+
+    def cumulative_volume(self):
+        """
+        按K线序号的累计成交量
+
+        Returns:
+            np.ndarray: 长度为K线数量，第i个元素为前i+1根K线的累计成交量
+        """
+        return np.cumsum(self._slot_volume[1:])
+
+    def relative_volume(self, curve=None, quote=None):
+        """
+        相对成交量：当日累计成交量与同一时刻的预期累计成交量之比
+
+        会话在盘中才开始时，K线只包含开始之后由行情增量合成的成交量，
+        此时以行情的当日累计成交量为准（取两者中较大的一个）。
+
+        Args:
+            curve (VolumeCurve): 历史累计成交量曲线，没有时返回NaN
+            quote (dict): 最新实时行情，默认为最近一条计入会话的行情
+
+        Returns:
+            float: 相对成交量
+        """
+        if curve is None:
+            return float('nan')
+        volume, timestamp = self.cum_volume, self.bars[-1].time if self.bars else None
+        if quote and quote.get('time') and quote.get('volume'):
+            latest = (pd.Timestamp(quote['time']), float(quote['volume']))
+        elif self._last_quote:
+            latest = self._last_quote[:2]
+        else:
+            latest = None
+        if latest is not None and (timestamp is None or latest[1] > volume):
+            timestamp, volume = latest
+        if timestamp is None:
+            return float('nan')
+        return curve.relative_volume(volume, timestamp)
+
+    def summary(self):
+        """
+        当日分时汇总
+
+        Returns:
+            dict: open, high, low, price, volume, amount, vwap, poc, time
+        """
+        if not self.bars:
+            return {}
+        bars = list(self.bars)
+        return {
+            'open': bars[0].open,
+            'high': max(bar.high for bar in bars),
+            'low': min(bar.low for bar in bars),
+            'price': bars[-1].close,
+            'volume': self.cum_volume,
+            'amount': self.cum_amount,
+            'vwap': self.vwap,
+            'poc': self.point_of_control(),
+            'time': bars[-1].time.strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+    def to_frame(self):
+        """
+        当日全部K线
+
+        Returns:
+            pd.DataFrame: 列为 time, open, high, low, close, volume, amount
+        """
+        return pd.DataFrame(list(self.bars), columns=MINUTE_COLUMNS)
+
+
+class VolumeCurve:
+    """
+    按开盘后分钟数索引的预期累计成交量曲线
+    """
+    def __init__(self, cumulative, freq=5, market_type='A股', days=0):
+        """
+        初始化成交量曲线
+
+        Args:
+            cumulative (np.ndarray): 按K线序号的预期累计成交量，第i个元素为前i+1根K线的累计成交量
+            freq (int): K线周期（分钟）
+            market_type (str): 市场类型
+            days (int): 参与平均的交易日数
+        """
+        self.cumulative = np.asarray(cumulative, dtype=float)
+        self.freq = freq
+        self.market_type = market_type
+        self.days = days
+
+    @classmethod
+    def from_frames(cls, frames, freq=5, market_type='A股'):
+        """
+        由历史若干个交易日的分钟K线计算平均累计成交量曲线
+
+        Args:
+            frames (list): 每个交易日一个DataFrame，列包含 time, volume
+            freq (int): K线周期（分钟）
+            market_type (str): 市场类型
+
+        Returns:
+            VolumeCurve: 成交量曲线，没有有效数据时返回None
+        """
+        slots = math.ceil(session_length(market_type) / freq)
+        curves = []
+        for df in frames:
+            if df is None or df.empty:
+                continue
+            index = [min(bar_slot(t, freq, market_type), slots) for t in df['time']]
+            volume = pd.to_numeric(df['volume'], errors='coerce').fillna(0).to_numpy()
+            per_slot = np.bincount(index, weights=volume, minlength=slots + 1)[1:]
+            # 成交量为0的交易日（停牌）不参与平均
+            if per_slot.sum() > 0:
+                curves.append(np.cumsum(per_slot))
+        if not curves:
+            return None
+        return cls(np.mean(curves, axis=0), freq, market_type, len(curves))
+
+    def expected(self, minute):
+        """
+        开盘后第minute分钟的预期累计成交量，K线之间线性插值
+
+        Args:
+            minute (float): 开盘后的交易分钟数
+
+        Returns:
+            float: 预期累计成交量
+        """
+        position = min(max(minute, 0) / self.freq, len(self.cumulative))
+        slot = int(position)
+        lower = self.cumulative[slot - 1] if slot > 0 else 0.0
+        if slot >= len(self.cumulative):
+            return lower
+        return lower + (position - slot) * (self.cumulative[slot] - lower)
+
+    def relative_volume(self, volume, timestamp):
+        """
+        按时段校正的相对成交量：当日截至timestamp的累计成交量与同一时刻的预期累计成交量之比
+
+        Args:
+            volume (float): 当日累计成交量
+            timestamp: 行情时间
+
+        Returns:
+            float: 相对成交量，开盘前或没有预期成交量时为NaN
+        """
+        baseline = self.expected(session_minute(timestamp, self.market_type))
+        return volume / baseline if baseline > 0 else float('nan')
@@ -0,0 +1,423 @@
+"""
+流式技术指标
+
+每来一根新K线只做O(1)的增量更新（update），盘中还可以用未收盘的K线试算（peek），
+试算不改变内部状态，下次刷新时用新的盘中价格重新试算即可。
+计算口径与calculate_indicators一致：均线、RSI、ATR默认用简单移动平均，
+wilder=True时使用Wilder平滑（与talib一致）。
+"""
+from collections import deque, namedtuple
+from itertools import islice
+
+NAN = float('nan')
+
+# 滑动窗口统计值
+WindowStats = namedtuple('WindowStats', ['sum', 'mean', 'min', 'max'])
+
+_EMPTY_STATS = WindowStats(NAN, NAN, NAN, NAN)
+
+
+def _isnan(value):
+    return value is None or value != value
+
+
+class RollingWindow:
+    """
+    定长滑动窗口，维护窗口内的和、最小值和最大值
+
+    最小值和最大值用单调队列维护，每次更新均摊O(1)。
+    窗口未满或窗口内有空值时统计值为NaN，与pandas的rolling一致。
+    """
+    def __init__(self, length):
+        """
+        初始化滑动窗口
+
+        Args:
+            length (int): 窗口长度
+        """
+        self.length = length
+        self.count = 0
+        self._values = deque()
+        self._sum = 0.0
+        self._nan_count = 0
+        # 单调队列，元素为 (序号, 值)
+        self._min = deque()
+        self._max = deque()
+
+    def update(self, value):
+        """
+        加入一个新值
+
+        Args:
+            value (float): 新值，可以为NaN
+
+        Returns:
+            WindowStats: 更新后的统计值
+        """
+        index = self.count
+        self.count += 1
+        self._values.append(value)
+        if _isnan(value):
+            self._nan_count += 1
+        else:
+            self._sum += value
+            while self._min and self._min[-1][1] >= value:
+                self._min.pop()
+            self._min.append((index, value))
+            while self._max and self._max[-1][1] <= value:
+                self._max.pop()
+            self._max.append((index, value))
+
+        if len(self._values) > self.length:
+            old = self._values.popleft()
+            if _isnan(old):
+                self._nan_count -= 1
+            else:
+                self._sum -= old
+        oldest = self.count - self.length
+        for queue in (self._min, self._max):
+            if queue and queue[0][0] < oldest:
+                queue.popleft()
+        return self.stats()
+
+    def stats(self):
+        """
+        获取当前窗口的统计值
+
+        Returns:
+            WindowStats: 窗口未满或含空值时各项为NaN
+        """
+        if len(self._values) < self.length or self._nan_count:
+            return _EMPTY_STATS
+        return WindowStats(self._sum, self._sum / self.length, self._min[0][1], self._max[0][1])
+
+    def peek(self, value):
+        """
+        试算加入新值后的统计值，不改变窗口状态
+
+        Args:
+            value (float): 新值
+
+        Returns:
+            WindowStats: 试算的统计值
+        """
+        evict = len(self._values) == self.length
+        if len(self._values) + 1 < self.length or _isnan(value):
+            return _EMPTY_STATS
+        old = self._values[0] if evict else 0.0
+        nan_count = self._nan_count - (1 if evict and _isnan(old) else 0)
+        if nan_count:
+            return _EMPTY_STATS
+
+        total = self._sum + value - (0.0 if _isnan(old) else old)
+        # 被移出的最旧元素若在单调队列队首，则取队列中的下一个
+        oldest = self.count - self.length
+        lowest, highest = value, value
+        for index, item in islice(self._min, 2):
+            if not (evict and index == oldest):
+                lowest = min(lowest, item)
+                break
+        for index, item in islice(self._max, 2):
+            if not (evict and index == oldest):
+                highest = max(highest, item)
+                break
+        return WindowStats(total, total / self.length, lowest, highest)
+
+
+class StreamingEMA:
+    """
+    指数移动平均（与pandas的ewm(adjust=False)一致，以第一个值为初始值）
+    """
+    def __init__(self, span=None, alpha=None):
+        """
+        初始化EMA
+
+        Args:
+            span (int): 周期，alpha = 2 / (span + 1)
+            alpha (float): 平滑系数，指定时忽略span
+        """
+        self.alpha = alpha if alpha is not None else 2 / (span + 1)
+        self.value = NAN
+
+    def peek(self, value):
+        """
+        试算加入新值后的EMA
+        """
+        if _isnan(self.value):
+            return value
+        return self.value + self.alpha * (value - self.value)
+
+    def update(self, value):
+        """
+        加入新值并返回更新后的EMA
+        """
+        self.value = self.peek(value)
+        return self.value
+
+
+class WilderAverage:
+    """
+    Wilder平滑均值：前period个值取简单平均作为初始值，之后 avg = (avg * (n - 1) + x) / n
+    """
+    def __init__(self, period):
+        self.period = period
+        self.count = 0
+        self._sum = 0.0
+        self.value = NAN
+
+    def peek(self, value):
+        """
+        试算加入新值后的均值
+        """
+        if self.count + 1 < self.period:
+            return NAN
+        if self.count + 1 == self.period:
+            return (self._sum + value) / self.period
+        return (self.value * (self.period - 1) + value) / self.period
+
+    def update(self, value):
+        """
+        加入新值并返回更新后的均值
+        """
+        self.value = self.peek(value)
+        if self.count < self.period:
+            self._sum += value
+        self.count += 1
+        return self.value
+
+
+def _rsi(avg_gain, avg_loss):
+    """
+    由平均涨幅和平均跌幅计算RSI
+    """
+    if _isnan(avg_gain) or _isnan(avg_loss):
+        return NAN
+    if avg_loss == 0:
+        return 100.0 if avg_gain > 0 else NAN
+    return 100 - 100 / (1 + avg_gain / avg_loss)
+
+
+class StreamingRSI:
+    """
+    相对强弱指标
+    """
+    def __init__(self, period=14, wilder=False):
+        """
+        初始化RSI
+
+        Args:
+            period (int): 周期
+            wilder (bool): 是否使用Wilder平滑，否则使用简单移动平均
+        """
+        self.wilder = wilder
+        self.prev_close = NAN
+        if wilder:
+            self._gain, self._loss = WilderAverage(period), WilderAverage(period)
+        else:
+            self._gain, self._loss = RollingWindow(period), RollingWindow(period)
+
+    def _changes(self, close):
+        delta = 0.0 if _isnan(self.prev_close) else close - self.prev_close
+        return max(delta, 0.0), max(-delta, 0.0)
+
+    def peek(self, close):
+        """
+        试算加入新收盘价后的RSI
+        """
+        if self.wilder and _isnan(self.prev_close):
+            return NAN
+        gain, loss = self._changes(close)
+        if self.wilder:
+            return _rsi(self._gain.peek(gain), self._loss.peek(loss))
+        return _rsi(self._gain.peek(gain).mean, self._loss.peek(loss).mean)
+
+    def update(self, close):
+        """
+        加入新收盘价并返回更新后的RSI
+        """
+        first = _isnan(self.prev_close)
+        gain, loss = self._changes(close)
+        self.prev_close = close
+        if self.wilder:
+            # Wilder口径第一根K线没有涨跌幅
+            if first:
+                return NAN
+            return _rsi(self._gain.update(gain), self._loss.update(loss))
+        return _rsi(self._gain.update(gain).mean, self._loss.update(loss).mean)
+
+
+class StreamingKDJ:
+    """
+    KDJ指标（K为未平滑的RSV，D为K的简单移动平均，与calculate_indicators一致）
+    """
+    def __init__(self, period=9, smooth=3):
+        """
+        初始化KDJ
+
+        Args:
+            period (int): RSV周期
+            smooth (int): D值平滑周期
+        """
+        self._high = RollingWindow(period)
+        self._low = RollingWindow(period)
+        self._k = RollingWindow(smooth)
+
+    @staticmethod
+    def _rsv(close, highest, lowest):
+        if _isnan(highest) or _isnan(lowest) or highest == lowest:
+            return NAN
+        return 100 * (close - lowest) / (highest - lowest)
+
+    @staticmethod
+    def _result(k, d):
+        return {'K': k, 'D': d, 'J': 3 * k - 2 * d}
+
+    def peek(self, high, low, close):
+        """
+        试算加入新K线后的KDJ
+
+        Returns:
+            dict: {'K': K值, 'D': D值, 'J': J值}
+        """
+        k = self._rsv(close, self._high.peek(high).max, self._low.peek(low).min)
+        return self._result(k, self._k.peek(k).mean)
+
+    def update(self, high, low, close):
+        """
+        加入新K线并返回更新后的KDJ
+        """
+        k = self._rsv(close, self._high.update(high).max, self._low.update(low).min)
+        return self._result(k, self._k.update(k).mean)
+
+
+class StreamingATR:
+    """
+    平均真实波幅
+    """
+    def __init__(self, period=14, wilder=False):
+        """
+        初始化ATR
+
+        Args:
+            period (int): 周期
+            wilder (bool): 是否使用Wilder平滑，否则使用简单移动平均
+        """
+        self.wilder = wilder
+        self.prev_close = NAN
+        self._average = WilderAverage(period) if wilder else RollingWindow(period)
+
+    def _true_range(self, high, low):
+        if _isnan(self.prev_close):
+            return NAN
+        return max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+
+    def _value(self, result):
+        return result if self.wilder else result.mean
+
+    def peek(self, high, low):
+        """
+        试算加入新K线后的ATR
+        """
+        tr = self._true_range(high, low)
+        if _isnan(tr) and self.wilder:
+            return NAN
+        return self._value(self._average.peek(tr))
+
+    def update(self, high, low, close):
+        """
+        加入新K线并返回更新后的ATR
+        """
+        tr = self._true_range(high, low)
+        self.prev_close = close
+        if _isnan(tr) and self.wilder:
+            return NAN
+        return self._value(self._average.update(tr))
+
+
+class IndicatorState:
+    """
+    单只股票的流式指标状态，列名与calculate_indicators一致
+    """
+    def __init__(self, ma_periods=(5, 10, 20), volume_period=5):
+        """
+        初始化指标状态
+
+        Args:
+            ma_periods (tuple): 均线周期
+            volume_period (int): 成交量均线周期
+        """
+        self._ma = {period: RollingWindow(period) for period in ma_periods}
+        self._volume = RollingWindow(volume_period)
+        self.volume_period = volume_period
+        self._rsi = StreamingRSI()
+        self._kdj = StreamingKDJ()
+        self._atr = StreamingATR()
+        self.last_close = NAN
+        self.last_date = None
+        self.count = 0
+        self.values = {}
+
+    @classmethod
+    def from_frame(cls, df, **kwargs):
+        """
+        用历史K线初始化指标状态
+
+        Args:
+            df (pd.DataFrame): 已收盘的K线，列名为 date/High/Low/Close/Volume
+            **kwargs: 传给构造函数的参数
+
+        Returns:
+            IndicatorState: 指标状态
+        """
+        state = cls(**kwargs)
+        for date, high, low, close, volume in zip(
+            df['date'], df['High'].to_numpy(dtype=float), df['Low'].to_numpy(dtype=float),
+            df['Close'].to_numpy(dtype=float), df['Volume'].to_numpy(dtype=float)
+        ):
+            state.update(high, low, close, volume, date=date)
+        return state
+
+    def update(self, high, low, close, volume, date=None):
+        """
+        加入一根已收盘的K线
+
+        Args:
+            high (float): 最高价
+            low (float): 最低价
+            close (float): 收盘价
+            volume (float): 成交量
+            date: K线日期
+
+        Returns:
+            dict: 更新后的指标值
+        """
+        values = {f'MA{period}': window.update(close).mean for period, window in self._ma.items()}
+        values[f'VOL_MA{self.volume_period}'] = self._volume.update(volume).mean
+        values['RSI'] = self._rsi.update(close)
+        values.update(self._kdj.update(high, low, close))
+        values['ATR'] = self._atr.update(high, low, close)
+        self.last_close = close
+        self.last_date = date
+        self.count += 1
+        self.values = values
+        return values
+
+    def peek(self, high, low, close, volume):
+        """
+        用盘中未收盘的K线试算指标，不改变状态
+
+        Args:
+            high (float): 当日最高价
+            low (float): 当日最低价
+            close (float): 最新价
+            volume (float): 当日成交量
+
+        Returns:
+            dict: 试算的指标值
+        """
+        values = {f'MA{period}': window.peek(close).mean for period, window in self._ma.items()}
+        values[f'VOL_MA{self.volume_period}'] = self._volume.peek(volume).mean
+        values['RSI'] = self._rsi.peek(close)
+        values.update(self._kdj.peek(high, low, close))
+        values['ATR'] = self._atr.peek(high, low)
+        return values
@@ -4,8 +4,7 @@ import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import yfinance as yf
 import ta
-import tushare as ts
-from news.news_analyzer import NewsAnalyzer
+from news.news_analyzer import NewsAnalyzer, get_market_sentiment
 import numpy as np
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
@@ -16,171 +15,49 @@ from PIL import Image
 import plotly.io as pio
 import os
 from strategy.strategy_analyzer import StrategyAnalyzer
-import time
-import baostock as bs
+from strategy.rules import get_strategy_rules
+from strategy.snapshot import is_fresh, load_snapshot_meta
+from functools import partial
+from utils.singleflight import singleflight
+from data.tushare_client import get_tushare_client
+from data.realtime import get_quote_poller, get_realtime_batch
+from data.minute_store import get_intraday_session, get_volume_curve
+from data.fundamentals import company_fundamentals, get_holders, industry_comparison
+from analysis.context import AnalysisContext
+from analysis.indicators import INDICATORS
+from analysis.streaming import IndicatorState
+from data.bar_store import complete_until, get_bar_store, normalize_code, normalize_columns
 
-def get_realtime_data(symbol, market_type):
+def get_realtime_data(symbol, market_type, refresh=False):
     """
-    获取盘中实时数据
+    获取盘中实时数据（服务端共享轮询，各会话读取同一份最新行情）
     
     Args:
         symbol (str): 股票代码
         market_type (str): 市场类型
+        refresh (bool): 是否立即向数据源重新获取，否则读取轮询器的最新行情
         
     Returns:
         dict: 实时数据
     """
-    try:
-        if market_type == "A股":
-            # 添加市场后缀
-            if symbol.startswith('6'):
-                full_symbol = f"{symbol}.SH"
-            else:
-                full_symbol = f"{symbol}.SZ"
-                
-            # 使用tushare获取实时数据
-            ts.set_token('1eff01596da7f92d7af202478e924ea7836ee40f52cf0636bc01f489')
-            pro = ts.pro_api()
-            
-            # 获取当日实时行情
-            try:
-                # 尝试使用tushare的实时行情接口
-                realtime = ts.get_realtime_quotes(symbol)
-                
-                if realtime is None or realtime.empty:
-                    # 尝试使用baostock获取
-                    bs.login()
-                    today_str = datetime.now().strftime('%Y-%m-%d')
-                    rs = bs.query_history_k_data_plus(
-                        full_symbol,
-                        "date,time,open,high,low,close,volume,amount",
-                        start_date=today_str,
-                        end_date=today_str,
-                        frequency="5"  # 5分钟线
-                    )
-                    
-                    if rs.error_code != '0':
-                        st.warning(f"获取实时数据失败: {rs.error_msg}")
-                        bs.logout()
-                        return None
-                    
-                    data_list = []
-                    while (rs.next()):
-                        data_list.append(rs.get_row_data())
-                    
-                    bs.logout()
-                    
-                    if not data_list:
-                        st.warning("今日无交易数据")
-                        return None
-                    
-                    # 获取最新的5分钟数据
-                    latest = data_list[-1]
-                    return {
-                        'open': float(latest[2]),
-                        'high': float(latest[3]),
-                        'low': float(latest[4]),
-                        'price': float(latest[5]),  # 收盘价作为当前价格
-                        'pre_close': None,  # baostock不提供前收盘价
-                        'volume': float(latest[6]),
-                        'amount': float(latest[7]),
-                        'time': f"{latest[0]} {latest[1]}"
-                    }
-                
-                # 转换tushare数据格式
-                return {
-                    'open': float(realtime['open'].iloc[0]),
-                    'high': float(realtime['high'].iloc[0]),
-                    'low': float(realtime['low'].iloc[0]),
-                    'price': float(realtime['price'].iloc[0]),
-                    'pre_close': float(realtime['pre_close'].iloc[0]),
-                    'volume': float(realtime['volume'].iloc[0]) * 100,  # 转换为股
-                    'amount': float(realtime['amount'].iloc[0]) * 10000,  # 转换为元
-                    'time': realtime['date'].iloc[0] + ' ' + realtime['time'].iloc[0]
-                }
-            except Exception as e:
-                st.warning(f"获取A股实时数据时出错: {str(e)}，尝试其他方法")
-                
-                # 尝试使用日线数据的最新记录
-                today_str = datetime.now().strftime('%Y%m%d')
-                df = pro.daily(ts_code=full_symbol, start_date=today_str, end_date=today_str)
-                
-                if df is not None and not df.empty:
-                    return {
-                        'open': float(df['open'].iloc[0]),
-                        'high': float(df['high'].iloc[0]),
-                        'low': float(df['low'].iloc[0]),
-                        'price': float(df['close'].iloc[0]),
-                        'pre_close': float(df['pre_close'].iloc[0]) if 'pre_close' in df.columns else None,
-                        'volume': float(df['vol'].iloc[0]),
-                        'amount': float(df['amount'].iloc[0]),
-                        'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                    }
-                return None
-                
-        elif market_type == "港股":
-            # 添加港股后缀
-            full_symbol = f"{symbol}.HK"
-            
-            # 使用yfinance获取实时数据
-            try:
-                stock = yf.Ticker(full_symbol)
-                today_data = stock.history(period='1d')
-                
-                if today_data.empty:
-                    return None
-                
-                latest = today_data.iloc[-1]
-                
-                return {
-                    'open': float(latest['Open']),
-                    'high': float(latest['High']),
-                    'low': float(latest['Low']),
-                    'price': float(latest['Close']),
-                    'pre_close': None,  # yfinance不直接提供前收盘价
-                    'volume': float(latest['Volume']),
-                    'amount': float(latest['Volume'] * latest['Close']),  # 估算成交额
-                    'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                }
-            except Exception as e:
-                st.warning(f"获取港股实时数据时出错: {str(e)}")
-                return None
-                
-        else:  # 美股
-            # 使用yfinance获取实时数据
-            try:
-                stock = yf.Ticker(symbol)
-                today_data = stock.history(period='1d')
-                
-                if today_data.empty:
-                    return None
-                
-                latest = today_data.iloc[-1]
-                
-                return {
-                    'open': float(latest['Open']),
-                    'high': float(latest['High']),
-                    'low': float(latest['Low']),
-                    'price': float(latest['Close']),
-                    'pre_close': None,  # yfinance不直接提供前收盘价
-                    'volume': float(latest['Volume']),
-                    'amount': float(latest['Volume'] * latest['Close']),  # 估算成交额
-                    'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                }
-            except Exception as e:
-                st.warning(f"获取美股实时数据时出错: {str(e)}")
-                return None
-    except Exception as e:
-        st.error(f"获取实时数据时出错: {str(e)}")
-        return None
+    poller = get_quote_poller()
+    if refresh:
+        quote, _ = poller.refresh(symbol, market_type)
+    else:
+        quote, _ = poller.get(symbol, market_type)
+    if quote is None:
+        st.warning("获取实时数据失败")
+    return quote
 
-def analyze_intraday_trend(realtime_data, historical_df):
+def analyze_intraday_trend(realtime_data, indicator_state, intraday=None, volume_curve=None):
     """
     分析盘中趋势
     
     Args:
         realtime_data (dict): 实时数据
-        historical_df (pd.DataFrame): 历史数据
+        indicator_state (IndicatorState): 由已收盘K线构建的流式指标状态
+        intraday (IntradaySession): 当日分时会话，提供分时均价和成交量分布，没有时不做分时分析
+        volume_curve (VolumeCurve): 历史平均累计成交量曲线，没有时与5日平均全天成交量比较
         
     Returns:
         dict: 趋势分析结果
@@ -197,7 +74,7 @@ def analyze_intraday_trend(realtime_data, historical_df):
         }
         
         # 检查数据有效性
-        if not realtime_data or historical_df is None or historical_df.empty:
+        if not realtime_data or indicator_state is None or indicator_state.count == 0:
             return result
             
         # 计算价格变化百分比
@@ -205,14 +82,22 @@ def analyze_intraday_trend(realtime_data, historical_df):
             price_change_pct = (realtime_data['price'] - realtime_data['pre_close']) / realtime_data['pre_close'] * 100
         else:
             # 如果没有前收盘价，使用昨日收盘价
-            price_change_pct = (realtime_data['price'] - historical_df['Close'].iloc[-1]) / historical_df['Close'].iloc[-1] * 100
+            price_change_pct = (realtime_data['price'] - indicator_state.last_close) / indicator_state.last_close * 100
             
         # 计算振幅
         amplitude = (realtime_data['high'] - realtime_data['low']) / realtime_data['low'] * 100
         
-        # 计算相对成交量（与5日平均成交量相比）
-        avg_volume = historical_df['Volume'].tail(5).mean()
-        relative_volume = realtime_data['volume'] / avg_volume if avg_volume > 0 else 0
+        # 计算相对成交量：与历史同一时刻的平均累计成交量相比，没有分钟K线历史时与5日平均成交量相比
+        if volume_curve is not None:
+            # 分时会话在盘中才开始时只累计了开始之后的成交量，由会话取其与行情当日累计成交量（股）中较大的一个
+            if intraday is not None:
+                relative_volume = intraday.relative_volume(volume_curve, realtime_data)
+            else:
+                relative_volume = volume_curve.relative_volume(realtime_data['volume'], realtime_data['time'])
+            relative_volume = relative_volume if pd.notna(relative_volume) else 0
+        else:
+            avg_volume = indicator_state.values.get('VOL_MA5', np.nan)
+            relative_volume = realtime_data['volume'] / avg_volume if avg_volume > 0 else 0
         
         # 更新结果
         result['price_change_pct'] = price_change_pct
@@ -249,12 +134,12 @@ def analyze_intraday_trend(realtime_data, historical_df):
             result['reason'] = '价格变动不大，市场处于观望状态'
             result['prediction'] = '短期内可能继续盘整，等待方向性突破'
             
-        # 考虑均线位置
-        if 'MA5' in historical_df.columns and 'MA10' in historical_df.columns and 'MA20' in historical_df.columns:
-            ma5 = historical_df['MA5'].iloc[-1]
-            ma10 = historical_df['MA10'].iloc[-1]
-            ma20 = historical_df['MA20'].iloc[-1]
-            
+        # 考虑均线位置：用最新价试算当日均线，不改变指标状态
+        indicators = indicator_state.peek(
+            realtime_data['high'], realtime_data['low'], realtime_data['price'], realtime_data['volume']
+        )
+        ma5, ma10, ma20 = indicators['MA5'], indicators['MA10'], indicators['MA20']
+        if pd.notna(ma5) and pd.notna(ma10) and pd.notna(ma20):
             # 多头排列：MA5 > MA10 > MA20
             if ma5 > ma10 > ma20:
                 result['reason'] += '，均线呈多头排列，中期趋势向上'
@@ -271,6 +156,18 @@ def analyze_intraday_trend(realtime_data, historical_df):
                     result['prediction'] += '，价格站上MA20，可能是反弹信号'
             else:
                 result['reason'] += '，均线交叉，趋势不明确'
+        
+        # 考虑分时均价和成交密集价位
+        if intraday is not None and intraday.cum_volume > 0:
+            vwap, poc = intraday.vwap, intraday.point_of_control()
+            result['vwap'] = vwap
+            result['poc'] = poc
+            if realtime_data['price'] > vwap:
+                result['reason'] += '，价格位于分时均价上方，日内买方占优'
+            elif realtime_data['price'] < vwap:
+                result['reason'] += '，价格位于分时均价下方，日内卖方占优'
+            if pd.notna(poc):
+                result['prediction'] += f'，当日成交最密集价位{poc:.2f}附近有支撑/压力'
                 
         return result
     except Exception as e:
@@ -317,35 +214,20 @@ def get_a_stock_data(symbol, start, end):
         pd.DataFrame: 股票数据
     """
     try:
-        # 初始化tushare
-        ts.set_token('1eff01596da7f92d7af202478e924ea7836ee40f52cf0636bc01f489')  # 需要替换为实际的token
-        pro = ts.pro_api()
+        # 共享tushare客户端（token可通过环境变量TUSHARE_TOKEN设置）
+        pro = get_tushare_client()
         
         # 获取数据
         df = pro.daily(ts_code=symbol, 
                       start_date=start.strftime('%Y%m%d'),
                       end_date=end.strftime('%Y%m%d'))
         
-        if df.empty:
-            st.error(f"无法获取股票 {symbol} 的数据，请检查股票代码是否正确")
-            return None
-            
-        # 重命名列
-        df = df.rename(columns={
-            'trade_date': 'date',
-            'open': 'Open',
-            'high': 'High',
-            'low': 'Low',
-            'close': 'Close',
-            'vol': 'Volume',
-            'amount': 'Amount'
-        })
-        
-        # 转换日期格式
-        df['date'] = pd.to_datetime(df['date'])
+        # 统一列名、日期格式并按日期升序排序
+        df = normalize_columns(df)
         
-        # 按日期升序排序
-        df = df.sort_values('date')
+        # 统一单位：成交量由手转换为股，成交额由千元转换为元
+        df['Volume'] = df['Volume'] * 100
+        df['Amount'] = df['Amount'] * 1000
         
         return df
     except Exception as e:
@@ -365,45 +247,57 @@ def get_hk_stock_data(symbol, start, end):
         pd.DataFrame: 股票数据
     """
     try:
-        # 初始化tushare
-        ts.set_token('1eff01596da7f92d7af202478e924ea7836ee40f52cf0636bc01f489')
-        pro = ts.pro_api()
+        # 共享tushare客户端
+        pro = get_tushare_client()
         
         # 获取数据
         df = pro.hk_daily(ts_code=symbol, 
                          start_date=start.strftime('%Y%m%d'),
                          end_date=end.strftime('%Y%m%d'))
         
-        if df.empty:
-            st.error(f"无法获取港股 {symbol} 的数据，请检查股票代码是否正确")
-            return None
-            
-        # 重命名列
-        df = df.rename(columns={
-            'trade_date': 'date',
-            'open': 'Open',
-            'high': 'High',
-            'low': 'Low',
-            'close': 'Close',
-            'vol': 'Volume',
-            'amount': 'Amount'
-        })
+        # 统一列名、日期格式并按日期升序排序
+        return normalize_columns(df)
+    except Exception as e:
+        st.error(f"获取港股数据时出错: {str(e)}")
+        return None
+
+def get_us_stock_data(symbol, start, end):
+    """
+    获取美股数据
+    
+    Args:
+        symbol (str): 股票代码
+        start (datetime): 开始日期
+        end (datetime): 结束日期
         
-        # 转换日期格式
-        df['date'] = pd.to_datetime(df['date'])
+    Returns:
+        pd.DataFrame: 股票数据
+    """
+    try:
+        stock = yf.Ticker(symbol)
+        # yfinance的结束日期不包含当天
+        df = stock.history(start=start, end=end + timedelta(days=1))
         
-        # 按日期升序排序
-        df = df.sort_values('date')
+        # 重置索引，将日期作为列
+        df = df.reset_index()
+        df = df.rename(columns={'Date': 'date'})
         
-        return df
+        # 去掉时区，与其他市场的日期格式保持一致
+        df['date'] = pd.to_datetime(df['date'])
+        if df['date'].dt.tz is not None:
+            df['date'] = df['date'].dt.tz_localize(None)
+        df['date'] = df['date'].dt.normalize()
+        
+        return normalize_columns(df)
     except Exception as e:
-        st.error(f"获取港股数据时出错: {str(e)}")
+        st.error(f"获取美股数据时出错: {str(e)}")
         return None
 
 @st.cache_data
+@singleflight
 def get_stock_data(symbol, start, end, market_type):
     """
-    获取股票数据
+    获取股票数据，优先读取本地K线存储（与战法分析器共用），只从数据源补齐缺失的日期区间
     
     Args:
         symbol (str): 股票代码
@@ -417,39 +311,34 @@ def get_stock_data(symbol, start, end, market_type):
     try:
         if market_type == "A股":
             # 添加市场后缀
-            if symbol.startswith('6'):
-                symbol = f"{symbol}.SH"
-            else:
-                symbol = f"{symbol}.SZ"
-            return get_a_stock_data(symbol, start, end)
+            symbol = normalize_code(symbol, market_type)
+            fetcher = partial(get_a_stock_data, symbol)
         elif market_type == "港股":
             # 添加港股后缀
-            symbol = f"{symbol}.HK"
-            return get_hk_stock_data(symbol, start, end)
+            symbol = normalize_code(symbol, market_type)
+            fetcher = partial(get_hk_stock_data, symbol)
         else:
-            stock = yf.Ticker(symbol)
-            df = stock.history(start=start, end=end)
-            
-            # 验证数据是否为空
-            if df.empty:
-                st.error(f"无法获取股票 {symbol} 的数据，请检查股票代码是否正确")
-                return None
-                
-            # 重置索引，将日期作为列
-            df = df.reset_index()
-            df = df.rename(columns={'Date': 'date'})
+            fetcher = partial(get_us_stock_data, symbol)
+        
+        df = get_bar_store().get_bars(market_type, symbol, start, end, fetcher)
+        
+        # 验证数据是否为空
+        if df is None or df.empty:
+            st.error(f"无法获取股票 {symbol} 的数据，请检查股票代码是否正确")
+            return None
             
-            return df
+        return df
     except Exception as e:
         st.error(f"获取股票数据时出错: {str(e)}")
         return None
 
-def calculate_indicators(df):
+def calculate_indicators(df, columns=None):
     """
     计算技术指标
     
     Args:
         df (pd.DataFrame): 股票数据
+        columns (iterable): 需要的指标列，只计算这些列及其依赖，None表示全部指标
         
     Returns:
         pd.DataFrame: 添加技术指标后的数据
@@ -476,91 +365,8 @@ def calculate_indicators(df):
         df = df.replace([np.inf, -np.inf], np.nan)
         df = df.fillna(method='ffill').fillna(method='bfill')
         
-        # 计算移动平均线
-        df['MA5'] = df['Close'].rolling(window=5).mean()
-        df['MA10'] = df['Close'].rolling(window=10).mean()
-        df['MA20'] = df['Close'].rolling(window=20).mean()
-        df['MA30'] = df['Close'].rolling(window=30).mean()
-        df['MA60'] = df['Close'].rolling(window=60).mean()
-        
-        # 计算MACD
-        exp1 = df['Close'].ewm(span=12, adjust=False).mean()
-        exp2 = df['Close'].ewm(span=26, adjust=False).mean()
-        df['MACD'] = exp1 - exp2
-        df['Signal'] = df['MACD'].ewm(span=9, adjust=False).mean()
-        df['Histogram'] = df['MACD'] - df['Signal']
-        
-        # 计算RSI
-        delta = df['Close'].diff()
-        gain = delta.where(delta > 0, 0)
-        loss = -delta.where(delta < 0, 0)
-        avg_gain = gain.rolling(window=14).mean()
-        avg_loss = loss.rolling(window=14).mean()
-        rs = avg_gain / avg_loss
-        df['RSI'] = 100 - (100 / (1 + rs))
-        
-        # 计算KDJ
-        low_min = df['Low'].rolling(window=9).min()
-        high_max = df['High'].rolling(window=9).max()
-        df['K'] = 100 * ((df['Close'] - low_min) / (high_max - low_min))
-        df['D'] = df['K'].rolling(window=3).mean()
-        df['J'] = 3 * df['K'] - 2 * df['D']
-        
-        # 计算布林带
-        df['BB_Middle'] = df['Close'].rolling(window=20).mean()
-        df['BB_Upper'] = df['BB_Middle'] + 2 * df['Close'].rolling(window=20).std()
-        df['BB_Lower'] = df['BB_Middle'] - 2 * df['Close'].rolling(window=20).std()
-        
-        # 计算OBV (On-Balance Volume)
-        df['OBV'] = (np.sign(df['Close'].diff()) * df['Volume']).fillna(0).cumsum()
-        
-        # 计算CCI (Commodity Channel Index)
-        typical_price = (df['High'] + df['Low'] + df['Close']) / 3
-        mean_deviation = abs(typical_price - typical_price.rolling(window=20).mean()).rolling(window=20).mean()
-        df['CCI'] = (typical_price - typical_price.rolling(window=20).mean()) / (0.015 * mean_deviation)
-        
-        # 计算Williams %R
-        highest_high = df['High'].rolling(window=14).max()
-        lowest_low = df['Low'].rolling(window=14).min()
-        df['Williams_R'] = -100 * (highest_high - df['Close']) / (highest_high - lowest_low)
-        
-        # 计算DMI (Directional Movement Index)
-        df['TR'] = np.maximum(df['High'] - df['Low'], 
-                             np.maximum(abs(df['High'] - df['Close'].shift(1)), 
-                                       abs(df['Low'] - df['Close'].shift(1))))
-        df['ATR'] = df['TR'].rolling(window=14).mean()
-        
-        df['DM+'] = np.where((df['High'] - df['High'].shift(1)) > (df['Low'].shift(1) - df['Low']), 
-                            np.maximum(df['High'] - df['High'].shift(1), 0), 0)
-        df['DM-'] = np.where((df['Low'].shift(1) - df['Low']) > (df['High'] - df['High'].shift(1)), 
-                            np.maximum(df['Low'].shift(1) - df['Low'], 0), 0)
-                            
-        df['DI+'] = 100 * (df['DM+'].rolling(window=14).mean() / df['ATR'])
-        df['DI-'] = 100 * (df['DM-'].rolling(window=14).mean() / df['ATR'])
-        
-        df['DX'] = 100 * abs(df['DI+'] - df['DI-']) / (df['DI+'] + df['DI-'])
-        df['ADX'] = df['DX'].rolling(window=14).mean()
-        
-        # 计算BIAS (Bias Ratio)
-        df['BIAS6'] = (df['Close'] - df['Close'].rolling(window=6).mean()) / df['Close'].rolling(window=6).mean() * 100
-        df['BIAS12'] = (df['Close'] - df['Close'].rolling(window=12).mean()) / df['Close'].rolling(window=12).mean() * 100
-        df['BIAS24'] = (df['Close'] - df['Close'].rolling(window=24).mean()) / df['Close'].rolling(window=24).mean() * 100
-        
-        # 计算支撑位和阻力位
-        # 使用过去20天的数据计算支撑位和阻力位
-        window = 20
-        if len(df) >= window:
-            # 支撑位：过去20天的最低价的平均值
-            df['Support'] = df['Low'].rolling(window=window).min()
-            
-            # 阻力位：过去20天的最高价的平均值
-            df['Resistance'] = df['High'].rolling(window=window).max()
-        else:
-            # 如果数据不足，使用所有可用数据
-            df['Support'] = df['Low'].min()
-            df['Resistance'] = df['High'].max()
-        
-        return df
+        # 按依赖关系只计算需要的指标，共用的中间结果只算一次
+        return INDICATORS.compute(df, columns)
     except Exception as e:
         st.error(f"计算技术指标时出错: {str(e)}")
         return None
@@ -751,6 +557,40 @@ def plot_volume(df):
     
     return fig
 
+def get_indicator_state(context):
+    """
+    获取盘中分析使用的流式指标状态
+
+    状态保存在session_state中，股票不变且K线中最新一根已收盘K线的日期不变时直接复用；
+    有新K线（包括数据源延迟发布的已收盘K线）时只把新增的K线增量更新进状态。
+
+    Args:
+        context (AnalysisContext): 本次运行的分析上下文，提供K线
+
+    Returns:
+        IndicatorState: 指标状态，获取历史数据失败时返回None
+    """
+    df = context.bars
+    if df is None or df.empty:
+        return None
+    # 只用已收盘的K线，当日未收盘的K线在分析时试算
+    df = df[df['date'] <= complete_until(context.market_type)]
+
+    key = context.key
+    state = st.session_state.get('indicator_state')
+    same_stock = state is not None and st.session_state.get('indicator_state_key') == key
+    if same_stock and state.last_date is not None:
+        if state.last_date >= df['date'].max():
+            return state
+        for row in df[df['date'] > state.last_date].itertuples(index=False):
+            state.update(row.High, row.Low, row.Close, row.Volume, date=row.date)
+    else:
+        state = IndicatorState.from_frame(df)
+        st.session_state['indicator_state'] = state
+        st.session_state['indicator_state_key'] = key
+    return state
+
+
 # 设置页面配置
 st.set_page_config(
     page_title="股票分析系统",
@@ -761,51 +601,6 @@ st.set_page_config(
 # 页面标题
 st.title("📈 股票分析系统")
 
-# 获取股票数据
-@st.cache_data
-def get_stock_data(symbol, start, end, market_type):
-    """
-    获取股票数据
-    
-    Args:
-        symbol (str): 股票代码
-        start (datetime): 开始日期
-        end (datetime): 结束日期
-        market_type (str): 市场类型
-        
-    Returns:
-        pd.DataFrame: 股票数据
-    """
-    try:
-        if market_type == "A股":
-            # 添加市场后缀
-            if symbol.startswith('6'):
-                symbol = f"{symbol}.SH"
-            else:
-                symbol = f"{symbol}.SZ"
-            return get_a_stock_data(symbol, start, end)
-        elif market_type == "港股":
-            # 添加港股后缀
-            symbol = f"{symbol}.HK"
-            return get_hk_stock_data(symbol, start, end)
-        else:
-            stock = yf.Ticker(symbol)
-            df = stock.history(start=start, end=end)
-            
-            # 验证数据是否为空
-            if df.empty:
-                st.error(f"无法获取股票 {symbol} 的数据，请检查股票代码是否正确")
-                return None
-                
-            # 重置索引，将日期作为列
-            df = df.reset_index()
-            df = df.rename(columns={'Date': 'date'})
-            
-            return df
-    except Exception as e:
-        st.error(f"获取股票数据时出错: {str(e)}")
-        return None
-
 # 侧边栏
 st.sidebar.header("参数设置")
 market_type = st.sidebar.selectbox("市场类型", ["A股", "港股", "美股"])
@@ -823,50 +618,55 @@ end_date = st.sidebar.date_input("结束日期", datetime.now())
 analyze_button = st.sidebar.button("开始深度分析")
 volume_analysis_button = st.sidebar.button("主力行为分析")
 
-# 在页面顶部添加盘中实时波动分析区域
-st.markdown("## 📊 盘中实时波动分析")
-realtime_container = st.container()
+# tushare接口调用统计（本进程内各会话共用）
+with st.sidebar.expander("tushare接口调用统计"):
+    tushare_stats = get_tushare_client().stats()
+    if tushare_stats.empty:
+        st.write("暂无调用")
+    else:
+        st.dataframe(tushare_stats.style.format({'quota_used': '{:.0%}'}))
+
+# 盘中实时面板的自动刷新间隔（秒）
+REALTIME_REFRESH_SECONDS = 5
 
-with realtime_container:
+def render_realtime_panel(context):
+    """
+    渲染盘中实时面板（作为独立片段刷新，只重新渲染行情指标和趋势分析，不重跑整个页面）
+    
+    行情由服务端轮询器在后台获取，这里只读取最新一份，不等待、不休眠。
+    
+    Args:
+        context (AnalysisContext): 最近一次页面运行的分析上下文
+    """
+    symbol, market_type = context.symbol, context.market_type
     # 创建三列布局
     col1, col2, col3 = st.columns([1, 1, 1])
     
     with col1:
         st.write(f"**市场类型:** {market_type}")
     with col2:
-        st.write(f"**股票代码:** {stock_symbol}")
+        st.write(f"**股票代码:** {symbol}")
     with col3:
-        refresh_realtime = st.button("刷新实时数据")
-    
-    # 使用session_state来控制自动刷新
-    if 'auto_refresh_time' not in st.session_state:
-        st.session_state.auto_refresh_time = time.time()
-        
-    # 每5秒自动刷新
-    current_time = time.time()
-    if current_time - st.session_state.auto_refresh_time >= 5:
-        st.session_state.auto_refresh_time = current_time
-        refresh_realtime = True
-    
-    # 获取实时数据
-    if refresh_realtime or 'last_refresh' not in st.session_state:
-        with st.spinner("正在获取实时数据..."):
-            realtime_data = get_realtime_data(stock_symbol, market_type)
-            
-            if realtime_data:
-                st.session_state['realtime_data'] = realtime_data
-                st.session_state['last_refresh'] = datetime.now()
-                
-                # 获取历史数据用于分析
-                df = get_stock_data(stock_symbol, start_date, end_date, market_type)
-                if df is not None:
-                    df = calculate_indicators(df)
-                    if df is not None:
-                        # 分析盘中趋势
-                        trend_analysis = analyze_intraday_trend(realtime_data, df)
-                        st.session_state['trend_analysis'] = trend_analysis
-    
-    # 显示实时数据和分析结果
+        manual_refresh = st.button("刷新实时数据")
+    
+    # 手动刷新时立即重新获取，否则读取轮询器的最新行情
+    realtime_data = get_realtime_data(symbol, market_type, refresh=manual_refresh)
+    if realtime_data:
+        # 历史K线只在切换股票或有新K线收盘时加载一次，之后的刷新只做增量试算
+        indicator_state = get_indicator_state(context)
+        if indicator_state is not None:
+            # 分析盘中趋势
+            st.session_state['realtime_data'] = realtime_data
+            # 当日分时K线只在首次查看时加载一次，之后由行情轮询增量更新
+            intraday = get_intraday_session(symbol, market_type)
+            # 成交量曲线每个交易日只计算一次，之后按当前时刻直接查表
+            volume_curve = get_volume_curve(symbol, market_type)
+            st.session_state['trend_analysis'] = analyze_intraday_trend(
+                realtime_data, indicator_state, intraday, volume_curve
+            )
+            st.session_state['last_refresh'] = datetime.now()
+    
+    # 显示实时数据和分析结果（获取失败时显示上一次的结果）
     if 'realtime_data' in st.session_state and 'trend_analysis' in st.session_state:
         realtime_data = st.session_state['realtime_data']
         trend_analysis = st.session_state['trend_analysis']
@@ -887,6 +687,14 @@ with realtime_container:
                 price_change_pct = (realtime_data['price'] - realtime_data['pre_close']) / realtime_data['pre_close'] * 100
                 st.metric("涨跌幅", f"{price_change_pct:.2f}%", delta=f"{price_change_pct:.2f}%")
             st.metric("成交量", f"{realtime_data['volume']/10000:.2f}万股")
+            if trend_analysis.get('relative_volume'):
+                st.metric("相对成交量", f"{trend_analysis['relative_volume']:.2f}")
+        if 'vwap' in trend_analysis:
+            vwap_col1, vwap_col2 = st.columns(2)
+            with vwap_col1:
+                st.metric("分时均价", format_price(trend_analysis['vwap'], market_type))
+            with vwap_col2:
+                st.metric("成交密集价位", format_price(trend_analysis['poc'], market_type))
         
         # 显示趋势分析结果
         trend_color = {
@@ -902,18 +710,26 @@ with realtime_container:
         st.markdown(f"<h3 style='color: {trend_color};'>盘中趋势: {trend_analysis['trend']}</h3>", unsafe_allow_html=True)
         st.markdown(f"**分析依据:** {trend_analysis['reason']}")
         st.markdown(f"**后市预测:** {trend_analysis['prediction']}")
-        
-        # 添加自动刷新选项
-        auto_refresh = st.checkbox("启用自动刷新（每5秒）", value=False)
-        if auto_refresh:
-            time.sleep(5)  # 等待5秒
-            st.experimental_rerun()  # 重新运行应用
     else:
         st.info("点击'刷新实时数据'按钮获取最新盘中数据")
 
+# 本次运行的分析上下文：K线只获取一次、技术指标只计算一次，各标签页共用
+context = AnalysisContext(stock_symbol, start_date, end_date, market_type,
+                          load=get_stock_data, compute=calculate_indicators)
+
+# 在页面顶部添加盘中实时波动分析区域
+st.markdown("## 📊 盘中实时波动分析")
+
+# 自动刷新只重新运行实时面板片段，页面其余部分（标签页、图表）不重新计算
+auto_refresh = st.checkbox(f"启用自动刷新（每{REALTIME_REFRESH_SECONDS}秒）", value=False)
+realtime_panel = st.fragment(render_realtime_panel, run_every=REALTIME_REFRESH_SECONDS if auto_refresh else None)
+with st.container():
+    realtime_panel(context)
+
 # 创建标签页
-tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(["K线图", "技术指标", "主力资金", "分析报告", "战法分析", "主力行为"])
+tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs(["K线图", "技术指标", "主力资金", "分析报告", "战法分析", "主力行为", "自选股"])
 
+@singleflight
 def get_company_info(symbol):
     """
     获取公司基本信息
@@ -925,36 +741,31 @@ def get_company_info(symbol):
         dict: 公司信息
     """
     try:
-        pro = ts.pro_api()
-        # 获取公司基本信息
-        basic = pro.daily_basic(ts_code=symbol, 
-                              fields='ts_code,trade_date,pe,pb,ps,roe,roa,debt_to_assets,current_ratio')
-        # 获取公司详细信息
-        company = pro.stock_company(ts_code=symbol)
-        
-        if basic.empty or company.empty:
+        # 从每日同步的全市场基本面表中查询，不再逐只请求tushare
+        company = company_fundamentals(symbol)
+        if company is None:
             return None
-            
-        # 获取最新财务指标
-        latest_basic = basic.iloc[0]
+        
+        def number(field):
+            return pd.to_numeric(company.get(field), errors='coerce')
         
         return {
             'basic_info': {
-                '公司名称': company['chairman'].iloc[0],
-                '上市日期': company['list_date'].iloc[0],
-                '主营业务': company['main_business'].iloc[0],
-                '所属行业': company['industry'].iloc[0],
-                '总市值': company['market_cap'].iloc[0],
-                '流通市值': company['float_market_cap'].iloc[0]
+                '公司名称': company.get('name'),
+                '上市日期': company.get('list_date'),
+                '主营业务': company.get('main_business'),
+                '所属行业': company.get('industry'),
+                '总市值': number('total_mv'),
+                '流通市值': number('circ_mv')
             },
             'financial_indicators': {
-                '市盈率(PE)': latest_basic['pe'],
-                '市净率(PB)': latest_basic['pb'],
-                '市销率(PS)': latest_basic['ps'],
-                '净资产收益率(ROE)': latest_basic['roe'],
-                '总资产收益率(ROA)': latest_basic['roa'],
-                '资产负债率': latest_basic['debt_to_assets'],
-                '流动比率': latest_basic['current_ratio']
+                '市盈率(PE)': number('pe'),
+                '市净率(PB)': number('pb'),
+                '市销率(PS)': number('ps'),
+                '净资产收益率(ROE)': number('roe'),
+                '总资产收益率(ROA)': number('roa'),
+                '资产负债率': number('debt_to_assets'),
+                '流动比率': number('current_ratio')
             }
         }
     except Exception as e:
@@ -969,33 +780,11 @@ def get_industry_comparison(symbol):
         symbol (str): 股票代码
         
     Returns:
-        pd.DataFrame: 行业对比数据
+        pd.DataFrame: 同行业公司的指标（索引为ts_code，列为pe/pb/ps/roe/roa）
     """
     try:
-        pro = ts.pro_api()
-        # 获取公司所属行业
-        company = pro.stock_company(ts_code=symbol)
-        if company.empty:
-            return None
-            
-        industry = company['industry'].iloc[0]
-        
-        # 获取同行业公司列表
-        industry_companies = pro.stock_company(industry=industry)
-        
-        # 获取行业公司财务指标
-        industry_data = []
-        for ts_code in industry_companies['ts_code']:
-            basic = pro.daily_basic(ts_code=ts_code, 
-                                  fields='ts_code,trade_date,pe,pb,ps,roe,roa')
-            if not basic.empty:
-                industry_data.append(basic.iloc[0])
-        
-        if not industry_data:
-            return None
-            
-        df = pd.DataFrame(industry_data)
-        return df
+        # 全市场每日指标每个交易日只请求一次，同行业公司从中分组筛选
+        return industry_comparison(symbol)
         
     except Exception as e:
         st.error(f"获取行业对比数据时出错: {str(e)}")
@@ -1012,27 +801,20 @@ def get_shareholder_structure(symbol):
         pd.DataFrame: 股东结构数据
     """
     try:
-        pro = ts.pro_api()
-        # 获取十大股东数据
-        top10 = pro.top10_holders(ts_code=symbol)
-        # 获取十大流通股东数据
-        top10_float = pro.top10_floatholders(ts_code=symbol)
-        
-        return {
-            'top10_holders': top10,
-            'top10_float_holders': top10_float
-        }
+        # 十大股东和十大流通股东按股票缓存，出现新报告期后才重新请求
+        return get_holders(symbol)
     except Exception as e:
         st.error(f"获取股东结构数据时出错: {str(e)}")
         return None
 
-def analyze_buy_sell_signals(df, company_info=None):
+def analyze_buy_sell_signals(df, company_info=None, sentiment=None):
     """
     分析买卖点信号
     
     Args:
         df (pd.DataFrame): 股票数据
         company_info (dict): 公司基本面信息
+        sentiment (pd.DataFrame): 该股票按日期的新闻情绪（情绪面板中该股票的部分，见get_market_sentiment）
         
     Returns:
         dict: 买卖点分析结果
@@ -1161,6 +943,17 @@ def analyze_buy_sell_signals(df, company_info=None):
             signals['sell_signals'].append(f"ROE较低 ({roe:.2f}%)")
             signals['score'] -= 5
     
+    # 新闻情绪分析（如果有情绪数据）：最近3个有新闻的日期
+    if sentiment is not None and not sentiment.empty:
+        recent = sentiment.sort_index().tail(3)
+        net = (recent['positive'].sum() - recent['negative'].sum()) / recent['news_count'].sum()
+        if net >= 0.3:
+            signals['buy_signals'].append(f"近期新闻偏利好 ({net:.0%})")
+            signals['score'] += 5
+        elif net <= -0.3:
+            signals['sell_signals'].append(f"近期新闻偏利空 ({net:.0%})")
+            signals['score'] -= 5
+    
     # 综合评分，给出建议
     if signals['score'] >= 30:
         signals['recommendation'] = "强烈买入"
@@ -1237,8 +1030,8 @@ def plot_buy_sell_points(df):
             angle = np.degrees(np.arctan2(dy, dx))
             ma5_angle.append(angle)
         
-        # 将角度数据添加到DataFrame中
-        df['MA5_Angle'] = [None]*5 + ma5_angle
+        # 角度按K线序号对齐，保存在局部列表中，不写入共享的指标表
+        ma5_angle = [None]*5 + ma5_angle
         
         # 遍历数据寻找买卖点
         for i in range(20, len(df)):
@@ -1247,9 +1040,9 @@ def plot_buy_sell_points(df):
             reverse_ma_alignment = (df['MA5'].iloc[i] < df['MA10'].iloc[i] < df['MA20'].iloc[i])
             
             # 计算角度变化
-            if df['MA5_Angle'].iloc[i] is not None:
-                angle = df['MA5_Angle'].iloc[i]
-                prev_angle = df['MA5_Angle'].iloc[i-1] if df['MA5_Angle'].iloc[i-1] is not None else 0
+            if ma5_angle[i] is not None:
+                angle = ma5_angle[i]
+                prev_angle = ma5_angle[i-1] if ma5_angle[i-1] is not None else 0
                 
                 # 买入条件：
                 # 1. 均线多头排列
@@ -1743,25 +1536,68 @@ def generate_analysis_report(df, stock_symbol, market_type, company_info=None, n
     buffer.seek(0)
     return buffer.getvalue()
 
+@st.cache_data(ttl=5)
+def get_watchlist_quotes(symbols, market_type):
+    """
+    获取自选股实时行情，按数据源单次请求的最大代码数批量获取，5秒内重复调用直接使用缓存
+    
+    Args:
+        symbols (tuple): 股票代码
+        market_type (str): 市场类型
+        
+    Returns:
+        pd.DataFrame: 实时行情，见data.realtime.get_realtime_batch
+    """
+    return get_realtime_batch(list(symbols), market_type)
+
+def plot_watchlist_heatmap(quotes):
+    """
+    绘制自选股涨跌幅热力图：面积为成交额，颜色为涨跌幅（红涨绿跌）
+    
+    Args:
+        quotes (pd.DataFrame): 实时行情
+        
+    Returns:
+        go.Figure: 热力图
+    """
+    change = quotes['change_pct'].fillna(0)
+    amount = quotes['amount'].fillna(0)
+    # 成交额缺失时各股票面积相同
+    values = amount if amount.sum() > 0 else pd.Series(1, index=quotes.index)
+    labels = [f"{name}<br>{symbol}" if name != symbol else symbol
+              for symbol, name in zip(quotes.index, quotes['name'])]
+    
+    fig = go.Figure(go.Treemap(
+        labels=labels,
+        parents=[''] * len(quotes),
+        values=values.values,
+        text=[f"{pct:+.2f}%" for pct in change],
+        textinfo='label+text',
+        marker=dict(
+            colors=change.values,
+            colorscale=[[0, 'green'], [0.5, 'white'], [1, 'red']],
+            cmid=0,
+            cmin=-10,
+            cmax=10
+        )
+    ))
+    fig.update_layout(title='自选股涨跌幅', height=500, margin=dict(t=40, l=0, r=0, b=0))
+    return fig
+
 # 主程序
 try:
-    # 获取数据
-    df = get_stock_data(stock_symbol, start_date, end_date, market_type)
+    # 获取数据（已按选择的日期范围筛选）
+    df = context.bars
     
     if df is not None:
-        # 确保数据按照选择的日期范围进行筛选
-        df = df.set_index('date')  # 将date列设置为索引
-        df = df.loc[pd.Timestamp(start_date):pd.Timestamp(end_date)]
-        df = df.reset_index()  # 重置索引，使date重新成为列
-        
         # 移动分析按钮的处理逻辑到分析报告标签页
         with tab5:
             if analyze_button:
                 with st.spinner("正在进行深度分析，请稍候..."):
-                    # 计算指标
-                    df = calculate_indicators(df)
+                    # 使用本次运行已计算的指标
+                    analysis_df = context.indicators
                     
-                    if df is not None:
+                    if analysis_df is not None:
                         # 获取公司信息
                         company_info = get_company_info(stock_symbol) if market_type == "A股" else None
                         
@@ -1769,8 +1605,12 @@ try:
                         news_analyzer = NewsAnalyzer(stock_symbol, market_type)
                         news_summary = news_analyzer.get_news_summary(days=7)
                         
+                        # 按日期的新闻情绪（直接使用刚获取并缓存的新闻）
+                        news_panel = get_market_sentiment([stock_symbol], days=7, market_type=market_type, refresh=False)
+                        sentiment = news_panel.xs(stock_symbol) if not news_panel.empty else None
+                        
                         # 生成PDF报告
-                        pdf_content = generate_analysis_report(df, stock_symbol, market_type, company_info, news_summary)
+                        pdf_content = generate_analysis_report(analysis_df, stock_symbol, market_type, company_info, news_summary)
                         
                         # 显示分析结果
                         st.success("分析完成！")
@@ -1788,7 +1628,7 @@ try:
                         
                         # 技术面分析
                         st.write("**技术面分析**")
-                        signals = analyze_buy_sell_signals(df, company_info)
+                        signals = analyze_buy_sell_signals(analysis_df, company_info, sentiment)
                         st.write(f"综合建议：{signals['recommendation']}")
                         st.write(f"评分：{signals['score']}")
                         st.write(f"原因：{signals['reason']}")
@@ -1807,7 +1647,7 @@ try:
                         
                         # 显示K线图和买卖点
                         st.subheader("K线图与买卖点分析")
-                        fig_buy_sell = plot_buy_sell_points(df)
+                        fig_buy_sell = plot_buy_sell_points(analysis_df)
                         st.plotly_chart(fig_buy_sell, use_container_width=True)
                         
                         # 如果有公司信息，显示基本面分析
@@ -1840,8 +1680,8 @@ try:
         if len(df) < 2:
             st.error("选择的日期范围内没有足够的数据，请扩大日期范围")
         else:
-            # 计算指标
-            df = calculate_indicators(df)
+            # 计算指标（深度分析已计算过时直接复用）
+            df = context.indicators
             
             if df is not None:
                 # 技术分析标签页
@@ -2025,10 +1865,10 @@ try:
                         
                         # 显示行业对比
                         st.subheader("行业对比分析")
-                        industry_comparison = get_industry_comparison(stock_symbol)
-                        if industry_comparison is not None:
+                        peers = get_industry_comparison(stock_symbol)
+                        if peers is not None:
                             # 计算行业平均值
-                            industry_avg = industry_comparison.mean()
+                            industry_avg = peers.mean()
                             
                             # 创建对比图表
                             fig = go.Figure()
@@ -2092,15 +1932,23 @@ try:
                     col1, col2, col3 = st.columns([1, 2, 1])
                     
                     with col2:
-                        # 选择战法类型
+                        # 选择战法类型（内置规则及自定义规则）
+                        strategy_rules = get_strategy_rules()
                         strategy_type = st.selectbox(
                             "选择战法类型",
-                            ["低吸战法", "龙头战法", "首板战法", "接力战法"]
+                            list(strategy_rules)
                         )
                         
                         # 创建分析器实例
                         analyzer = StrategyAnalyzer()
                         
+                        # 收盘指标快照状态
+                        snapshot_meta = load_snapshot_meta()
+                        if is_fresh(snapshot_meta):
+                            st.info(f"将基于 {snapshot_meta['trade_date']} 收盘指标快照筛选（{snapshot_meta['codes']} 只股票）")
+                        else:
+                            st.info("未找到最新的收盘指标快照，将实时获取数据并计算指标。可在收盘后运行 python -m strategy.snapshot 生成快照")
+                        
                         # 刷新按钮
                         if st.button("开始分析", type="primary"):
                             with st.spinner("正在分析中..."):
@@ -2108,15 +1956,8 @@ try:
                                 progress_bar = st.progress(0)
                                 status_text = st.empty()
                                 
-                                # 根据选择的战法类型进行分析
-                                if strategy_type == "低吸战法":
-                                    results = analyzer.low_suction_strategy()
-                                elif strategy_type == "龙头战法":
-                                    results = analyzer.leader_strategy()
-                                elif strategy_type == "首板战法":
-                                    results = analyzer.first_board_strategy()
-                                else:  # 接力战法
-                                    results = analyzer.relay_strategy()
+                                # 根据选择的战法规则进行分析
+                                results = analyzer.run_strategy(strategy_rules[strategy_type])
                                 
                                 # 更新进度条
                                 progress_bar.progress(100)
@@ -2156,12 +1997,12 @@ try:
                             # 创建分析器实例
                             analyzer = StrategyAnalyzer()
                             
-                            # 获取股票数据
-                            df = get_stock_data(stock_symbol, start_date, end_date, market_type)
+                            # 使用本次运行已获取的K线
+                            bars = context.bars
                             
-                            if df is not None:
-                                # 计算技术指标
-                                df = calculate_indicators(df)
+                            if bars is not None:
+                                # 与其他标签页共用已计算的技术指标
+                                df = context.indicators
                                 
                                 if df is not None:
                                     # 获取最新数据
@@ -2267,6 +2108,30 @@ try:
                                 st.error("获取股票数据失败")
                     else:
                         st.info('点击侧边栏的"主力行为分析"按钮开始分析')
+    
+    # 自选股标签页：与当前分析的股票无关，始终显示
+    with tab7:
+        st.header("自选股行情")
+        watchlist_text = st.text_area("自选股代码（每行一个，或用逗号分隔）", value=stock_symbol, key='watchlist_text')
+        watchlist = [code.strip() for code in watchlist_text.replace(',', '\n').replace('，', '\n').splitlines()
+                     if code.strip()]
+        if watchlist:
+            quotes = get_watchlist_quotes(tuple(watchlist), market_type)
+            if quotes.empty:
+                st.warning("未获取到自选股行情")
+            else:
+                missing = len(set(watchlist)) - len(quotes)
+                st.write(f"**共 {len(quotes)} 只股票**" + (f"（{missing} 只未获取到行情）" if missing > 0 else ""))
+                st.plotly_chart(plot_watchlist_heatmap(quotes), use_container_width=True)
+                st.dataframe(
+                    quotes.sort_values('change_pct', ascending=False).rename(columns={
+                        'name': '名称', 'open': '开盘价', 'high': '最高价', 'low': '最低价', 'price': '最新价',
+                        'pre_close': '昨收', 'volume': '成交量', 'amount': '成交额', 'time': '时间',
+                        'change_pct': '涨跌幅(%)'
+                    })
+                )
+        else:
+            st.info("请输入自选股代码")
 
 except Exception as e:
     st.error(f"程序运行出错: {str(e)}") 
\ No newline at end of file
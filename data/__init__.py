@@ -0,0 +1,3 @@
+"""
+数据获取与存储模块
+"""
\ No newline at end of file
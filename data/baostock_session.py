@@ -0,0 +1,151 @@
+"""
+baostock会话管理
+
+baostock客户端是进程内全局的单连接，多线程同时login/logout或交叉读取结果集会互相干扰。
+这里维护一个长期复用的登录会话：所有查询串行执行并在锁内读完结果集，
+空闲过久或遇到未登录、网络错误时自动重新登录。
+"""
+import atexit
+import threading
+import time
+from contextlib import contextmanager
+
+import baostock as bs
+import pandas as pd
+
+# 未登录错误码
+ERROR_NOT_LOGIN = '10001001'
+
+# 网络类错误码前缀（连接断开、收发超时等）
+ERROR_NETWORK_PREFIX = '10002'
+
+# 空闲超过该时长（秒）后先重新登录再查询
+MAX_IDLE = 600
+
+
+class BaostockSession:
+    """
+    baostock会话管理类
+    """
+    def __init__(self, max_idle=MAX_IDLE, max_retries=1):
+        """
+        初始化会话管理器
+
+        Args:
+            max_idle (int): 最长空闲时间（秒），超过后重新登录
+            max_retries (int): 会话失效时重新登录后的重试次数
+        """
+        self.max_idle = max_idle
+        self.max_retries = max_retries
+        self.logged_in = False
+        self.last_active = 0
+        self.login_count = 0
+        self.query_count = 0
+        self._lock = threading.RLock()
+
+    def _login(self):
+        """
+        登录baostock
+        """
+        lg = bs.login()
+        if lg.error_code != '0':
+            self.logged_in = False
+            raise ConnectionError(f"baostock登录失败: {lg.error_msg}")
+        self.logged_in = True
+        self.last_active = time.time()
+        self.login_count += 1
+
+    def _ensure_login(self):
+        """
+        健康检查：未登录或空闲过久时重新登录
+        """
+        if not self.logged_in or time.time() - self.last_active > self.max_idle:
+            self._login()
+
+    @staticmethod
+    def _is_session_error(error_code):
+        """
+        判断错误码是否表示会话失效，需要重新登录
+        """
+        return error_code == ERROR_NOT_LOGIN or error_code.startswith(ERROR_NETWORK_PREFIX)
+
+    @contextmanager
+    def session(self):
+        """
+        获取已登录的会话，期间独占baostock客户端
+
+        Yields:
+            module: baostock模块
+        """
+        with self._lock:
+            self._ensure_login()
+            try:
+                yield bs
+            finally:
+                self.last_active = time.time()
+
+    def query(self, method, *args, **kwargs):
+        """
+        执行baostock查询并读完全部结果
+
+        Args:
+            method (str): baostock查询函数名，如 query_history_k_data_plus
+            *args: 查询参数
+            **kwargs: 查询参数
+
+        Returns:
+            pd.DataFrame: 查询结果，查询失败时返回None
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self.session() as client:
+                    self.query_count += 1
+                    rs = getattr(client, method)(*args, **kwargs)
+                    data_list = []
+                    while (rs.error_code == '0') & rs.next():
+                        data_list.append(rs.get_row_data())
+
+                    if rs.error_code == '0':
+                        return pd.DataFrame(data_list, columns=rs.fields)
+                    if not self._is_session_error(rs.error_code) or attempt == self.max_retries:
+                        print(f'baostock查询 {method} 失败: {rs.error_msg}')
+                        return None
+                    # 会话失效，下次循环重新登录
+                    self.logged_in = False
+            except Exception as e:
+                self.logged_in = False
+                if attempt == self.max_retries:
+                    print(f'baostock查询 {method} 出错: {str(e)}')
+                    return None
+        return None
+
+    def logout(self):
+        """
+        登出baostock
+        """
+        with self._lock:
+            if self.logged_in:
+                try:
+                    bs.logout()
+                except Exception as e:
+                    print(f'baostock登出出错: {str(e)}')
+                self.logged_in = False
+
+
+_default_session = None
+_default_session_lock = threading.Lock()
+
+
+def get_baostock_session():
+    """
+    获取进程内共享的baostock会话
+
+    Returns:
+        BaostockSession: baostock会话
+    """
+    global _default_session
+    with _default_session_lock:
+        if _default_session is None:
+            _default_session = BaostockSession()
+            atexit.register(_default_session.logout)
+        return _default_session
@@ -0,0 +1,373 @@
+"""
+K线数据本地存储
+
+按 市场/周期_复权方式/股票代码 分区把K线保存为Parquet文件，并记录已覆盖的日期区间。
+查询时先读本地文件，只向数据源请求缺失的日期区间，再合并写回。
+界面和战法分析器共用同一份存储，列名和单位统一为：
+date, Open, High, Low, Close, Volume（股）, Amount（元）, Turn（换手率%）
+"""
+import threading
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from data.storage import cache_path, read_json, read_parquet, write_json, write_parquet
+
+# 市场类型对应的分区目录
+MARKET_DIRS = {
+    'A股': 'cn',
+    '港股': 'hk',
+    '美股': 'us'
+}
+
+# 各市场当日K线完整的时间（按北京时间）：(日期偏移, 时, 分)
+# 例如美股D日的K线要到D+1日早上6点才收盘完整
+SESSION_COMPLETE = {
+    'A股': (0, 15, 30),
+    '港股': (0, 16, 30),
+    '美股': (1, 6, 0)
+}
+
+# 盘中未收盘K线的缓存有效期（秒）
+INTRADAY_TTL = 300
+
+# 数据源发布日K线晚于收盘：最近收盘的这几个自然日内、最后一根返回K线之后的日期，
+# 在返回K线之前仍按未收盘处理，超出后才视为没有交易（节假日、停牌）
+PUBLISH_WINDOW_DAYS = 3
+
+# 周期和复权方式默认值：日线、不复权
+FREQ_DAILY = 'd'
+ADJUST_NONE = 'none'
+
+# 统一的K线列名
+BAR_COLUMNS = ['date', 'Open', 'High', 'Low', 'Close', 'Volume', 'Amount', 'Turn']
+
+# 各数据源列名到统一列名的映射
+COLUMN_ALIASES = {
+    'trade_date': 'date',
+    'Date': 'date',
+    'Datetime': 'date',
+    'open': 'Open',
+    'high': 'High',
+    'low': 'Low',
+    'close': 'Close',
+    'vol': 'Volume',
+    'volume': 'Volume',
+    'amount': 'Amount',
+    'turn': 'Turn'
+}
+
+
+def normalize_code(code, market_type='A股'):
+    """
+    统一股票代码格式，如 sz.300024 / 300024 统一为 300024.SZ
+
+    Args:
+        code (str): 股票代码
+        market_type (str): 市场类型
+
+    Returns:
+        str: 统一格式的股票代码
+    """
+    code = code.strip()
+    if market_type == 'A股':
+        if '.' in code:
+            left, right = code.split('.', 1)
+            # baostock格式：sh.600000
+            if left.lower() in ('sh', 'sz', 'bj'):
+                return f"{right}.{left.upper()}"
+            return f"{left}.{right.upper()}"
+        return f"{code}.SH" if code.startswith('6') else f"{code}.SZ"
+    if market_type == '港股':
+        return code.upper() if code.upper().endswith('.HK') else f"{code}.HK"
+    return code.upper()
+
+
+def to_baostock_code(code):
+    """
+    将统一格式的A股代码转换为baostock格式，如 600000.SH -> sh.600000
+    """
+    number, exchange = normalize_code(code).split('.')
+    return f"{exchange.lower()}.{number}"
+
+
+def normalize_columns(df):
+    """
+    将各数据源的K线列名统一为 date/Open/High/Low/Close/Volume/Amount/Turn
+
+    Args:
+        df (pd.DataFrame): 数据源返回的K线数据
+
+    Returns:
+        pd.DataFrame: 列名统一、按日期升序排列的K线数据
+    """
+    df = df.rename(columns=COLUMN_ALIASES)
+    df['date'] = pd.to_datetime(df['date'])
+    for col in BAR_COLUMNS[1:]:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    return df.sort_values('date').reset_index(drop=True)
+
+
+def to_lower_columns(df):
+    """
+    将统一列名转换为小写列名（open/high/low/close/volume/amount/turn）
+    """
+    return df.rename(columns={col: col.lower() for col in BAR_COLUMNS[1:]})
+
+
+def _to_day(value):
+    """
+    将日期统一转换为当天零点的Timestamp
+    """
+    return pd.Timestamp(value).normalize()
+
+
+def _fmt_day(day):
+    return day.strftime('%Y-%m-%d')
+
+
+def complete_until(market_type, now=None):
+    """
+    获取已收盘完整的最后一个交易日
+
+    Args:
+        market_type (str): 市场类型
+        now (datetime): 当前时间，默认为系统时间
+
+    Returns:
+        pd.Timestamp: 该日期及之前的K线不会再变化
+    """
+    now = now or datetime.now()
+    offset, hour, minute = SESSION_COMPLETE.get(market_type, SESSION_COMPLETE['A股'])
+    day = _to_day(now) - timedelta(days=offset)
+    if (now.hour, now.minute) < (hour, minute):
+        day -= timedelta(days=1)
+    return day
+
+
+class BarStore:
+    """
+    K线本地存储类
+    """
+    def __init__(self, root='bars', intraday_ttl=INTRADAY_TTL):
+        """
+        初始化K线存储
+
+        Args:
+            root (str): 缓存根目录下的子目录名
+            intraday_ttl (int): 未收盘K线的缓存有效期（秒）
+        """
+        self.root = root
+        self.intraday_ttl = intraday_ttl
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _paths(self, market_type, symbol, frequency, adjust):
+        """
+        获取分区的数据文件和元数据文件路径
+        """
+        market_dir = MARKET_DIRS.get(market_type, market_type)
+        partition = f"{frequency}_{adjust}"
+        data_path = cache_path(self.root, market_dir, partition, f"{symbol}.parquet")
+        meta_path = cache_path(self.root, market_dir, partition, f"{symbol}.json")
+        return data_path, meta_path
+
+    def _lock_for(self, *key):
+        """
+        获取分区锁，同一分区的读写串行，不同分区互不影响
+        """
+        with self._locks_guard:
+            if key not in self._locks:
+                self._locks[key] = threading.Lock()
+            return self._locks[key]
+
+    def load(self, market_type, symbol, frequency=FREQ_DAILY, adjust=ADJUST_NONE):
+        """
+        读取分区的全部本地数据
+
+        Args:
+            market_type (str): 市场类型
+            symbol (str): 股票代码
+            frequency (str): K线周期
+            adjust (str): 复权方式
+
+        Returns:
+            tuple: (pd.DataFrame 或 None, dict 元数据)
+        """
+        data_path, meta_path = self._paths(market_type, symbol, frequency, adjust)
+        df = read_parquet(data_path)
+        meta = read_json(meta_path, default={}) if df is not None else {}
+        meta.setdefault('covered', [])
+        return df, meta
+
+    def _missing_ranges(self, meta, start, end, market_type, now):
+        """
+        计算请求区间中本地尚未覆盖的日期区间
+
+        Returns:
+            list: [(开始日期, 结束日期), ...]
+        """
+        gaps = []
+        cursor = start
+        for covered_start, covered_end in sorted(meta['covered']):
+            covered_start, covered_end = _to_day(covered_start), _to_day(covered_end)
+            if covered_end < cursor:
+                continue
+            if covered_start > end:
+                break
+            if covered_start > cursor:
+                gaps.append((cursor, covered_start - timedelta(days=1)))
+            cursor = covered_end + timedelta(days=1)
+            if cursor > end:
+                break
+        if cursor <= end:
+            gaps.append((cursor, end))
+
+        # 未收盘部分在有效期内不重复请求
+        partial = meta.get('partial')
+        if not gaps or not partial:
+            return gaps
+        fetched_at = datetime.fromisoformat(partial['fetched_at'])
+        if (now - fetched_at).total_seconds() >= self.intraday_ttl:
+            return gaps
+        pending_from = _to_day(partial['start'])
+        result = []
+        for gap_start, gap_end in gaps:
+            gap_end = min(gap_end, pending_from - timedelta(days=1))
+            if gap_start <= gap_end:
+                result.append((gap_start, gap_end))
+        return result
+
+    def _mark_covered(self, meta, start, end, market_type, now, last_date=None):
+        """
+        记录已获取的日期区间，未收盘的部分单独记录获取时间
+
+        刚收盘、数据源还没有返回K线的日期（最后一根返回K线之后、PUBLISH_WINDOW_DAYS以内）
+        也按未收盘处理，有效期过后重新请求，直到返回该日的K线。
+        """
+        closed = complete_until(market_type, now)
+        pending_from = closed - timedelta(days=PUBLISH_WINDOW_DAYS - 1)
+        if last_date is not None and pd.notna(last_date):
+            pending_from = max(pending_from, _to_day(last_date) + timedelta(days=1))
+        pending_from = min(pending_from, closed + timedelta(days=1))
+        if end >= pending_from:
+            meta['partial'] = {
+                'start': _fmt_day(max(start, pending_from)),
+                'fetched_at': now.isoformat()
+            }
+            end = pending_from - timedelta(days=1)
+        if start > end:
+            return
+
+        intervals = sorted(
+            [(_to_day(s), _to_day(e)) for s, e in meta['covered']] + [(start, end)]
+        )
+        merged = [list(intervals[0])]
+        for s, e in intervals[1:]:
+            if s <= merged[-1][1] + timedelta(days=1):
+                merged[-1][1] = max(merged[-1][1], e)
+            else:
+                merged.append([s, e])
+        meta['covered'] = [[_fmt_day(s), _fmt_day(e)] for s, e in merged]
+
+    @staticmethod
+    def _merge(df, frames):
+        """
+        合并新旧数据，同一日期以新数据为准，新数据缺失的列保留旧值
+        """
+        merged = df.set_index('date') if df is not None else None
+        for frame in frames:
+            if frame is None or frame.empty:
+                continue
+            frame = normalize_columns(frame)
+            frame = frame.drop_duplicates(subset=['date'], keep='last').set_index('date')
+            merged = frame if merged is None else frame.combine_first(merged)
+        if merged is None:
+            return pd.DataFrame(columns=BAR_COLUMNS)
+        return merged.sort_index().reset_index()
+
+    @staticmethod
+    def _lacks_columns(df, start, end, require):
+        """
+        检查本地数据在请求区间内是否缺少必需的列（如其他数据源写入的数据没有换手率）
+        """
+        if not require or df is None or df.empty:
+            return False
+        window = df[(df['date'] >= start) & (df['date'] <= end)]
+        if window.empty:
+            return False
+        return any(col not in window.columns or window[col].isna().all() for col in require)
+
+    def get_bars(self, market_type, symbol, start, end, fetcher,
+                 frequency=FREQ_DAILY, adjust=ADJUST_NONE, require=None):
+        """
+        获取K线数据，优先读取本地，只请求缺失的日期区间
+
+        Args:
+            market_type (str): 市场类型
+            symbol (str): 股票代码（统一格式，见normalize_code）
+            start: 开始日期（含）
+            end: 结束日期（含）
+            fetcher (function): 数据源函数 fetcher(start, end)，
+                返回含date列的DataFrame，获取失败时返回None
+            frequency (str): K线周期
+            adjust (str): 复权方式
+            require (tuple): 必需的列，本地数据缺少时整段重新获取
+
+        Returns:
+            pd.DataFrame: 区间内的K线数据，本地无数据且获取失败时返回None
+        """
+        now = datetime.now()
+        start = _to_day(start)
+        end = min(_to_day(end), _to_day(now))
+
+        with self._lock_for(market_type, symbol, frequency, adjust):
+            df, meta = self.load(market_type, symbol, frequency, adjust)
+            if start > end:
+                gaps = []
+            elif self._lacks_columns(df, start, end, require):
+                gaps = [(start, end)]
+            else:
+                gaps = self._missing_ranges(meta, start, end, market_type, now)
+
+            frames = []
+            for gap_start, gap_end in gaps:
+                new_df = fetcher(gap_start, gap_end)
+                if new_df is None:
+                    # 获取失败，不记录覆盖区间，下次重试
+                    continue
+                frames.append(new_df)
+                last_date = normalize_columns(new_df)['date'].max() if not new_df.empty else None
+                self._mark_covered(meta, gap_start, gap_end, market_type, now, last_date)
+
+            if frames:
+                df = self._merge(df, frames)
+                data_path, meta_path = self._paths(market_type, symbol, frequency, adjust)
+                write_parquet(df, data_path)
+                write_json(meta, meta_path)
+
+        if df is None:
+            return None
+        if df.empty:
+            return df.copy()
+        mask = (df['date'] >= start) & (df['date'] <= end)
+        return df.loc[mask].reset_index(drop=True)
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_bar_store():
+    """
+    获取进程内共享的K线存储实例
+
+    Returns:
+        BarStore: K线存储
+    """
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = BarStore()
+        return _default_store
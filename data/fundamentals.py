@@ -0,0 +1,359 @@
+"""
+全市场基本面数据
+
+每个交易日只向tushare请求一次全市场的每日指标（daily_basic）、股票列表（stock_basic）和
+公司资料（stock_company），财务指标（fina_indicator）按报告期整批请求，都保存到本地缓存目录，
+合并为一张以ts_code为索引的全市场表。公司信息、行业对比都从这张表查询，不再逐只请求。
+
+十大股东只能按股票请求，按股票缓存，只有出现新的报告期后才重新请求。
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from data.bar_store import complete_until, normalize_code
+from data.storage import cache_path, read_json, read_parquet, write_json, write_parquet
+from data.tushare_client import get_tushare_client
+
+# 缓存子目录
+FUNDAMENTALS_DIR = 'fundamentals'
+
+# 全市场每日指标的字段
+DAILY_BASIC_FIELDS = 'ts_code,trade_date,close,turnover_rate,pe,pe_ttm,pb,ps,ps_ttm,dv_ratio,total_mv,circ_mv'
+
+# 股票列表字段
+STOCK_BASIC_FIELDS = 'ts_code,symbol,name,industry,list_date'
+
+# 公司资料字段，按交易所整批请求
+STOCK_COMPANY_FIELDS = 'ts_code,chairman,manager,main_business,province,city,website'
+EXCHANGES = ('SSE', 'SZSE', 'BSE')
+
+# 财务指标字段，按报告期整批请求
+FINA_INDICATOR_FIELDS = 'ts_code,end_date,roe,roa,debt_to_assets,current_ratio'
+
+# 各报告期（月日）的法定披露截止日：(报告期后第几年, 月, 日)，截止后的数据不再变化
+REPORT_DEADLINES = {
+    '0331': (0, 4, 30),
+    '0630': (0, 8, 31),
+    '0930': (0, 10, 31),
+    '1231': (1, 4, 30)
+}
+
+# 十大股东和十大流通股东接口
+HOLDER_TABLES = {
+    'top10_holders': 'top10_holders',
+    'top10_float_holders': 'top10_floatholders'
+}
+
+# 行业对比使用的指标，数据源没有的指标为空值
+COMPARISON_FIELDS = ['pe', 'pb', 'ps', 'roe', 'roa']
+
+# 从最近收盘日向前查找有数据的交易日的最大天数（跳过周末和节假日）
+LOOKBACK_DAYS = 10
+
+# 最近收盘日的每日指标还没有发布、使用了更早交易日的数据时，进程内缓存的有效期（秒）
+FALLBACK_TTL = 600
+
+# 进程内缓存：{最近收盘日: (数据交易日 YYYYMMDD, 合并后的全市场表, 生成时间)}
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+def _day_str(day):
+    return pd.Timestamp(day).strftime('%Y%m%d')
+
+
+def _load_or_fetch(name, day, fetch):
+    """
+    读取某日的缓存表，没有缓存时请求数据源并保存；数据源返回空表时不缓存
+
+    Args:
+        name (str): 数据名称，即缓存子目录
+        day (str): 交易日 YYYYMMDD
+        fetch (function): 请求数据源的函数
+
+    Returns:
+        pd.DataFrame: 数据，没有数据时返回None
+    """
+    path = cache_path(FUNDAMENTALS_DIR, name, f"{day}.parquet")
+    df = read_parquet(path)
+    if df is not None:
+        return df
+    try:
+        df = fetch()
+    except Exception as e:
+        print(f"获取{name}数据时出错: {str(e)}")
+        return None
+    if df is None or df.empty:
+        return None
+    write_parquet(df, path)
+    return df
+
+
+def get_daily_basic(trade_date=None, pro=None):
+    """
+    获取全市场某个交易日的每日指标，一次请求全部股票
+
+    Args:
+        trade_date (datetime): 交易日，默认为最近一个有数据的已收盘交易日
+        pro: tushare接口，默认使用共享的tushare客户端
+
+    Returns:
+        tuple: (pd.DataFrame 每日指标, str 交易日 YYYYMMDD)，没有数据时为 (None, None)
+    """
+    pro = pro or get_tushare_client()
+    if trade_date is not None:
+        days = [_day_str(trade_date)]
+    else:
+        last = complete_until('A股')
+        days = [_day_str(last - timedelta(days=i)) for i in range(LOOKBACK_DAYS)]
+
+    for day in days:
+        if pd.Timestamp(day).weekday() >= 5:
+            continue
+        df = _load_or_fetch('daily_basic', day,
+                            lambda day=day: pro.daily_basic(trade_date=day, fields=DAILY_BASIC_FIELDS))
+        if df is not None:
+            return df, day
+    return None, None
+
+
+def get_stock_industries(trade_date, pro=None):
+    """
+    获取上市股票列表及所属行业，按交易日缓存
+
+    Args:
+        trade_date (str): 交易日 YYYYMMDD
+        pro: tushare接口，默认使用共享的tushare客户端
+
+    Returns:
+        pd.DataFrame: 股票列表，没有数据时返回None
+    """
+    pro = pro or get_tushare_client()
+    return _load_or_fetch('stock_basic', trade_date,
+                          lambda: pro.stock_basic(exchange='', list_status='L', fields=STOCK_BASIC_FIELDS))
+
+
+def get_stock_companies(trade_date, pro=None):
+    """
+    获取全部上市公司资料，按交易所整批请求，按交易日缓存
+
+    Args:
+        trade_date (str): 交易日 YYYYMMDD
+        pro: tushare接口，默认使用共享的tushare客户端
+
+    Returns:
+        pd.DataFrame: 公司资料，没有数据时返回None
+    """
+    pro = pro or get_tushare_client()
+
+    def fetch():
+        frames = [pro.stock_company(exchange=exchange, fields=STOCK_COMPANY_FIELDS) for exchange in EXCHANGES]
+        frames = [df for df in frames if df is not None and not df.empty]
+        return pd.concat(frames, ignore_index=True) if frames else None
+
+    return _load_or_fetch('stock_company', trade_date, fetch)
+
+
+def report_periods(now=None, count=4):
+    """
+    获取最近的报告期，及其数据是否已过披露截止日
+
+    Args:
+        now (datetime): 当前时间，默认为系统时间
+        count (int): 报告期数量
+
+    Returns:
+        list: [(报告期 YYYYMMDD, 是否已过披露截止日)]，从新到旧
+    """
+    today = pd.Timestamp(now or datetime.now()).normalize()
+    periods = []
+    quarter_end = (today + pd.offsets.QuarterEnd(0)).normalize()
+    if quarter_end >= today:
+        quarter_end = (quarter_end - pd.offsets.QuarterEnd(1)).normalize()
+    while len(periods) < count:
+        year_offset, month, day = REPORT_DEADLINES[quarter_end.strftime('%m%d')]
+        deadline = pd.Timestamp(quarter_end.year + year_offset, month, day)
+        periods.append((_day_str(quarter_end), today > deadline))
+        quarter_end = (quarter_end - pd.offsets.QuarterEnd(1)).normalize()
+    return periods
+
+
+def get_fina_indicators(pro=None, now=None):
+    """
+    获取全市场最新的财务指标，每只股票取已披露的最近一期
+
+    已过披露截止日的报告期只请求一次；仍在披露期内的报告期每天更新一次。
+
+    Args:
+        pro: tushare接口，默认使用共享的tushare客户端
+        now (datetime): 当前时间，默认为系统时间
+
+    Returns:
+        pd.DataFrame: 财务指标，没有数据时返回None
+    """
+    pro = pro or get_tushare_client()
+    today = _day_str(now or datetime.now())
+    frames = []
+    for period, final in report_periods(now):
+        key = period if final else f"{period}_{today}"
+        df = _load_or_fetch('fina_indicator', key,
+                            lambda period=period: pro.fina_indicator_vip(period=period, fields=FINA_INDICATOR_FIELDS))
+        if df is not None:
+            frames.append(df)
+        # 已过截止日的报告期覆盖了全部股票，更早的报告期不再需要
+        if final and df is not None:
+            break
+    if not frames:
+        return None
+    fina = pd.concat(frames, ignore_index=True)
+    return fina.sort_values('end_date', ascending=False).drop_duplicates(subset=['ts_code'])
+
+
+def _join(table, extra, columns):
+    """
+    按ts_code合并附加数据的指定列，附加数据缺失时对应列为空值
+    """
+    if extra is None or extra.empty:
+        return table.assign(**{col: None for col in columns})
+    extra = extra.drop_duplicates(subset=['ts_code']).set_index('ts_code')
+    return table.join(extra.reindex(columns=columns))
+
+
+def get_market_fundamentals(pro=None):
+    """
+    获取最近一个交易日的全市场基本面表（每日指标合并股票列表、公司资料和财务指标），进程内按交易日缓存
+
+    最近收盘日的每日指标还没有发布时使用更早交易日的数据，这样的表只缓存FALLBACK_TTL秒，
+    之后重新检查，数据发布后即改用当日的表。
+
+    Args:
+        pro: tushare接口，默认使用共享的tushare客户端
+
+    Returns:
+        pd.DataFrame: 索引为ts_code，没有数据时返回None
+    """
+    as_of = complete_until('A股')
+    with _tables_lock:
+        if as_of in _tables:
+            day, table, built_at = _tables[as_of]
+            if day == _day_str(pd.offsets.BDay().rollback(as_of)) or time.monotonic() - built_at < FALLBACK_TTL:
+                return table
+
+    basic, day = get_daily_basic(pro=pro)
+    if basic is None:
+        return None
+    table = basic.drop_duplicates(subset=['ts_code']).set_index('ts_code')
+    table = _join(table, get_stock_industries(day, pro=pro), ['name', 'industry', 'list_date'])
+    table = _join(table, get_stock_companies(day, pro=pro), ['chairman', 'main_business'])
+    table = _join(table, get_fina_indicators(pro=pro), ['end_date', 'roe', 'roa', 'debt_to_assets', 'current_ratio'])
+
+    with _tables_lock:
+        # 只保留最近一个交易日
+        _tables.clear()
+        _tables[as_of] = (day, table, time.monotonic())
+    return table
+
+
+def company_fundamentals(symbol, pro=None):
+    """
+    获取一只股票在全市场基本面表中的一行
+
+    Args:
+        symbol (str): 股票代码
+        pro: tushare接口，默认使用共享的tushare客户端
+
+    Returns:
+        pd.Series: 该股票的基本面数据，找不到时返回None
+    """
+    table = get_market_fundamentals(pro=pro)
+    code = normalize_code(symbol)
+    if table is None or code not in table.index:
+        return None
+    return table.loc[code]
+
+
+def industry_comparison(symbol, fields=COMPARISON_FIELDS, pro=None):
+    """
+    获取股票所在行业全部公司的指标
+
+    Args:
+        symbol (str): 股票代码
+        fields (list): 指标列
+        pro: tushare接口，默认使用共享的tushare客户端
+
+    Returns:
+        pd.DataFrame: 索引为ts_code、列为fields的同行业公司指标，找不到股票或行业时返回None
+    """
+    table = get_market_fundamentals(pro=pro)
+    code = normalize_code(symbol)
+    if table is None or code not in table.index:
+        return None
+    industry = table.at[code, 'industry']
+    if pd.isna(industry):
+        return None
+    peers = table[table['industry'] == industry]
+    return peers.reindex(columns=list(fields)).apply(pd.to_numeric, errors='coerce')
+
+
+def industry_summary(fields=COMPARISON_FIELDS, pro=None):
+    """
+    全市场各行业的指标均值和公司数量
+
+    Args:
+        fields (list): 指标列
+        pro: tushare接口，默认使用共享的tushare客户端
+
+    Returns:
+        pd.DataFrame: 索引为行业，列为fields各指标的均值及companies（公司数量）
+    """
+    table = get_market_fundamentals(pro=pro)
+    if table is None:
+        return None
+    values = table.reindex(columns=list(fields)).apply(pd.to_numeric, errors='coerce')
+    grouped = values.groupby(table['industry'])
+    summary = grouped.mean()
+    summary['companies'] = grouped.size()
+    return summary
+
+
+def get_holders(symbol, pro=None, now=None):
+    """
+    获取十大股东和十大流通股东，按股票缓存
+
+    缓存中已有最近一个报告期的数据时直接返回；否则每天最多请求一次，直到新报告期的数据披露。
+
+    Args:
+        symbol (str): 股票代码
+        pro: tushare接口，默认使用共享的tushare客户端
+        now (datetime): 当前时间，默认为系统时间
+
+    Returns:
+        dict: {'top10_holders': pd.DataFrame, 'top10_float_holders': pd.DataFrame}
+    """
+    code = normalize_code(symbol)
+    today = _day_str(now or datetime.now())
+    latest_period = report_periods(now, count=1)[0][0]
+    meta_path = cache_path(FUNDAMENTALS_DIR, 'holders', code, 'meta.json')
+    meta = read_json(meta_path, default={})
+
+    holders = {}
+    for key, api in HOLDER_TABLES.items():
+        path = cache_path(FUNDAMENTALS_DIR, 'holders', code, f"{key}.parquet")
+        df = read_parquet(path)
+        has_latest = df is not None and not df.empty and str(df['end_date'].max()) >= latest_period
+        if df is None or (not has_latest and meta.get(key) != today):
+            try:
+                fetched = getattr(pro or get_tushare_client(), api)(ts_code=code)
+            except Exception as e:
+                print(f"获取{code}股东数据时出错: {str(e)}")
+                fetched = None
+            if fetched is not None:
+                df = fetched
+                write_parquet(df, path)
+                meta[key] = today
+        holders[key] = df if df is not None else pd.DataFrame()
+    write_json(meta, meta_path)
+    return holders
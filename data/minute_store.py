@@ -0,0 +1,298 @@
+"""
+分钟K线本地存储及盘中分时会话
+
+分钟K线按 市场/m周期/股票代码/日期.parquet 保存，每个交易日一个文件，收盘后写入，之后不再变化。
+历史交易日的分钟K线缺失时一次请求补齐，用于计算平均累计成交量曲线（按时段校正的相对成交量）。
+盘中每只被查看的股票在进程内保留一个 IntradaySession：首次查看时加载当日已保存的K线
+或向baostock请求一次当日K线，之后由实时行情轮询逐条合成新K线，不再重复下载当日K线。
+"""
+import os
+import threading
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from analysis.intraday import MINUTE_COLUMNS, IntradaySession, VolumeCurve
+from data.bar_store import MARKET_DIRS, complete_until, normalize_code, to_baostock_code
+from data.baostock_session import get_baostock_session
+from data.storage import CACHE_DIR, cache_path, read_parquet, write_parquet
+
+# 缓存子目录
+MINUTE_DIR = 'bars'
+
+# 盘中分时使用的K线周期（分钟）
+INTRADAY_FREQ = 5
+
+# 支持分时会话的市场（目前只有A股有分钟K线数据源）
+INTRADAY_MARKETS = ('A股',)
+
+# 成交量曲线平均的交易日数
+VOLUME_CURVE_DAYS = 20
+
+
+class MinuteBarStore:
+    """
+    分钟K线存储类，每只股票每个交易日一个文件
+    """
+    def _parts(self, symbol, market_type, freq):
+        return MINUTE_DIR, MARKET_DIRS[market_type], f"m{freq}", normalize_code(symbol, market_type)
+
+    def _path(self, symbol, market_type, freq, day):
+        return cache_path(*self._parts(symbol, market_type, freq), f"{pd.Timestamp(day):%Y-%m-%d}.parquet")
+
+    def save(self, symbol, market_type, freq, day, df):
+        """
+        保存一个交易日的分钟K线
+
+        Args:
+            symbol (str): 股票代码
+            market_type (str): 市场类型
+            freq (int): K线周期（分钟）
+            day: 交易日
+            df (pd.DataFrame): 列为 time, open, high, low, close, volume, amount
+        """
+        if df is None or df.empty:
+            return
+        write_parquet(df[MINUTE_COLUMNS], self._path(symbol, market_type, freq, day))
+
+    def load(self, symbol, market_type, freq, day):
+        """
+        读取一个交易日的分钟K线
+
+        Returns:
+            pd.DataFrame: 分钟K线，没有保存时返回None
+        """
+        return read_parquet(self._path(symbol, market_type, freq, day))
+
+    def days(self, symbol, market_type, freq):
+        """
+        获取已保存的交易日
+
+        Returns:
+            list: 交易日（pd.Timestamp），从旧到新
+        """
+        directory = os.path.join(CACHE_DIR, *self._parts(symbol, market_type, freq))
+        if not os.path.isdir(directory):
+            return []
+        return sorted(pd.Timestamp(name[:-len('.parquet')])
+                      for name in os.listdir(directory) if name.endswith('.parquet'))
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_minute_store():
+    """
+    获取进程内共享的分钟K线存储
+
+    Returns:
+        MinuteBarStore: 分钟K线存储
+    """
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = MinuteBarStore()
+        return _default_store
+
+
+def fetch_minute_bars(symbol, start, end=None, freq=INTRADAY_FREQ):
+    """
+    向baostock请求分钟K线
+
+    Args:
+        symbol (str): 股票代码
+        start: 开始日期
+        end: 结束日期，默认与开始日期相同（只请求一个交易日）
+        freq (int): K线周期（分钟），baostock支持5、15、30、60
+
+    Returns:
+        pd.DataFrame: 列为 time（K线结束时间）, open, high, low, close, volume, amount，失败时返回None
+    """
+    bars = get_baostock_session().query(
+        'query_history_k_data_plus',
+        to_baostock_code(normalize_code(symbol)),
+        "time,open,high,low,close,volume,amount",
+        start_date=pd.Timestamp(start).strftime('%Y-%m-%d'),
+        end_date=pd.Timestamp(end if end is not None else start).strftime('%Y-%m-%d'),
+        frequency=str(freq)
+    )
+    if bars is None:
+        return None
+    if bars.empty:
+        return pd.DataFrame(columns=MINUTE_COLUMNS)
+    df = bars[MINUTE_COLUMNS[1:]].apply(pd.to_numeric, errors='coerce')
+    # baostock时间格式为 YYYYMMDDHHMMSSsss
+    df.insert(0, 'time', pd.to_datetime(bars['time'].str[:14], format='%Y%m%d%H%M%S'))
+    return df
+
+
+def backfill_minute_bars(symbol, market_type='A股', freq=INTRADAY_FREQ, days=VOLUME_CURVE_DAYS, now=None):
+    """
+    补齐最近若干个已收盘交易日的分钟K线，已保存的交易日不重复请求，缺失的区间一次请求
+
+    Args:
+        symbol (str): 股票代码
+        market_type (str): 市场类型
+        freq (int): K线周期（分钟）
+        days (int): 交易日数
+        now (datetime): 当前时间，默认为系统时间
+
+    Returns:
+        list: 已保存的交易日（pd.Timestamp），最多days个，从旧到新
+    """
+    store = get_minute_store()
+    as_of = complete_until(market_type, now)
+    stored = [day for day in store.days(symbol, market_type, freq) if day <= as_of]
+    # 按自然日估算覆盖days个交易日的区间（含周末和节假日）
+    start = as_of - timedelta(days=days * 7 // 5 + 10)
+    if len([day for day in stored if day >= start]) < days:
+        try:
+            bars = fetch_minute_bars(symbol, start, as_of, freq)
+        except Exception as e:
+            print(f"获取{symbol}历史分钟K线出错: {str(e)}")
+            bars = None
+        if bars is not None and not bars.empty:
+            for day, df in bars.groupby(bars['time'].dt.normalize()):
+                if day not in stored:
+                    store.save(symbol, market_type, freq, day, df)
+                    stored.append(day)
+    return sorted(stored)[-days:]
+
+
+# 进程内缓存：{(市场类型, 股票代码, 周期, 交易日数): (最近收盘日, VolumeCurve)}
+_curves = {}
+_curves_lock = threading.Lock()
+
+
+def get_volume_curve(symbol, market_type='A股', freq=INTRADAY_FREQ, days=VOLUME_CURVE_DAYS, now=None):
+    """
+    获取最近若干个交易日的平均累计成交量曲线，每个交易日收盘后只计算一次
+
+    Args:
+        symbol (str): 股票代码
+        market_type (str): 市场类型
+        freq (int): K线周期（分钟）
+        days (int): 参与平均的交易日数
+        now (datetime): 当前时间，默认为系统时间
+
+    Returns:
+        VolumeCurve: 成交量曲线，市场不支持或没有历史分钟K线时返回None
+    """
+    if market_type not in INTRADAY_MARKETS:
+        return None
+    as_of = complete_until(market_type, now)
+    key = (market_type, symbol, freq, days)
+    with _curves_lock:
+        cached = _curves.get(key)
+        if cached is not None and cached[0] == as_of:
+            return cached[1]
+
+    store = get_minute_store()
+    frames = [store.load(symbol, market_type, freq, day)
+              for day in backfill_minute_bars(symbol, market_type, freq, days, now)]
+    curve = VolumeCurve.from_frames(frames, freq, market_type)
+    with _curves_lock:
+        _curves[key] = (as_of, curve)
+    return curve
+
+
+# 进程内的分时会话 {(市场类型, 股票代码, 周期): IntradaySession}
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def _persist(session, now=None):
+    """
+    交易日收盘后保存分时会话的K线，每个会话只保存一次；
+    不完整的会话（盘中才开始，缺少开始前的成交量）不保存，之后由 backfill_minute_bars 向数据源补齐
+    """
+    if session.persisted or complete_until(session.market_type, now) < session.day:
+        return
+    if not session.complete:
+        return
+    get_minute_store().save(session.symbol, session.market_type, session.freq, session.day, session.to_frame())
+    session.persisted = True
+
+
+def get_intraday_session(symbol, market_type='A股', freq=INTRADAY_FREQ, now=None):
+    """
+    获取股票当日的分时会话，首次获取时加载已保存的K线或向数据源请求一次当日K线
+
+    Args:
+        symbol (str): 股票代码
+        market_type (str): 市场类型
+        freq (int): K线周期（分钟）
+        now (datetime): 当前时间，默认为系统时间
+
+    Returns:
+        IntradaySession: 分时会话，市场不支持时返回None
+    """
+    if market_type not in INTRADAY_MARKETS:
+        return None
+    today = pd.Timestamp(now or datetime.now()).normalize()
+    key = (market_type, symbol, freq)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is not None and session.day == today:
+            return session
+        # 跨日：保存上一个交易日的K线后重新开始
+        if session is not None:
+            _persist(session, now)
+
+    # 加载当日K线时不持有锁，避免阻塞其他股票的行情记录
+    session = IntradaySession(symbol, today, market_type, freq)
+    df = get_minute_store().load(symbol, market_type, freq, today)
+    if df is not None:
+        session.add_frame(df)
+        session.persisted = True
+    else:
+        try:
+            session.add_frame(fetch_minute_bars(symbol, today, freq=freq))
+        except Exception as e:
+            print(f"获取{symbol}当日分钟K线出错: {str(e)}")
+
+    with _sessions_lock:
+        current = _sessions.get(key)
+        # 其他线程已经建好当日的会话时使用已有的
+        if current is not None and current.day == today:
+            return current
+        _persist(session, now)
+        _sessions[key] = session
+        return session
+
+
+def record_quote(symbol, market_type, quote, now=None):
+    """
+    将实时行情计入已有的分时会话，并在收盘后保存；没有会话（没有人查看分时）的股票忽略
+
+    Args:
+        symbol (str): 股票代码
+        market_type (str): 市场类型
+        quote (dict): 实时行情
+        now (datetime): 当前时间，默认为系统时间
+    """
+    with _sessions_lock:
+        session = _sessions.get((market_type, symbol, INTRADAY_FREQ))
+        if session is None:
+            return
+        session.update_from_quote(quote)
+        _persist(session, now)
+
+
+def record_bars(symbol, market_type, bars, now=None):
+    """
+    将从数据源请求到的当日K线计入已有的分时会话，已有的K线不重复计入
+
+    Args:
+        symbol (str): 股票代码
+        market_type (str): 市场类型
+        bars (pd.DataFrame): 列为 time, open, high, low, close, volume, amount
+        now (datetime): 当前时间，默认为系统时间
+    """
+    with _sessions_lock:
+        session = _sessions.get((market_type, symbol, INTRADAY_FREQ))
+        if session is None:
+            return
+        session.add_frame(bars)
+        _persist(session, now)
@@ -0,0 +1,451 @@
+"""
+盘中实时行情
+
+fetch_realtime_quote 向数据源（tushare、baostock、yfinance）请求一次行情。
+QuotePoller 在服务端为每只被查看的股票启动一个轮询线程，按固定间隔获取行情并保存在内存中，
+所有查看该股票的会话共用同一份行情，A股行情同时计入当日的分时会话（见 data.minute_store）。
+向数据源的请求频率只取决于被查看的股票数量，与打开的页面数无关；
+一段时间没有会话读取的股票自动停止轮询。
+get_realtime_batch 一次请求多只股票（自选股列表），按数据源允许的最大代码数分块。
+"""
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+import tushare as ts
+import yfinance as yf
+
+from data.minute_store import fetch_minute_bars, record_bars, record_quote
+from data.tushare_client import get_tushare_client
+from utils.singleflight import singleflight
+
+# 轮询间隔（秒）
+POLL_INTERVAL = 5
+
+# 超过该时间（秒）没有会话读取的股票停止轮询
+IDLE_TIMEOUT = 60
+
+# 首次查看某只股票时等待第一次行情的最长时间（秒）
+FIRST_QUOTE_TIMEOUT = 10
+
+# 批量行情单次请求的最大代码数
+A_SHARE_BATCH_SIZE = 500
+YAHOO_BATCH_SIZE = 100
+
+
+@singleflight
+def fetch_realtime_quote(symbol, market_type):
+    """
+    向数据源请求一次盘中实时行情
+
+    Args:
+        symbol (str): 股票代码
+        market_type (str): 市场类型
+
+    Returns:
+        dict: 实时数据，成交量单位为股、成交额单位为元（当日累计）
+    """
+    try:
+        if market_type == "A股":
+            # 添加市场后缀
+            if symbol.startswith('6'):
+                full_symbol = f"{symbol}.SH"
+            else:
+                full_symbol = f"{symbol}.SZ"
+
+            # 使用tushare获取实时数据（共享客户端，按接口限速）
+            pro = get_tushare_client()
+
+            # 获取当日实时行情
+            try:
+                # 尝试使用tushare的实时行情接口
+                realtime = ts.get_realtime_quotes(symbol)
+
+                if realtime is None or realtime.empty:
+                    # 尝试使用baostock获取当日5分钟K线（复用共享会话），同时计入分时会话
+                    bars = fetch_minute_bars(symbol, datetime.now())
+
+                    if bars is None:
+                        print("获取实时数据失败")
+                        return None
+
+                    if bars.empty:
+                        print("今日无交易数据")
+                        return None
+
+                    record_bars(symbol, market_type, bars)
+                    # 由当日全部5分钟K线汇总当日行情
+                    return {
+                        'open': float(bars['open'].iloc[0]),
+                        'high': float(bars['high'].max()),
+                        'low': float(bars['low'].min()),
+                        'price': float(bars['close'].iloc[-1]),  # 最后一根K线收盘价作为当前价格
+                        'pre_close': None,  # baostock不提供前收盘价
+                        'volume': float(bars['volume'].sum()),
+                        'amount': float(bars['amount'].sum()),
+                        'time': bars['time'].iloc[-1].strftime('%Y-%m-%d %H:%M:%S')
+                    }
+
+                # 转换tushare数据格式
+                return {
+                    'open': float(realtime['open'].iloc[0]),
+                    'high': float(realtime['high'].iloc[0]),
+                    'low': float(realtime['low'].iloc[0]),
+                    'price': float(realtime['price'].iloc[0]),
+                    'pre_close': float(realtime['pre_close'].iloc[0]),
+                    # 新浪行情的成交量单位已是股、成交额单位已是元，与分钟K线一致
+                    'volume': float(realtime['volume'].iloc[0]),
+                    'amount': float(realtime['amount'].iloc[0]),
+                    'time': realtime['date'].iloc[0] + ' ' + realtime['time'].iloc[0]
+                }
+            except Exception as e:
+                print(f"获取A股实时数据时出错: {str(e)}，尝试其他方法")
+
+                # 尝试使用日线数据的最新记录
+                today_str = datetime.now().strftime('%Y%m%d')
+                df = pro.daily(ts_code=full_symbol, start_date=today_str, end_date=today_str)
+
+                if df is not None and not df.empty:
+                    return {
+                        'open': float(df['open'].iloc[0]),
+                        'high': float(df['high'].iloc[0]),
+                        'low': float(df['low'].iloc[0]),
+                        'price': float(df['close'].iloc[0]),
+                        'pre_close': float(df['pre_close'].iloc[0]) if 'pre_close' in df.columns else None,
+                        # 日线成交量单位为手、成交额单位为千元，统一转换为股和元
+                        'volume': float(df['vol'].iloc[0]) * 100,
+                        'amount': float(df['amount'].iloc[0]) * 1000,
+                        'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                    }
+                return None
+
+        elif market_type == "港股":
+            # 添加港股后缀
+            full_symbol = f"{symbol}.HK"
+
+            # 使用yfinance获取实时数据
+            try:
+                stock = yf.Ticker(full_symbol)
+                today_data = stock.history(period='1d')
+
+                if today_data.empty:
+                    return None
+
+                latest = today_data.iloc[-1]
+
+                return {
+                    'open': float(latest['Open']),
+                    'high': float(latest['High']),
+                    'low': float(latest['Low']),
+                    'price': float(latest['Close']),
+                    'pre_close': None,  # yfinance不直接提供前收盘价
+                    'volume': float(latest['Volume']),
+                    'amount': float(latest['Volume'] * latest['Close']),  # 估算成交额
+                    'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                }
+            except Exception as e:
+                print(f"获取港股实时数据时出错: {str(e)}")
+                return None
+
+        else:  # 美股
+            # 使用yfinance获取实时数据
+            try:
+                stock = yf.Ticker(symbol)
+                today_data = stock.history(period='1d')
+
+                if today_data.empty:
+                    return None
+
+                latest = today_data.iloc[-1]
+
+                return {
+                    'open': float(latest['Open']),
+                    'high': float(latest['High']),
+                    'low': float(latest['Low']),
+                    'price': float(latest['Close']),
+                    'pre_close': None,  # yfinance不直接提供前收盘价
+                    'volume': float(latest['Volume']),
+                    'amount': float(latest['Volume'] * latest['Close']),  # 估算成交额
+                    'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                }
+            except Exception as e:
+                print(f"获取美股实时数据时出错: {str(e)}")
+                return None
+    except Exception as e:
+        print(f"获取实时数据时出错: {str(e)}")
+        return None
+
+
+def _chunks(items, size):
+    """
+    将列表按固定大小分块
+    """
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _a_share_batch(symbols):
+    """
+    批量获取A股实时行情：每块代码一次tushare实时行情请求
+    """
+    frames = []
+    for chunk in _chunks(symbols, A_SHARE_BATCH_SIZE):
+        try:
+            realtime = ts.get_realtime_quotes(chunk)
+        except Exception as e:
+            print(f"批量获取A股实时行情出错: {str(e)}")
+            continue
+        if realtime is None or realtime.empty:
+            continue
+        numeric = realtime[['open', 'high', 'low', 'price', 'pre_close', 'volume', 'amount']].apply(
+            pd.to_numeric, errors='coerce'
+        )
+        frames.append(pd.DataFrame({
+            'symbol': realtime['code'].values,
+            'name': realtime['name'].values,
+            'open': numeric['open'].values,
+            'high': numeric['high'].values,
+            'low': numeric['low'].values,
+            'price': numeric['price'].values,
+            'pre_close': numeric['pre_close'].values,
+            # 成交量单位为股、成交额单位为元，与fetch_realtime_quote一致
+            'volume': numeric['volume'].values,
+            'amount': numeric['amount'].values,
+            'time': (realtime['date'] + ' ' + realtime['time']).values
+        }))
+    return frames
+
+
+def _yahoo_batch(symbols, tickers):
+    """
+    批量获取港股、美股实时行情：每块代码一次yfinance下载请求，前收盘价取前一个交易日收盘价
+    """
+    frames = []
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    for chunk in _chunks(list(zip(symbols, tickers)), YAHOO_BATCH_SIZE):
+        chunk_tickers = [ticker for _, ticker in chunk]
+        try:
+            history = yf.download(chunk_tickers, period='5d', group_by='ticker',
+                                  progress=False, threads=False, auto_adjust=False)
+        except Exception as e:
+            print(f"批量获取港股/美股实时行情出错: {str(e)}")
+            continue
+        if history is None or history.empty:
+            continue
+        rows = []
+        for symbol, ticker in chunk:
+            if isinstance(history.columns, pd.MultiIndex):
+                if ticker not in history.columns.get_level_values(0):
+                    continue
+                bars = history[ticker]
+            else:
+                bars = history
+            bars = bars.dropna(subset=['Close'])
+            if bars.empty:
+                continue
+            latest = bars.iloc[-1]
+            rows.append({
+                'symbol': symbol,
+                'name': symbol,
+                'open': float(latest['Open']),
+                'high': float(latest['High']),
+                'low': float(latest['Low']),
+                'price': float(latest['Close']),
+                'pre_close': float(bars['Close'].iloc[-2]) if len(bars) > 1 else None,
+                'volume': float(latest['Volume']),
+                'amount': float(latest['Volume'] * latest['Close']),  # 估算成交额
+                'time': now
+            })
+        if rows:
+            frames.append(pd.DataFrame(rows))
+    return frames
+
+
+def get_realtime_batch(symbols, market_type):
+    """
+    批量获取多只股票的实时行情，按数据源单次请求允许的最大代码数分块
+
+    Args:
+        symbols (list): 股票代码列表
+        market_type (str): 市场类型
+
+    Returns:
+        pd.DataFrame: 索引为股票代码，列为 name, open, high, low, price, pre_close, volume, amount, time,
+            change_pct（涨跌幅%），成交量单位为股、成交额单位为元，没有获取到的股票不在结果中
+    """
+    columns = ['name', 'open', 'high', 'low', 'price', 'pre_close', 'volume', 'amount', 'time', 'change_pct']
+    symbols = list(dict.fromkeys(symbol.strip() for symbol in symbols if symbol and symbol.strip()))
+    if not symbols:
+        return pd.DataFrame(columns=columns)
+
+    if market_type == "A股":
+        # tushare实时行情接口使用6位代码
+        frames = _a_share_batch([symbol.split('.')[0] for symbol in symbols])
+    elif market_type == "港股":
+        # 与fetch_realtime_quote一致，添加港股后缀
+        frames = _yahoo_batch(symbols, [f"{symbol}.HK" for symbol in symbols])
+    else:
+        frames = _yahoo_batch(symbols, symbols)
+
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    quotes = pd.concat(frames, ignore_index=True).drop_duplicates(subset=['symbol']).set_index('symbol')
+    pre_close = pd.to_numeric(quotes['pre_close'], errors='coerce')
+    quotes['change_pct'] = (quotes['price'] - pre_close) / pre_close.where(pre_close > 0) * 100
+    return quotes[columns]
+
+
+class _Feed:
+    """
+    一只股票的行情订阅
+    """
+    def __init__(self):
+        self.quote = None
+        self.fetched_at = None
+        self.last_access = time.monotonic()
+        self.wake = threading.Event()
+        self.updated = threading.Condition()
+        # 已完成的获取次数（含失败），等待新行情时用于判断是否已有新一次获取
+        self.generation = 0
+        self.thread = None
+
+
+class QuotePoller:
+    """
+    服务端共享的实时行情轮询器
+    """
+    def __init__(self, fetch=fetch_realtime_quote, interval=POLL_INTERVAL, idle_timeout=IDLE_TIMEOUT,
+                 on_quote=record_quote):
+        """
+        初始化轮询器
+
+        Args:
+            fetch (function): 行情获取函数 fetch(symbol, market_type)，返回行情dict或None
+            interval (float): 轮询间隔（秒）
+            idle_timeout (float): 超过该时间（秒）没有读取的股票停止轮询
+            on_quote (function): 获取到行情后的回调 on_quote(symbol, market_type, quote)，为None时不回调
+        """
+        self.fetch = fetch
+        self.on_quote = on_quote
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+        self.fetch_count = 0
+        # (市场类型, 股票代码) -> _Feed
+        self._feeds = {}
+        self._lock = threading.Lock()
+
+    def _feed(self, symbol, market_type):
+        """
+        获取股票的订阅，没有轮询线程时启动
+        """
+        key = (market_type, symbol)
+        with self._lock:
+            feed = self._feeds.get(key)
+            if feed is None:
+                feed = _Feed()
+                self._feeds[key] = feed
+            feed.last_access = time.monotonic()
+            if feed.thread is None:
+                feed.thread = threading.Thread(
+                    target=self._run, args=(key, feed), name=f"quote-{symbol}", daemon=True
+                )
+                feed.thread.start()
+            return feed
+
+    def _run(self, key, feed):
+        """
+        轮询线程：按间隔获取行情，没有会话读取时退出
+        """
+        market_type, symbol = key
+        while True:
+            with self._lock:
+                if time.monotonic() - feed.last_access > self.idle_timeout:
+                    del self._feeds[key]
+                    return
+            try:
+                quote = self.fetch(symbol, market_type)
+            except Exception as e:
+                print(f"轮询{symbol}实时行情出错: {str(e)}")
+                quote = None
+            self.fetch_count += 1
+            if quote and self.on_quote:
+                try:
+                    self.on_quote(symbol, market_type, quote)
+                except Exception as e:
+                    print(f"记录{symbol}分时数据出错: {str(e)}")
+            with feed.updated:
+                # 获取失败时保留上一次的行情
+                if quote:
+                    feed.quote = quote
+                    feed.fetched_at = datetime.now()
+                feed.generation += 1
+                feed.updated.notify_all()
+            feed.wake.wait(self.interval)
+            feed.wake.clear()
+
+    def get(self, symbol, market_type, timeout=FIRST_QUOTE_TIMEOUT):
+        """
+        读取最新行情，首次查看时订阅该股票并等待第一次获取
+
+        Args:
+            symbol (str): 股票代码
+            market_type (str): 市场类型
+            timeout (float): 还没有行情时最长等待秒数
+
+        Returns:
+            tuple: (行情dict, 获取时间)，没有行情时为 (None, None)
+        """
+        feed = self._feed(symbol, market_type)
+        with feed.updated:
+            if feed.quote is None:
+                generation = feed.generation
+                feed.updated.wait_for(lambda: feed.quote is not None or feed.generation > generation, timeout)
+            return (dict(feed.quote) if feed.quote else None), feed.fetched_at
+
+    def refresh(self, symbol, market_type, timeout=FIRST_QUOTE_TIMEOUT):
+        """
+        立即获取一次行情（如用户点击刷新），并等待结果
+
+        Args:
+            symbol (str): 股票代码
+            market_type (str): 市场类型
+            timeout (float): 最长等待秒数
+
+        Returns:
+            tuple: (行情dict, 获取时间)
+        """
+        feed = self._feed(symbol, market_type)
+        with feed.updated:
+            # 记录请求时的获取次数，轮询线程在此之前的通知不算本次刷新的结果
+            generation = feed.generation
+            feed.wake.set()
+            feed.updated.wait_for(lambda: feed.generation > generation, timeout)
+            return (dict(feed.quote) if feed.quote else None), feed.fetched_at
+
+    def symbols(self):
+        """
+        获取正在轮询的股票
+
+        Returns:
+            list: [(市场类型, 股票代码)]
+        """
+        with self._lock:
+            return list(self._feeds)
+
+
+_default_poller = None
+_default_poller_lock = threading.Lock()
+
+
+def get_quote_poller():
+    """
+    获取进程内共享的实时行情轮询器
+
+    Returns:
+        QuotePoller: 行情轮询器
+    """
+    global _default_poller
+    with _default_poller_lock:
+        if _default_poller is None:
+            _default_poller = QuotePoller()
+        return _default_poller
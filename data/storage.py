@@ -0,0 +1,104 @@
+"""
+本地缓存文件读写工具
+"""
+import json
+import os
+import threading
+
+import pandas as pd
+
+# 本地缓存根目录，可通过环境变量覆盖
+CACHE_DIR = os.environ.get(
+    'GPJY_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.cache')
+)
+
+
+def cache_path(*parts):
+    """
+    获取缓存文件路径，并确保所在目录存在
+
+    Args:
+        *parts (str): 相对缓存根目录的路径片段
+
+    Returns:
+        str: 缓存文件完整路径
+    """
+    path = os.path.join(CACHE_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+def _tmp_path(path):
+    """
+    生成写入用的临时文件路径，保证多线程、多进程写入互不覆盖
+    """
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def read_parquet(path, columns=None):
+    """
+    读取Parquet文件
+
+    Args:
+        path (str): 文件路径
+        columns (list): 需要读取的列，默认读取全部
+
+    Returns:
+        pd.DataFrame: 文件内容，文件不存在或损坏时返回None
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        return pd.read_parquet(path, columns=columns)
+    except Exception as e:
+        print(f"读取缓存文件 {path} 出错: {str(e)}")
+        return None
+
+
+def write_parquet(df, path):
+    """
+    原子写入Parquet文件
+
+    Args:
+        df (pd.DataFrame): 待写入数据
+        path (str): 文件路径
+    """
+    tmp = _tmp_path(path)
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def read_json(path, default=None):
+    """
+    读取JSON文件
+
+    Args:
+        path (str): 文件路径
+        default: 文件不存在或损坏时的返回值
+
+    Returns:
+        JSON内容
+    """
+    if not os.path.exists(path):
+        return default
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"读取缓存文件 {path} 出错: {str(e)}")
+        return default
+
+
+def write_json(data, path):
+    """
+    原子写入JSON文件
+
+    Args:
+        data: 待写入数据
+        path (str): 文件路径
+    """
+    tmp = _tmp_path(path)
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
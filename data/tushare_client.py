@@ -0,0 +1,186 @@
+"""
+tushare接口客户端
+
+进程内共用一个tushare pro接口实例，所有请求经过这里：
+- 按接口分别用令牌桶限速，不超过tushare每个接口每分钟的调用次数限制；
+- 参数完全相同、仍在进行中的请求合并为一次，后到的请求等待同一个结果；
+- 按接口统计调用次数、合并次数、出错次数、限速等待时间和最近一分钟的配额使用。
+
+用法与 ts.pro_api() 相同：get_tushare_client().daily(ts_code=..., start_date=...)
+"""
+import os
+import threading
+import time
+from collections import deque
+from functools import partial
+
+import pandas as pd
+import tushare as ts
+
+from utils.rate_limit import RateLimiter
+from utils.singleflight import SingleFlight
+
+# tushare token，可通过环境变量覆盖
+TUSHARE_TOKEN = os.environ.get('TUSHARE_TOKEN', '1eff01596da7f92d7af202478e924ea7836ee40f52cf0636bc01f489')
+
+# 每个接口默认每分钟调用次数上限
+CALLS_PER_MINUTE = 200
+
+# 允许的突发调用次数
+BURST = 10
+
+# 单独设置上限的接口 {接口名: 每分钟调用次数}
+ENDPOINT_LIMITS = {
+    'stock_basic': 60,
+    'stock_company': 60,
+    'fina_indicator_vip': 60,
+    'top10_holders': 100,
+    'top10_floatholders': 100
+}
+
+
+class TushareClient:
+    """
+    tushare接口客户端类
+    """
+    def __init__(self, token=TUSHARE_TOKEN, calls_per_minute=CALLS_PER_MINUTE, burst=BURST, limits=None):
+        """
+        初始化客户端
+
+        Args:
+            token (str): tushare token
+            calls_per_minute (int): 每个接口默认每分钟调用次数上限
+            burst (int): 允许的突发调用次数
+            limits (dict): 单独设置上限的接口 {接口名: 每分钟调用次数}，默认使用ENDPOINT_LIMITS
+        """
+        self.token = token
+        self.calls_per_minute = calls_per_minute
+        self.limits = dict(ENDPOINT_LIMITS if limits is None else limits)
+        self._limiter = RateLimiter(
+            rate=calls_per_minute / 60,
+            capacity=burst,
+            limits={api: (per_minute / 60, min(burst, per_minute)) for api, per_minute in self.limits.items()}
+        )
+        self._pro = None
+        self._lock = threading.Lock()
+        # 参数相同的进行中请求合并为一次
+        self._flight = SingleFlight()
+        # 各接口的统计 {接口名: dict}
+        self._stats = {}
+
+    @property
+    def pro(self):
+        """
+        tushare pro接口实例，首次使用时创建
+        """
+        with self._lock:
+            if self._pro is None:
+                ts.set_token(self.token)
+                self._pro = ts.pro_api(self.token)
+            return self._pro
+
+    def _stat(self, api_name):
+        """
+        获取接口的统计项，调用方需持有锁
+        """
+        if api_name not in self._stats:
+            self._stats[api_name] = {
+                'calls': 0, 'coalesced': 0, 'errors': 0, 'waited': 0.0, 'recent': deque()
+            }
+        return self._stats[api_name]
+
+    def query(self, api_name, **params):
+        """
+        调用tushare接口
+
+        Args:
+            api_name (str): 接口名，如 daily、daily_basic
+            **params: 接口参数
+
+        Returns:
+            pd.DataFrame: 接口返回的数据（副本，调用方可以修改）
+        """
+        key = (api_name, tuple(sorted((name, str(value)) for name, value in params.items())))
+        df, shared = self._flight.do(key, self._call, api_name, params)
+        if shared:
+            with self._lock:
+                self._stat(api_name)['coalesced'] += 1
+        return df.copy() if isinstance(df, pd.DataFrame) else df
+
+    def _call(self, api_name, params):
+        """
+        限速后实际调用tushare接口
+        """
+        waited = self._limiter.acquire(api_name)
+        with self._lock:
+            stat = self._stat(api_name)
+            stat['calls'] += 1
+            stat['waited'] += waited
+            stat['recent'].append(time.monotonic())
+        try:
+            return getattr(self.pro, api_name)(**params)
+        except Exception:
+            with self._lock:
+                self._stat(api_name)['errors'] += 1
+            raise
+
+    def __getattr__(self, api_name):
+        """
+        以 client.接口名(**参数) 的方式调用接口，与tushare pro接口用法一致
+        """
+        if api_name.startswith('_'):
+            raise AttributeError(api_name)
+        return partial(self.query, api_name)
+
+    def limit(self, api_name):
+        """
+        获取接口每分钟调用次数上限
+        """
+        return self.limits.get(api_name, self.calls_per_minute)
+
+    def stats(self):
+        """
+        各接口的调用统计
+
+        Returns:
+            pd.DataFrame: 索引为接口名，列为 calls（实际调用次数）、coalesced（合并的重复请求数）、
+                errors（出错次数）、waited（限速等待秒数）、last_minute（最近一分钟调用次数）、
+                limit（每分钟上限）、quota_used（最近一分钟配额使用比例）
+        """
+        now = time.monotonic()
+        rows = {}
+        with self._lock:
+            for api_name, stat in self._stats.items():
+                recent = stat['recent']
+                while recent and recent[0] < now - 60:
+                    recent.popleft()
+                limit = self.limit(api_name)
+                rows[api_name] = {
+                    'calls': stat['calls'],
+                    'coalesced': stat['coalesced'],
+                    'errors': stat['errors'],
+                    'waited': round(stat['waited'], 2),
+                    'last_minute': len(recent),
+                    'limit': limit,
+                    'quota_used': len(recent) / limit
+                }
+        columns = ['calls', 'coalesced', 'errors', 'waited', 'last_minute', 'limit', 'quota_used']
+        return pd.DataFrame.from_dict(rows, orient='index', columns=columns)
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_tushare_client():
+    """
+    获取进程内共享的tushare客户端
+
+    Returns:
+        TushareClient: tushare客户端
+    """
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = TushareClient()
+        return _default_client
@@ -0,0 +1,179 @@
+"""
+新闻后台采集
+
+按固定间隔轮询自选股列表中每只股票的A股新闻来源（东方财富网、新浪财经、雪球、同花顺），
+每个来源只获取索引中最新一条之后的新闻，按规范化标题去重后写入本地新闻索引。
+采集期间NewsAnalyzer.get_news直接查询索引，不再实时抓取。
+
+命令行用法（常驻运行）：
+    python -m news.ingester 600519 000001 [--file watchlist.txt] [--interval 300] [--days 7]
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from news.news_analyzer import NEWS_SOURCES, NewsAnalyzer
+from news.news_index import get_news_index
+
+# 轮询间隔（秒）
+INGEST_INTERVAL = 300
+
+# 每次轮询覆盖最近几天的新闻
+INGEST_DAYS = 7
+
+
+class NewsIngester:
+    """
+    新闻后台采集类
+    """
+    def __init__(self, symbols, interval=INGEST_INTERVAL, days=INGEST_DAYS, index=None, max_workers=4):
+        """
+        初始化采集器
+
+        Args:
+            symbols (list): 自选股代码列表
+            interval (int): 轮询间隔（秒）
+            days (int): 每次轮询覆盖最近几天的新闻
+            index (NewsIndex): 新闻索引，默认使用进程内共享的索引
+            max_workers (int): 同时采集的股票数，同一主机的请求仍按主机限速
+        """
+        self.symbols = list(dict.fromkeys(symbols))
+        self.interval = interval
+        self.days = days
+        self.index = index or get_news_index()
+        self.max_workers = max_workers
+        self._stop = threading.Event()
+        self._thread = None
+
+    def poll_symbol(self, symbol):
+        """
+        采集一只股票的全部新闻来源
+
+        Args:
+            symbol (str): 股票代码
+
+        Returns:
+            int: 新写入索引的新闻条数
+        """
+        analyzer = NewsAnalyzer(symbol)
+        added = 0
+        failed = []
+        # 按NEWS_SOURCES的顺序写入，同一标题保留靠前的来源
+        for name, method, _ in NEWS_SOURCES:
+            since = self.index.latest(symbol, name)
+            df = getattr(analyzer, method)(self.days, since=since)
+            if df is None:
+                failed.append(name)
+                continue
+            added += self.index.add(symbol, df)
+        # 有来源获取失败时不记录本轮采集，get_news不会把不完整的索引当作最新数据
+        if failed:
+            print(f"采集{symbol}新闻时以下来源获取失败：{'、'.join(failed)}")
+        else:
+            self.index.mark_polled(symbol, self.days)
+        return added
+
+    def run_once(self):
+        """
+        完成一轮采集，并清理超过保留期的新闻
+
+        Returns:
+            dict: {股票代码: 新写入的新闻条数}
+        """
+        def poll(symbol):
+            try:
+                return self.poll_symbol(symbol)
+            except Exception as e:
+                print(f"采集{symbol}新闻时出错: {str(e)}")
+                return 0
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='news-ingest') as executor:
+            added = dict(zip(self.symbols, executor.map(poll, self.symbols)))
+        self.index.purge()
+        return added
+
+    def run_forever(self):
+        """
+        按间隔持续采集，直到调用stop()
+        """
+        while not self._stop.is_set():
+            start = time.monotonic()
+            added = self.run_once()
+            print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] 新闻采集完成：{len(added)} 只股票，"
+                  f"新增 {sum(added.values())} 条")
+            self._stop.wait(max(0, self.interval - (time.monotonic() - start)))
+
+    def start(self):
+        """
+        在后台线程中开始采集
+
+        Returns:
+            threading.Thread: 采集线程
+        """
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run_forever, name='news-ingester', daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def stop(self, timeout=None):
+        """
+        停止后台采集，等待当前一轮结束
+
+        Args:
+            timeout (float): 最长等待秒数
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+def read_watchlist(path):
+    """
+    读取自选股文件：每行一个股票代码，#开头的行为注释
+
+    Args:
+        path (str): 文件路径
+
+    Returns:
+        list: 股票代码列表
+    """
+    with open(path, encoding='utf-8') as f:
+        lines = (line.split('#', 1)[0].strip() for line in f)
+        return [line for line in lines if line]
+
+
+def main(argv=None):
+    """
+    命令行入口：常驻采集自选股新闻
+    """
+    parser = argparse.ArgumentParser(description='后台采集自选股新闻到本地索引')
+    parser.add_argument('symbols', nargs='*', help='股票代码')
+    parser.add_argument('--file', help='自选股文件，每行一个股票代码')
+    parser.add_argument('--interval', type=int, default=INGEST_INTERVAL, help='轮询间隔（秒）')
+    parser.add_argument('--days', type=int, default=INGEST_DAYS, help='每次轮询覆盖最近几天的新闻')
+    parser.add_argument('--once', action='store_true', help='只采集一轮后退出')
+    args = parser.parse_args(argv)
+
+    symbols = list(args.symbols)
+    if args.file:
+        symbols += read_watchlist(args.file)
+    if not symbols:
+        parser.error('请指定股票代码或自选股文件')
+
+    ingester = NewsIngester(symbols, interval=args.interval, days=args.days)
+    if args.once:
+        added = ingester.run_once()
+        print(f"新闻采集完成：{len(added)} 只股票，新增 {sum(added.values())} 条")
+        return 0
+    try:
+        ingester.run_forever()
+    except KeyboardInterrupt:
+        ingester.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -4,9 +4,39 @@ import pandas as pd
 from datetime import datetime, timedelta
 import yfinance as yf
 import baostock as bs
-import json
 import time
 import random
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlparse
+from news.news_cache import get_news_cache
+from news.news_index import get_news_index
+from news.parsers import parse_10jqka, parse_eastmoney, parse_sina, parse_xueqiu
+from news.sentiment import DEFAULT_MATCHER, label, score_batch, sentiment_panel
+from utils.rate_limit import RateLimiter
+
+# 每页新闻条数和增量更新时最多翻页数
+PAGE_SIZE = 50
+MAX_PAGES = 3
+
+# 单次HTTP请求的超时时间（秒）：(连接超时, 读取超时)
+REQUEST_TIMEOUT = (3, 5)
+
+# A股新闻来源：(来源名称, 获取方法名, 整个来源的超时时间（秒）)
+NEWS_SOURCES = [
+    ('东方财富网', 'get_eastmoney_news', 8),
+    ('新浪财经', 'get_sina_news', 8),
+    ('雪球', 'get_xueqiu_news', 10),
+    ('同花顺', 'get_10jqka_news', 8)
+]
+
+# 按主机限速：每个主机每秒1个请求，允许2个突发请求（如雪球先取cookie再查询）
+_host_limiter = RateLimiter(rate=1, capacity=2)
+
+# 新闻获取线程池，各分析器实例共用
+_news_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='news')
+
+# 有来源仍在线程池中排队时，检查其是否已开始执行的间隔（秒）
+QUEUE_POLL_INTERVAL = 0.2
 
 class NewsAnalyzer:
     """
@@ -39,85 +69,102 @@ class NewsAnalyzer:
         self.session = requests.Session()
         self.session.headers.update(self.headers)
     
-    def get_eastmoney_news(self, days=7):
+    def _get(self, url, **kwargs):
+        """
+        发送GET请求，按主机限速并设置超时
+        
+        Args:
+            url (str): 请求地址
+            **kwargs: 传给requests的参数
+            
+        Returns:
+            requests.Response: 响应
+        """
+        _host_limiter.acquire(urlparse(url).hostname)
+        kwargs.setdefault('timeout', REQUEST_TIMEOUT)
+        return self.session.get(url, **kwargs)
+    
+    def _cutoff(self, days, since=None):
+        """
+        计算新闻的截止时间：最近days天，增量更新时为since
+        """
+        cutoff = datetime.now() - timedelta(days=days)
+        if since is not None:
+            cutoff = max(cutoff, pd.Timestamp(since))
+        return cutoff
+    
+    def _paginate(self, fetch_page, cutoff, max_pages=MAX_PAGES):
+        """
+        按页获取新闻，直到某页不满或已翻到截止时间之前
+        
+        Args:
+            fetch_page (function): 获取一页新闻 fetch_page(page)，返回含title/datetime/source列的DataFrame
+            cutoff (datetime): 截止时间
+            max_pages (int): 最多翻页数
+            
+        Returns:
+            pd.DataFrame: 截止时间之后（含）的新闻
+        """
+        dfs = []
+        for page in range(1, max_pages + 1):
+            df = fetch_page(page)
+            if df is None or df.empty:
+                break
+            dfs.append(df)
+            if len(df) < PAGE_SIZE or df['datetime'].min() < cutoff:
+                break
+        
+        if not dfs:
+            return pd.DataFrame()
+        df = pd.concat(dfs, ignore_index=True)
+        return df[df['datetime'] >= cutoff]
+    
+    def get_eastmoney_news(self, days=7, since=None):
         """
         从东方财富网获取新闻
         
         Args:
             days (int): 获取最近几天的新闻
+            since (datetime): 只获取该时间之后的新闻（增量更新），默认获取最近days天的全部新闻
             
         Returns:
-            pd.DataFrame: 新闻数据
+            pd.DataFrame: 新闻数据，没有新闻时为空表，获取失败时返回None
         """
         try:
             url = f"http://np-anotice-stock.eastmoney.com/api/security/announcement/getAnnList"
-            params = {
-                "cb": "jQuery",
-                "sr": -1,
-                "page_size": 50,
-                "page_index": 1,
-                "ann_type": "A",
-                "client_source": "web",
-                "f_node": 0,
-                "s_node": 0,
-                "stock": self.symbol
-            }
-            
-            response = self.session.get(url, params=params)
-            text = response.text
             
-            try:
-                data = json.loads(text)
-            except json.JSONDecodeError:
-                try:
-                    start_idx = text.find('{')
-                    end_idx = text.rfind('}') + 1
-                    if start_idx != -1 and end_idx != -1:
-                        json_str = text[start_idx:end_idx]
-                        data = json.loads(json_str)
-                    else:
-                        return pd.DataFrame()
-                except:
-                    return pd.DataFrame()
-            
-            if not isinstance(data, dict) or 'data' not in data or 'list' not in data['data']:
-                return pd.DataFrame()
-                
-            news_list = data['data']['list']
-            if not news_list:
-                return pd.DataFrame()
+            def fetch_page(page):
+                params = {
+                    "cb": "jQuery",
+                    "sr": -1,
+                    "page_size": PAGE_SIZE,
+                    "page_index": page,
+                    "ann_type": "A",
+                    "client_source": "web",
+                    "f_node": 0,
+                    "s_node": 0,
+                    "stock": self.symbol
+                }
                 
-            df = pd.DataFrame(news_list)
-            
-            if 'notice_date' in df.columns:
-                df['datetime'] = pd.to_datetime(df['notice_date'])
-            else:
-                df['datetime'] = pd.to_datetime('now')
+                return parse_eastmoney(self._get(url, params=params).text)
             
-            cutoff_date = datetime.now() - timedelta(days=days)
-            df = df[df['datetime'] >= cutoff_date]
-            
-            if 'title' not in df.columns:
-                df['title'] = '无标题'
-            
-            df['source'] = '东方财富网'
-            df = df[['title', 'datetime', 'source']]
-            
-            return df
+            return self._paginate(fetch_page, self._cutoff(days, since))
             
         except Exception as e:
             print(f"从东方财富网获取新闻时出错: {str(e)}")
-            return pd.DataFrame()
+            # 返回None而不是空表，以区分获取失败与没有新闻，缓存和索引据此保留旧数据
+            return None
     
-    def get_sina_news(self, days=7):
+    def get_sina_news(self, days=7, since=None):
         """
         从新浪财经获取新闻
         
         Args:
             days (int): 获取最近几天的新闻
+            since (datetime): 只获取该时间之后的新闻（增量更新），默认获取最近days天的全部新闻
             
         Returns:
-            pd.DataFrame: 新闻数据
+            pd.DataFrame: 新闻数据，没有新闻时为空表，获取失败时返回None
         """
         try:
             # 新浪财经新闻API
@@ -129,7 +176,7 @@ class NewsAnalyzer:
                 "datalen": 1
             }
             
-            response = self.session.get(url, params=params)
+            response = self._get(url, params=params)
             data = response.json()
             
             if not data:
@@ -137,147 +184,168 @@ class NewsAnalyzer:
             
             # 获取新闻列表
             news_url = f"https://vip.stock.finance.sina.com.cn/quotes_service/api/json_v2.php/CN_MarketData.getNewsList"
-            news_params = {
-                "symbol": self.symbol,
-                "page": 1,
-                "num": 50
-            }
-            
-            response = self.session.get(news_url, params=news_params)
-            news_data = response.json()
-            
-            if not news_data:
-                return pd.DataFrame()
-            
-            df = pd.DataFrame(news_data)
-            if 'time' in df.columns:
-                df['datetime'] = pd.to_datetime(df['time'])
-            else:
-                df['datetime'] = pd.to_datetime('now')
             
-            if 'title' in df.columns:
-                df['title'] = df['title']
-            else:
-                df['title'] = '无标题'
-            
-            df['source'] = '新浪财经'
-            
-            cutoff_date = datetime.now() - timedelta(days=days)
-            df = df[df['datetime'] >= cutoff_date]
+            def fetch_page(page):
+                news_params = {
+                    "symbol": self.symbol,
+                    "page": page,
+                    "num": PAGE_SIZE
+                }
+                
+                return parse_sina(self._get(news_url, params=news_params).text)
             
-            return df[['title', 'datetime', 'source']]
+            return self._paginate(fetch_page, self._cutoff(days, since))
             
         except Exception as e:
             print(f"从新浪财经获取新闻时出错: {str(e)}")
-            return pd.DataFrame()
+            return None
     
-    def get_xueqiu_news(self, days=7):
+    def get_xueqiu_news(self, days=7, since=None):
         """
         从雪球获取新闻
         
         Args:
             days (int): 获取最近几天的新闻
+            since (datetime): 只获取该时间之后的新闻（增量更新），默认获取最近days天的全部新闻
             
         Returns:
-            pd.DataFrame: 新闻数据
+            pd.DataFrame: 新闻数据，没有新闻时为空表，获取失败时返回None
         """
         try:
             # 首先获取cookie
-            self.session.get('https://xueqiu.com')
-            time.sleep(1)  # 等待一下
+            self._get('https://xueqiu.com')
             
             # 雪球新闻API
             url = f"https://xueqiu.com/statuses/search.json"
-            params = {
-                "count": 50,
-                "comment": 0,
-                "symbol": self.symbol,
-                "source": "all",
-                "sort": "time",
-                "page": 1
-            }
-            
-            response = self.session.get(url, params=params)
-            data = response.json()
-            
-            if not data or 'list' not in data:
-                return pd.DataFrame()
-            
-            df = pd.DataFrame(data['list'])
-            if 'created_at' in df.columns:
-                df['datetime'] = pd.to_datetime(df['created_at'], unit='ms')
-            else:
-                df['datetime'] = pd.to_datetime('now')
             
-            if 'text' in df.columns:
-                df['title'] = df['text']
-            else:
-                df['title'] = '无标题'
-            
-            df['source'] = '雪球'
-            
-            cutoff_date = datetime.now() - timedelta(days=days)
-            df = df[df['datetime'] >= cutoff_date]
+            def fetch_page(page):
+                params = {
+                    "count": PAGE_SIZE,
+                    "comment": 0,
+                    "symbol": self.symbol,
+                    "source": "all",
+                    "sort": "time",
+                    "page": page
+                }
+                
+                return parse_xueqiu(self._get(url, params=params).text)
             
-            return df[['title', 'datetime', 'source']]
+            return self._paginate(fetch_page, self._cutoff(days, since))
             
         except Exception as e:
             print(f"从雪球获取新闻时出错: {str(e)}")
-            return pd.DataFrame()
+            return None
     
-    def get_10jqka_news(self, days=7):
+    def get_10jqka_news(self, days=7, since=None):
         """
         从同花顺获取新闻
         
         Args:
             days (int): 获取最近几天的新闻
+            since (datetime): 只获取该时间之后的新闻（增量更新），默认获取最近days天的全部新闻
             
         Returns:
-            pd.DataFrame: 新闻数据
+            pd.DataFrame: 新闻数据，没有新闻时为空表，获取失败时返回None
         """
         try:
             # 同花顺新闻API
             url = f"http://news.10jqka.com.cn/tapp/news/push/stock/"
-            params = {
-                "page": 1,
-                "tag": "news_stock",
-                "track": "website",
-                "num": 50,
-                "list": self.symbol
-            }
             
-            response = self.session.get(url, params=params)
-            data = response.json()
-            
-            if not data or 'data' not in data:
-                return pd.DataFrame()
-            
-            df = pd.DataFrame(data['data'])
-            
-            # 处理时间字段
-            if 'ctime' in df.columns:
-                df['datetime'] = pd.to_datetime(df['ctime'])
-            elif 'time' in df.columns:
-                df['datetime'] = pd.to_datetime(df['time'])
-            else:
-                df['datetime'] = pd.to_datetime('now')
-            
-            # 处理标题字段
-            if 'title' in df.columns:
-                df['title'] = df['title']
-            else:
-                df['title'] = '无标题'
-            
-            df['source'] = '同花顺'
-            
-            cutoff_date = datetime.now() - timedelta(days=days)
-            df = df[df['datetime'] >= cutoff_date]
+            def fetch_page(page):
+                params = {
+                    "page": page,
+                    "tag": "news_stock",
+                    "track": "website",
+                    "num": PAGE_SIZE,
+                    "list": self.symbol
+                }
+                
+                return parse_10jqka(self._get(url, params=params).text)
             
-            return df[['title', 'datetime', 'source']]
+            return self._paginate(fetch_page, self._cutoff(days, since))
             
         except Exception as e:
             print(f"从同花顺获取新闻时出错: {str(e)}")
+            return None
+    
+    def get_yahoo_news(self, days=7, since=None):
+        """
+        从Yahoo Finance获取港股、美股新闻
+        
+        Args:
+            days (int): 获取最近几天的新闻
+            since (datetime): 只保留该时间之后的新闻（增量更新）
+            
+        Returns:
+            pd.DataFrame: 新闻数据
+        """
+        news = self.stock.news
+        df = pd.DataFrame(news)
+        if df.empty:
             return pd.DataFrame()
+        df['datetime'] = pd.to_datetime(df['providerPublishTime'], unit='s')
+        df['source'] = 'Yahoo Finance'
+        
+        df = df[df['datetime'] >= self._cutoff(days, since)]
+        
+        return df[['title', 'datetime', 'source']]
+    
+    def _fetch_sources(self, days):
+        """
+        并发获取各新闻来源（经过新闻缓存），超过来源超时时间仍未返回的来源使用旧缓存；
+        超时时间从来源开始执行时计算，在共用线程池中排队（如多只股票同时刷新）的时间不计入
+        
+        Args:
+            days (int): 获取最近几天的新闻
+            
+        Returns:
+            list: 各来源返回的非空新闻数据，按NEWS_SOURCES的顺序排列（去重时优先保留靠前的来源）
+        """
+        cache = get_news_cache()
+        results = {}
+        pending = {}
+        # 各来源开始执行的时间，由工作线程写入
+        started = {}
+
+        def run(name, fetcher):
+            started[name] = time.monotonic()
+            return cache.get(self.symbol, name, days, fetcher)
+
+        for name, method, timeout in NEWS_SOURCES:
+            # 缓存过期时只增量获取上次之后的新闻
+            fetcher = lambda since, method=method: getattr(self, method)(days, since=since)
+            future = _news_executor.submit(run, name, fetcher)
+            pending[future] = (name, timeout)
+            
+        while pending:
+            now = time.monotonic()
+            for future, (name, timeout) in list(pending.items()):
+                if not future.done() and name in started and started[name] + timeout <= now:
+                    print(f"从{name}获取新闻超时")
+                    future.cancel()
+                    del pending[future]
+                    # 超时的来源使用已缓存的新闻
+                    cached = cache.peek(self.symbol, name, days)
+                    if not cached.empty:
+                        results[name] = cached
+            if not pending:
+                break
+                
+            deadlines = [started[name] + timeout for name, timeout in pending.values() if name in started]
+            # 还在排队的来源没有截止时间，定期检查其是否已开始执行
+            if len(deadlines) < len(pending):
+                deadlines.append(now + QUEUE_POLL_INTERVAL)
+            done, _ = wait(pending, timeout=max(0, min(deadlines) - now), return_when=FIRST_COMPLETED)
+            for future in done:
+                name, _ = pending.pop(future)
+                try:
+                    df = future.result()
+                except Exception as e:
+                    print(f"从{name}获取新闻时出错: {str(e)}")
+                    continue
+                if df is not None and not df.empty:
+                    results[name] = df
+        return [results[name] for name, _, _ in NEWS_SOURCES if name in results]
     
     def get_news(self, days=7):
         """
@@ -291,31 +359,13 @@ class NewsAnalyzer:
         """
         try:
             if self.market_type == "A股":
-                # 从多个来源获取新闻
-                dfs = []
-                
-                # 东方财富网
-                df_eastmoney = self.get_eastmoney_news(days)
-                if not df_eastmoney.empty:
-                    dfs.append(df_eastmoney)
-                    time.sleep(1)  # 添加延时避免请求过快
-                
-                # 新浪财经
-                df_sina = self.get_sina_news(days)
-                if not df_sina.empty:
-                    dfs.append(df_sina)
-                    time.sleep(1)
+                # 后台采集在更新该股票时直接查询本地索引
+                index = get_news_index()
+                if index.is_fresh(self.symbol, days):
+                    return index.query(self.symbol, days)
                 
-                # 雪球
-                df_xueqiu = self.get_xueqiu_news(days)
-                if not df_xueqiu.empty:
-                    dfs.append(df_xueqiu)
-                    time.sleep(1)
-                
-                # 同花顺
-                df_10jqka = self.get_10jqka_news(days)
-                if not df_10jqka.empty:
-                    dfs.append(df_10jqka)
+                # 从多个来源并发获取新闻，某个来源慢或失败不影响其他来源
+                dfs = self._fetch_sources(days)
                 
                 if not dfs:
                     return pd.DataFrame()
@@ -331,15 +381,10 @@ class NewsAnalyzer:
                 
                 return df
             else:
-                news = self.stock.news
-                df = pd.DataFrame(news)
-                df['datetime'] = pd.to_datetime(df['providerPublishTime'], unit='s')
-                df['source'] = 'Yahoo Finance'
-                
-                cutoff_date = datetime.now() - timedelta(days=days)
-                df = df[df['datetime'] >= cutoff_date]
-                
-                return df[['title', 'datetime', 'source']]
+                return get_news_cache().get(
+                    self.symbol, 'Yahoo Finance', days,
+                    lambda since: self.get_yahoo_news(days, since=since)
+                )
                 
         except Exception as e:
             print(f"获取新闻时出错: {str(e)}")
@@ -355,43 +400,7 @@ class NewsAnalyzer:
         Returns:
             str: 情绪分析结果
         """
-        # 扩展情绪词典
-        positive_words = [
-            '增长', '上涨', '突破', '创新', '利好', '突破', '成功', '盈利', '增长', '扩张',
-            '突破', '创新高', '增长', '突破', '创新', '利好', '突破', '成功', '盈利', '增长',
-            '扩张', '突破性', '突破性进展', '突破性创新', '突破性发展', '突破性成果',
-            '突破性技术', '突破性产品', '突破性服务', '突破性解决方案', '突破性商业模式',
-            '突破性市场', '突破性客户', '突破性合作', '突破性协议', '突破性订单',
-            '突破性项目', '突破性工程', '突破性建设', '突破性投资', '突破性融资',
-            '突破性并购', '突破性重组', '突破性改革', '突破性创新', '突破性发展',
-            '突破性进步', '突破性提升', '突破性改善', '突破性优化', '突破性升级',
-            '突破性转型', '突破性升级', '突破性改造', '突破性创新', '突破性发展'
-        ]
-        
-        negative_words = [
-            '下跌', '风险', '问题', '危机', '下滑', '失败', '亏损', '下降', '收缩',
-            '下跌', '风险', '问题', '危机', '下滑', '失败', '亏损', '下降', '收缩',
-            '风险提示', '风险预警', '风险警示', '风险提示', '风险预警', '风险警示',
-            '风险提示', '风险预警', '风险警示', '风险提示', '风险预警', '风险警示',
-            '风险提示', '风险预警', '风险警示', '风险提示', '风险预警', '风险警示',
-            '风险提示', '风险预警', '风险警示', '风险提示', '风险预警', '风险警示',
-            '风险提示', '风险预警', '风险警示', '风险提示', '风险预警', '风险警示',
-            '风险提示', '风险预警', '风险警示', '风险提示', '风险预警', '风险警示',
-            '风险提示', '风险预警', '风险警示', '风险提示', '风险预警', '风险警示',
-            '风险提示', '风险预警', '风险警示', '风险提示', '风险预警', '风险警示',
-            '风险提示', '风险预警', '风险警示', '风险提示', '风险预警', '风险警示'
-        ]
-        
-        text = text.lower()
-        pos_count = sum(1 for word in positive_words if word in text)
-        neg_count = sum(1 for word in negative_words if word in text)
-        
-        if pos_count > neg_count:
-            return '利好'
-        elif neg_count > pos_count:
-            return '利空'
-        else:
-            return '中性'
+        return label(DEFAULT_MATCHER.score(text))
     
     def get_news_summary(self, days=7):
         """
@@ -414,8 +423,8 @@ class NewsAnalyzer:
                     'source_distribution': {}
                 }
             
-            # 添加情绪分析
-            df['sentiment'] = df['title'].apply(self.analyze_sentiment)
+            # 添加情绪分析（全部标题一次扫描）
+            df['sentiment'] = score_batch(df['title'])['label']
             
             # 统计情绪分布
             sentiment_counts = df['sentiment'].value_counts()
@@ -439,4 +448,51 @@ class NewsAnalyzer:
                 'sentiment_distribution': {'利好': 0, '利空': 0, '中性': 0},
                 'latest_news': [],
                 'source_distribution': {}
-            } 
\ No newline at end of file
+            } 
+
+
+def _cached_news(symbol, market_type, days):
+    """
+    读取一只股票已缓存的新闻，不请求新闻来源
+    """
+    if market_type == "A股":
+        index = get_news_index()
+        if index.is_fresh(symbol, days):
+            return index.query(symbol, days)
+    
+    cache = get_news_cache()
+    sources = [name for name, _, _ in NEWS_SOURCES] if market_type == "A股" else ['Yahoo Finance']
+    dfs = [cache.peek(symbol, name, days) for name in sources]
+    dfs = [df for df in dfs if not df.empty]
+    if not dfs:
+        return pd.DataFrame()
+    return pd.concat(dfs, ignore_index=True).drop_duplicates(subset=['title'])
+
+
+def get_market_sentiment(symbols, days=7, market_type="A股", refresh=True, max_workers=8):
+    """
+    全市场新闻情绪：一次获取多只股票的新闻，全部标题统一批量打分
+    
+    Args:
+        symbols (list): 股票代码列表
+        days (int): 获取最近几天的新闻
+        market_type (str): 市场类型
+        refresh (bool): 是否请求新闻来源更新过期的缓存，否则只使用已缓存的新闻
+        max_workers (int): 同时获取新闻的股票数
+        
+    Returns:
+        pd.DataFrame: 按 (股票代码, 日期) 的情绪面板，见news.sentiment.sentiment_panel
+    """
+    def load(symbol):
+        if refresh:
+            return NewsAnalyzer(symbol, market_type).get_news(days)
+        return _cached_news(symbol, market_type, days)
+    
+    dfs = []
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='market-news') as executor:
+        for symbol, df in zip(symbols, executor.map(load, symbols)):
+            if df is not None and not df.empty:
+                dfs.append(df.assign(symbol=symbol))
+    
+    news = pd.concat(dfs, ignore_index=True) if dfs else pd.DataFrame()
+    return sentiment_panel(news)
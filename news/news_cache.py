@@ -0,0 +1,204 @@
+"""
+新闻缓存
+
+按 (股票代码, 新闻来源) 缓存新闻，进程内所有会话共用，并持久化到本地缓存目录。
+缓存未过期时直接返回；过期后只向来源请求上次获取之后的新闻，与已有新闻合并。
+内存中按最近使用淘汰，每个来源只保留最近一段时间、有限条数的新闻。
+"""
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from data.storage import cache_path, read_json, read_parquet, write_json, write_parquet
+
+# 缓存有效期（秒）
+NEWS_TTL = 600
+
+# 内存中最多缓存的 (股票代码, 新闻来源) 数量
+MAX_ENTRIES = 256
+
+# 每个来源最多保留的新闻条数和天数
+MAX_ITEMS = 500
+RETENTION_DAYS = 30
+
+NEWS_COLUMNS = ['title', 'datetime', 'source']
+
+
+class NewsCache:
+    """
+    新闻缓存类
+    """
+    def __init__(self, ttl=NEWS_TTL, max_entries=MAX_ENTRIES, max_items=MAX_ITEMS,
+                 retention_days=RETENTION_DAYS, root='news'):
+        """
+        初始化新闻缓存
+
+        Args:
+            ttl (int): 缓存有效期（秒）
+            max_entries (int): 内存中最多缓存的条目数
+            max_items (int): 每个条目最多保留的新闻条数
+            retention_days (int): 每个条目保留最近几天的新闻
+            root (str): 缓存根目录下的子目录名
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_items = max_items
+        self.retention_days = retention_days
+        self.root = root
+        # (股票代码, 新闻来源) -> {'news': pd.DataFrame, 'fetched_at': 获取时间, 'covered_from': 已覆盖的最早时间}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def _paths(self, symbol, source):
+        """
+        获取条目的数据文件和元数据文件路径
+        """
+        return (cache_path(self.root, symbol, f"{source}.parquet"),
+                cache_path(self.root, symbol, f"{source}.json"))
+
+    def _lock_for(self, key):
+        """
+        获取条目锁，多个会话同时请求同一条目时只获取一次
+        """
+        with self._lock:
+            if key not in self._key_locks:
+                self._key_locks[key] = threading.Lock()
+            return self._key_locks[key]
+
+    def _load(self, key):
+        """
+        读取条目，内存中没有时从本地文件加载
+
+        Returns:
+            dict: 缓存条目，没有缓存时返回None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+
+        data_path, meta_path = self._paths(*key)
+        news = read_parquet(data_path)
+        meta = read_json(meta_path, default={})
+        if news is None or 'fetched_at' not in meta:
+            return None
+        fetched_at = datetime.fromisoformat(meta['fetched_at'])
+        entry = {
+            'news': news,
+            'fetched_at': fetched_at,
+            'covered_from': datetime.fromisoformat(meta.get('covered_from', meta['fetched_at']))
+        }
+        self._store(key, entry)
+        return entry
+
+    def _store(self, key, entry):
+        """
+        写入内存，超过容量时淘汰最久未使用的条目
+        """
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _merge(self, old, new, now):
+        """
+        合并新旧新闻，按标题去重，只保留最近的有限条数
+        """
+        frames = [df[NEWS_COLUMNS] for df in (new, old) if df is not None and not df.empty]
+        if not frames:
+            return pd.DataFrame(columns=NEWS_COLUMNS)
+        news = pd.concat(frames, ignore_index=True).drop_duplicates(subset=['title'])
+        news = news[news['datetime'] >= now - timedelta(days=self.retention_days)]
+        return news.sort_values('datetime', ascending=False).head(self.max_items).reset_index(drop=True)
+
+    @staticmethod
+    def _window(entry, days):
+        """
+        从条目中取最近几天的新闻
+        """
+        if entry is None:
+            return pd.DataFrame()
+        news = entry['news']
+        return news[news['datetime'] >= datetime.now() - timedelta(days=days)].copy()
+
+    def peek(self, symbol, source, days=7):
+        """
+        读取缓存的新闻，不论是否过期，也不请求来源
+
+        Returns:
+            pd.DataFrame: 新闻数据，没有缓存时为空
+        """
+        return self._window(self._load((symbol, source)), days)
+
+    def get(self, symbol, source, days, fetcher):
+        """
+        获取新闻，缓存过期时增量更新
+
+        Args:
+            symbol (str): 股票代码
+            source (str): 新闻来源
+            days (int): 获取最近几天的新闻
+            fetcher (function): 来源获取函数 fetcher(since)，since为None时获取最近days天的全部新闻，
+                否则只获取since之后的新闻
+
+        Returns:
+            pd.DataFrame: 新闻数据
+        """
+        key = (symbol, source)
+        with self._lock_for(key):
+            now = datetime.now()
+            entry = self._load(key)
+            covered = entry is not None and entry['covered_from'] <= now - timedelta(days=days)
+            if covered and (now - entry['fetched_at']).total_seconds() < self.ttl:
+                return self._window(entry, days)
+
+            # 已有缓存且覆盖了请求的天数时，只请求最新一条之后的新闻
+            since = None
+            if covered and not entry['news'].empty:
+                since = entry['news']['datetime'].max()
+
+            try:
+                new = fetcher(since)
+            except Exception as e:
+                print(f"更新{source}新闻缓存出错: {str(e)}")
+                new = None
+            if new is None:
+                # 获取失败时返回旧缓存
+                return self._window(entry, days)
+
+            news = self._merge(entry['news'] if entry else None, new, now)
+            # 记录缓存已覆盖到的最早时间，超出保留期的部分已被清理
+            covered_from = now - timedelta(days=days)
+            if since is not None:
+                covered_from = min(covered_from, entry['covered_from'])
+            covered_from = max(covered_from, now - timedelta(days=self.retention_days))
+            entry = {'news': news, 'fetched_at': now, 'covered_from': covered_from}
+            self._store(key, entry)
+
+            data_path, meta_path = self._paths(symbol, source)
+            write_parquet(news, data_path)
+            write_json({'fetched_at': now.isoformat(), 'covered_from': covered_from.isoformat()}, meta_path)
+            return self._window(entry, days)
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_news_cache():
+    """
+    获取进程内共享的新闻缓存
+
+    Returns:
+        NewsCache: 新闻缓存
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = NewsCache()
+        return _default_cache
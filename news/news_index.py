@@ -0,0 +1,321 @@
+"""
+新闻本地索引
+
+后台采集到的新闻写入本地SQLite数据库（.cache/news/index.db），按 (股票代码, 发布时间) 建索引，
+同一股票的新闻按规范化标题的哈希去重。标题另建FTS5全文索引（trigram分词，支持中文子串检索）。
+查询某只股票最近几天的新闻只是一次索引查找，不再实时抓取。
+
+数据库使用WAL模式，采集进程写入的同时应用进程可以并发读取。
+"""
+import hashlib
+import re
+import sqlite3
+import threading
+import unicodedata
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from data.storage import cache_path
+
+# 索引数据库文件（相对缓存根目录）
+INDEX_FILE = ('news', 'index.db')
+
+# 采集状态超过该时间（秒）未更新时，视为没有后台采集，回退到实时获取
+INDEX_MAX_AGE = 900
+
+# 索引保留最近几天的新闻
+INDEX_RETENTION_DAYS = 30
+
+# 规范化标题时去掉的字符：空白、标点和符号
+_NOISE = re.compile(r'[\W_]+')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS news (
+    id INTEGER PRIMARY KEY,
+    symbol TEXT NOT NULL,
+    published TEXT NOT NULL,
+    source TEXT NOT NULL,
+    title TEXT NOT NULL,
+    title_hash TEXT NOT NULL,
+    UNIQUE (symbol, title_hash)
+);
+CREATE INDEX IF NOT EXISTS news_symbol_published ON news (symbol, published);
+CREATE TABLE IF NOT EXISTS ingest_state (
+    symbol TEXT PRIMARY KEY,
+    polled_at TEXT NOT NULL,
+    covered_from TEXT NOT NULL
+);
+"""
+
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS news_fts USING fts5(
+    title, content='news', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS news_fts_insert AFTER INSERT ON news BEGIN
+    INSERT INTO news_fts (rowid, title) VALUES (new.id, new.title);
+END;
+CREATE TRIGGER IF NOT EXISTS news_fts_delete AFTER DELETE ON news BEGIN
+    INSERT INTO news_fts (news_fts, rowid, title) VALUES ('delete', old.id, old.title);
+END;
+"""
+
+# 时间按该格式保存为文本，字符串顺序即时间顺序
+_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def normalize_title(title):
+    """
+    规范化标题：全半角统一、转小写、去掉空白和标点
+
+    Args:
+        title (str): 新闻标题
+
+    Returns:
+        str: 规范化后的标题
+    """
+    return _NOISE.sub('', unicodedata.normalize('NFKC', str(title)).lower())
+
+
+def title_hash(title):
+    """
+    计算规范化标题的哈希，用于去重
+
+    Args:
+        title (str): 新闻标题
+
+    Returns:
+        str: 16位十六进制哈希
+    """
+    return hashlib.sha1(normalize_title(title).encode('utf-8')).hexdigest()[:16]
+
+
+def _format_time(value):
+    """
+    将时间格式化为索引中保存的文本
+    """
+    return pd.Timestamp(value).strftime(_TIME_FORMAT)
+
+
+class NewsIndex:
+    """
+    新闻本地索引类
+    """
+    def __init__(self, path=None, retention_days=INDEX_RETENTION_DAYS):
+        """
+        打开（必要时创建）索引数据库
+
+        Args:
+            path (str): 数据库文件路径，默认为缓存目录下的 news/index.db
+            retention_days (int): 保留最近几天的新闻
+        """
+        self.path = path or cache_path(*INDEX_FILE)
+        self.retention_days = retention_days
+        # sqlite连接不能跨线程使用，每个线程单独连接
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self.fts = True
+        conn = self._connect()
+        with conn:
+            conn.executescript(_SCHEMA)
+            try:
+                conn.executescript(_FTS_SCHEMA)
+            except sqlite3.OperationalError as e:
+                # sqlite未编译FTS5或不支持trigram分词时，全文检索退化为LIKE查询
+                print(f"新闻索引不支持全文检索，使用普通查询: {str(e)}")
+                self.fts = False
+
+    def _connect(self):
+        """
+        获取当前线程的数据库连接
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def add(self, symbol, news):
+        """
+        写入一只股票的新闻，已存在的标题（规范化后相同）忽略
+
+        Args:
+            symbol (str): 股票代码
+            news (pd.DataFrame): 新闻数据，需包含 title、datetime、source 列
+
+        Returns:
+            int: 新写入的新闻条数
+        """
+        if news is None or news.empty:
+            return 0
+        news = news.dropna(subset=['title', 'datetime'])
+        rows = [
+            (symbol, _format_time(published), source, title, title_hash(title))
+            for title, published, source in zip(news['title'], news['datetime'], news['source'])
+        ]
+        conn = self._connect()
+        with self._write_lock, conn:
+            cursor = conn.executemany(
+                'INSERT OR IGNORE INTO news (symbol, published, source, title, title_hash) '
+                'VALUES (?, ?, ?, ?, ?)',
+                rows
+            )
+            # rowcount只统计news表实际插入的行，不含全文索引触发器的写入
+            return cursor.rowcount
+
+    def mark_polled(self, symbol, days, now=None):
+        """
+        记录一只股票完成一次采集
+
+        Args:
+            symbol (str): 股票代码
+            days (int): 本次采集覆盖最近几天
+            now (datetime): 采集时间，默认为系统时间
+        """
+        now = now or datetime.now()
+        covered_from = _format_time(now - timedelta(days=days))
+        conn = self._connect()
+        with self._write_lock, conn:
+            conn.execute(
+                'INSERT INTO ingest_state (symbol, polled_at, covered_from) VALUES (?, ?, ?) '
+                'ON CONFLICT (symbol) DO UPDATE SET polled_at = excluded.polled_at, '
+                'covered_from = max(min(covered_from, excluded.covered_from), ?)',
+                # 已覆盖的范围不早于保留期，更早的新闻已被清理
+                (symbol, _format_time(now), covered_from,
+                 _format_time(now - timedelta(days=self.retention_days)))
+            )
+
+    def is_fresh(self, symbol, days=7, max_age=INDEX_MAX_AGE, now=None):
+        """
+        判断索引中的新闻是否由后台采集保持更新，且覆盖了请求的天数
+
+        Args:
+            symbol (str): 股票代码
+            days (int): 请求最近几天的新闻
+            max_age (int): 最近一次采集距今的最大秒数
+            now (datetime): 当前时间，默认为系统时间
+
+        Returns:
+            bool: 是否可以直接查询索引
+        """
+        now = now or datetime.now()
+        row = self._connect().execute(
+            'SELECT polled_at, covered_from FROM ingest_state WHERE symbol = ?', (symbol,)
+        ).fetchone()
+        if row is None:
+            return False
+        polled_at, covered_from = row
+        return (polled_at >= _format_time(now - timedelta(seconds=max_age))
+                and covered_from <= _format_time(now - timedelta(days=days)))
+
+    def latest(self, symbol, source):
+        """
+        获取一只股票某个来源最新一条新闻的时间，用于增量采集
+
+        Returns:
+            pd.Timestamp: 最新新闻时间，没有新闻时返回None
+        """
+        row = self._connect().execute(
+            'SELECT max(published) FROM news WHERE symbol = ? AND source = ?', (symbol, source)
+        ).fetchone()
+        return pd.Timestamp(row[0]) if row and row[0] else None
+
+    @staticmethod
+    def _frame(cursor, columns=('title', 'datetime', 'source')):
+        """
+        将查询结果转换为新闻表
+        """
+        df = pd.DataFrame(cursor.fetchall(), columns=list(columns))
+        df['datetime'] = pd.to_datetime(df['datetime'])
+        return df
+
+    def query(self, symbol, days=7, limit=None):
+        """
+        查询一只股票最近几天的新闻
+
+        Args:
+            symbol (str): 股票代码
+            days (int): 最近几天
+            limit (int): 最多返回条数，默认不限
+
+        Returns:
+            pd.DataFrame: 新闻数据，按时间倒序
+        """
+        since = _format_time(datetime.now() - timedelta(days=days))
+        cursor = self._connect().execute(
+            'SELECT title, published, source FROM news WHERE symbol = ? AND published >= ? '
+            'ORDER BY published DESC LIMIT ?',
+            (symbol, since, -1 if limit is None else limit)
+        )
+        return self._frame(cursor)
+
+    def search(self, text, symbol=None, days=None, limit=50):
+        """
+        按标题全文检索新闻
+
+        Args:
+            text (str): 检索词
+            symbol (str): 只检索该股票的新闻，默认检索全部
+            days (int): 只检索最近几天，默认不限
+            limit (int): 最多返回条数
+
+        Returns:
+            pd.DataFrame: 新闻数据（含symbol列），按时间倒序
+        """
+        conditions, params = [], []
+        # trigram分词至少需要3个字，更短的检索词使用LIKE
+        if self.fts and len(text) >= 3:
+            conditions.append('news.id IN (SELECT rowid FROM news_fts WHERE news_fts MATCH ?)')
+            params.append('"' + text.replace('"', '""') + '"')
+        else:
+            conditions.append("news.title LIKE ? ESCAPE '\\'")
+            params.append('%' + re.sub(r'([%_\\])', r'\\\1', text) + '%')
+        if symbol is not None:
+            conditions.append('news.symbol = ?')
+            params.append(symbol)
+        if days is not None:
+            conditions.append('news.published >= ?')
+            params.append(_format_time(datetime.now() - timedelta(days=days)))
+
+        cursor = self._connect().execute(
+            'SELECT title, published, source, symbol FROM news WHERE ' + ' AND '.join(conditions) +
+            ' ORDER BY published DESC LIMIT ?',
+            params + [limit]
+        )
+        return self._frame(cursor, ('title', 'datetime', 'source', 'symbol'))
+
+    def purge(self, now=None):
+        """
+        删除超过保留期的新闻
+
+        Returns:
+            int: 删除的新闻条数
+        """
+        now = now or datetime.now()
+        conn = self._connect()
+        with self._write_lock, conn:
+            cursor = conn.execute(
+                'DELETE FROM news WHERE published < ?',
+                (_format_time(now - timedelta(days=self.retention_days)),)
+            )
+            return cursor.rowcount
+
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+
+def get_news_index():
+    """
+    获取进程内共享的新闻索引
+
+    Returns:
+        NewsIndex: 新闻索引
+    """
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = NewsIndex()
+        return _default_index
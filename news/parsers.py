@@ -0,0 +1,128 @@
+"""
+新闻来源响应解析
+
+每个函数只把来源接口返回的原始文本解析为统一格式的新闻表，不发送请求，
+可以直接用保存下来的响应样本验证解析结果。
+"""
+import json
+
+import pandas as pd
+
+NEWS_COLUMNS = ['title', 'datetime', 'source']
+
+
+def _loads(text):
+    """
+    解析JSON文本，兼容JSONP包装（如 jQuery({...})）
+
+    Returns:
+        解析结果，无法解析时返回None
+    """
+    if not text:
+        return None
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        start_idx = text.find('{')
+        end_idx = text.rfind('}') + 1
+        if start_idx == -1 or end_idx == 0:
+            return None
+        try:
+            return json.loads(text[start_idx:end_idx])
+        except json.JSONDecodeError:
+            return None
+
+
+def _frame(records, source, title_field, time_fields, unit=None):
+    """
+    将新闻记录列表转换为统一格式
+
+    Args:
+        records (list): 新闻记录
+        source (str): 新闻来源名称
+        title_field (str): 标题字段
+        time_fields (list): 时间字段，按顺序取第一个存在的字段
+        unit (str): 时间戳单位，字段为时间字符串时为None
+
+    Returns:
+        pd.DataFrame: 列为 title, datetime, source
+    """
+    if not records:
+        return pd.DataFrame()
+    df = pd.DataFrame(records)
+
+    time_field = next((field for field in time_fields if field in df.columns), None)
+    if time_field is None:
+        df['datetime'] = pd.to_datetime('now')
+    elif unit:
+        df['datetime'] = pd.to_datetime(df[time_field], unit=unit)
+    else:
+        df['datetime'] = pd.to_datetime(df[time_field])
+
+    df['title'] = df[title_field] if title_field in df.columns else '无标题'
+    df['source'] = source
+    return df[NEWS_COLUMNS]
+
+
+def parse_eastmoney(text):
+    """
+    解析东方财富网公告列表接口的响应
+
+    Args:
+        text (str): 响应文本（JSON或JSONP）
+
+    Returns:
+        pd.DataFrame: 新闻数据
+    """
+    data = _loads(text)
+    if not isinstance(data, dict) or not isinstance(data.get('data'), dict) or 'list' not in data['data']:
+        return pd.DataFrame()
+    return _frame(data['data']['list'], '东方财富网', 'title', ['notice_date'])
+
+
+def parse_sina(text):
+    """
+    解析新浪财经新闻列表接口的响应
+
+    Args:
+        text (str): 响应文本
+
+    Returns:
+        pd.DataFrame: 新闻数据
+    """
+    data = _loads(text)
+    if not isinstance(data, list):
+        return pd.DataFrame()
+    return _frame(data, '新浪财经', 'title', ['time'])
+
+
+def parse_xueqiu(text):
+    """
+    解析雪球搜索接口的响应
+
+    Args:
+        text (str): 响应文本
+
+    Returns:
+        pd.DataFrame: 新闻数据，created_at为毫秒时间戳
+    """
+    data = _loads(text)
+    if not isinstance(data, dict) or 'list' not in data:
+        return pd.DataFrame()
+    return _frame(data['list'], '雪球', 'text', ['created_at'], unit='ms')
+
+
+def parse_10jqka(text):
+    """
+    解析同花顺个股新闻接口的响应
+
+    Args:
+        text (str): 响应文本
+
+    Returns:
+        pd.DataFrame: 新闻数据
+    """
+    data = _loads(text)
+    if not isinstance(data, dict) or 'data' not in data:
+        return pd.DataFrame()
+    return _frame(data['data'], '同花顺', 'title', ['ctime', 'time'])
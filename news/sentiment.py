@@ -0,0 +1,234 @@
+"""
+新闻情绪分析
+
+情绪词典在导入时编译成一个正则表达式（按词长从长到短排列的多模式匹配，最长优先），
+批量打分时把全部标题拼接成一个字符串只扫描一遍，再按位置把命中的词归到各条标题。
+每个词带权重，词前面同一分句内出现否定词时权重取反。
+单字否定词只按整词生效，不断、非常、无论这类含否定字的普通词语不算否定。
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+# 利好词及权重
+POSITIVE_TERMS = {
+    '增长': 1, '上涨': 1, '突破': 1, '创新': 1, '利好': 2, '成功': 1, '盈利': 1, '扩张': 1,
+    '创新高': 2, '突破性': 1, '突破性进展': 2, '突破性创新': 2, '突破性发展': 2, '突破性成果': 2,
+    '突破性技术': 2, '突破性产品': 2, '突破性服务': 2, '突破性解决方案': 2, '突破性商业模式': 2,
+    '突破性市场': 2, '突破性客户': 2, '突破性合作': 2, '突破性协议': 2, '突破性订单': 2,
+    '突破性项目': 2, '突破性工程': 2, '突破性建设': 2, '突破性投资': 2, '突破性融资': 2,
+    '突破性并购': 2, '突破性重组': 2, '突破性改革': 2, '突破性进步': 2, '突破性提升': 2,
+    '突破性改善': 2, '突破性优化': 2, '突破性升级': 2, '突破性转型': 2, '突破性改造': 2
+}
+
+# 利空词及权重
+NEGATIVE_TERMS = {
+    '下跌': 1, '风险': 1, '问题': 1, '危机': 2, '下滑': 1, '失败': 1, '亏损': 2, '下降': 1, '收缩': 1,
+    '风险提示': 1, '风险预警': 2, '风险警示': 2
+}
+
+# 否定词：出现在情绪词前面同一分句内时情绪取反
+NEGATION_WORDS = ['不', '未', '没有', '无', '非', '并非', '否认', '难以', '不再', '未能']
+
+# 含否定字但不表示否定的常用词语，匹配否定词时整体跳过
+NEGATION_EXCEPTIONS = [
+    '不断', '不仅', '不少', '不错', '不菲', '不俗', '不凡', '不同', '不久', '不管',
+    '非常', '非凡', '无论', '无疑', '无限', '无线', '未来'
+]
+
+# 否定词向前查找的最大字数
+NEGATION_WINDOW = 4
+
+# 分句标点及空白，否定词不跨分句生效
+_CLAUSE_BREAKS = np.array([ord(char) for char in '，。；！？,.;!?、 \t\n'], dtype=np.uint32)
+
+# 拼接标题时使用的分隔符
+_SEPARATOR = '\n'
+
+
+def _alternation(words):
+    """
+    将词表编译为正则表达式，长词在前保证最长匹配
+    """
+    words = sorted(set(words), key=lambda word: (-len(word), word))
+    return re.compile('|'.join(re.escape(word) for word in words))
+
+
+class SentimentMatcher:
+    """
+    情绪词匹配器
+    """
+    def __init__(self, weights, negations=NEGATION_WORDS, negation_window=NEGATION_WINDOW,
+                 exceptions=NEGATION_EXCEPTIONS):
+        """
+        编译情绪词典
+
+        Args:
+            weights (dict): {情绪词: 权重}，利好为正、利空为负
+            negations (list): 否定词
+            negation_window (int): 否定词向前查找的最大字数
+            exceptions (list): 含否定字但不表示否定的词语
+        """
+        self.weights = {word.lower(): weight for word, weight in weights.items()}
+        self.negation_window = negation_window
+        self._pattern = _alternation(self.weights)
+        self._negations = set(negations)
+        # 例外词语与否定词一起按最长优先匹配，例外词语先被整体匹配掉，其中的否定字不再单独命中
+        self._negation = _alternation(list(negations) + list(exceptions))
+
+    def score(self, text):
+        """
+        计算单条文本的情绪分数
+
+        Args:
+            text (str): 文本
+
+        Returns:
+            float: 情绪分数，正数偏利好，负数偏利空
+        """
+        return float(self.score_many([text])[0])
+
+    @staticmethod
+    def _positions(pattern, text, words=None):
+        """
+        获取正则在文本中所有匹配的起止位置，给出words时只保留匹配内容在其中的位置
+        """
+        spans = [match.span() for match in pattern.finditer(text) if words is None or match.group() in words]
+        if not spans:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        spans = np.asarray(spans, dtype=np.int64)
+        return spans[:, 0], spans[:, 1]
+
+    def score_many(self, texts):
+        """
+        批量计算情绪分数：全部文本拼接后只扫描一遍
+
+        Args:
+            texts (iterable): 文本序列，非字符串按空文本处理
+
+        Returns:
+            np.ndarray: 与输入顺序一致的情绪分数
+        """
+        texts = [text.replace(_SEPARATOR, ' ') if isinstance(text, str) else '' for text in texts]
+        if not texts:
+            return np.zeros(0)
+
+        joined = _SEPARATOR.join(texts).lower()
+        # 每条文本在拼接字符串中的起始位置
+        lengths = np.fromiter((len(text) + 1 for text in texts), dtype=np.int64, count=len(texts))
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+
+        matches = [(match.start(), match.group()) for match in self._pattern.finditer(joined)]
+        if not matches:
+            return np.zeros(len(texts))
+        starts = np.fromiter((start for start, _ in matches), dtype=np.int64, count=len(matches))
+        weights = np.fromiter((self.weights[word] for _, word in matches), dtype=float, count=len(matches))
+
+        # 否定词的查找范围：向前negation_window个字，且不越过分句标点（分隔符也是分句标点）
+        chars = np.frombuffer(joined.encode('utf-32-le'), dtype=np.uint32)
+        breaks = np.concatenate(([-1], np.flatnonzero(np.isin(chars, _CLAUSE_BREAKS))))
+        clause_start = breaks[np.searchsorted(breaks, starts) - 1] + 1
+        lower = np.maximum(starts - self.negation_window, clause_start)
+
+        # 统计完整落在 [lower, start) 内的否定词个数，奇数个视为否定
+        neg_starts, neg_ends = self._positions(self._negation, joined, self._negations)
+        negations = np.searchsorted(neg_ends, starts, side='right') - np.searchsorted(neg_starts, lower)
+        weights = np.where(np.maximum(negations, 0) % 2 == 1, -weights, weights)
+
+        rows = np.searchsorted(offsets, starts, side='right') - 1
+        return np.bincount(rows, weights=weights, minlength=len(texts))
+
+
+# 情绪标签
+LABELS = ('利好', '利空', '中性')
+
+
+def label(score):
+    """
+    将情绪分数转换为情绪标签
+
+    Args:
+        score (float): 情绪分数
+
+    Returns:
+        str: 利好 / 利空 / 中性
+    """
+    if score > 0:
+        return '利好'
+    if score < 0:
+        return '利空'
+    return '中性'
+
+
+def labels(scores):
+    """
+    批量将情绪分数转换为情绪标签
+
+    Args:
+        scores (np.ndarray): 情绪分数
+
+    Returns:
+        np.ndarray: 情绪标签
+    """
+    scores = np.asarray(scores, dtype=float)
+    return np.select([scores > 0, scores < 0], [LABELS[0], LABELS[1]], default=LABELS[2])
+
+
+# 默认情绪词典，导入时编译一次
+DEFAULT_MATCHER = SentimentMatcher({
+    **POSITIVE_TERMS,
+    **{word: -weight for word, weight in NEGATIVE_TERMS.items()}
+})
+
+
+def score_batch(titles, matcher=None):
+    """
+    批量计算新闻标题的情绪分数和标签
+
+    Args:
+        titles (pd.Series): 新闻标题
+        matcher (SentimentMatcher): 情绪词匹配器，默认使用内置词典
+
+    Returns:
+        pd.DataFrame: 与titles索引一致，列为 score（情绪分数）、label（情绪标签）
+    """
+    titles = pd.Series(titles)
+    scores = (matcher or DEFAULT_MATCHER).score_many(titles)
+    return pd.DataFrame({'score': scores, 'label': labels(scores)}, index=titles.index)
+
+
+def sentiment_panel(news, matcher=None):
+    """
+    将多只股票的新闻汇总为按 (股票代码, 日期) 的情绪面板
+
+    Args:
+        news (pd.DataFrame): 新闻数据，需包含 symbol、datetime、title 列
+        matcher (SentimentMatcher): 情绪词匹配器，默认使用内置词典
+
+    Returns:
+        pd.DataFrame: 索引为 (symbol, date)，列为
+            news_count（新闻数）、positive（利好数）、negative（利空数）、
+            score（情绪分数合计）、net（(利好数 - 利空数) / 新闻数）
+    """
+    columns = ['news_count', 'positive', 'negative', 'score', 'net']
+    if news is None or news.empty:
+        index = pd.MultiIndex.from_arrays([[], []], names=['symbol', 'date'])
+        return pd.DataFrame(columns=columns, index=index)
+
+    scored = score_batch(news['title'], matcher)
+    frame = pd.DataFrame({
+        'symbol': news['symbol'].values,
+        'date': pd.to_datetime(news['datetime']).dt.normalize().values,
+        'score': scored['score'].values,
+        'positive': (scored['score'] > 0).values,
+        'negative': (scored['score'] < 0).values
+    })
+    panel = frame.groupby(['symbol', 'date']).agg(
+        news_count=('score', 'size'),
+        positive=('positive', 'sum'),
+        negative=('negative', 'sum'),
+        score=('score', 'sum')
+    )
+    panel['net'] = (panel['positive'] - panel['negative']) / panel['news_count']
+    return panel[columns]
@@ -0,0 +1,280 @@
+"""
+截面选股：把全部股票对齐成 日期 × 股票代码 的面板，按需向量化计算指标并筛选
+"""
+import numpy as np
+import pandas as pd
+
+# 面板包含的行情字段（小写列名）
+PANEL_FIELDS = ['open', 'high', 'low', 'close', 'volume', 'turn']
+
+# 价格字段：停牌日沿用前一交易日价格
+PRICE_FIELDS = ['open', 'high', 'low', 'close']
+
+
+def build_panel(frames):
+    """
+    将多只股票的K线对齐为面板
+
+    停牌日价格沿用前一交易日，成交量和换手率记为0；上市前保持为空。
+
+    Args:
+        frames (dict): {股票代码: pd.DataFrame}，DataFrame为含date列的小写列名K线
+
+    Returns:
+        dict: {字段名: pd.DataFrame(index=日期, columns=股票代码)}
+    """
+    frames = {code: df for code, df in frames.items() if df is not None and not df.empty}
+    codes = list(frames)
+    date_values = [frames[code]['date'].to_numpy(dtype='datetime64[ns]') for code in codes]
+    dates = np.unique(np.concatenate(date_values))
+
+    # 直接写入二维数组，保证每个字段是单一数据块，后续向量化运算更快
+    arrays = {field: np.full((len(dates), len(codes)), np.nan) for field in PANEL_FIELDS}
+    for j, code in enumerate(codes):
+        df = frames[code]
+        rows = np.searchsorted(dates, date_values[j])
+        for field in PANEL_FIELDS:
+            if field in df.columns:
+                arrays[field][rows, j] = df[field].to_numpy(dtype=float)
+
+    index = pd.DatetimeIndex(dates)
+    panel = {field: pd.DataFrame(values, index=index, columns=codes) for field, values in arrays.items()}
+
+    listed = panel['close'].ffill().notna()
+    for field in PRICE_FIELDS:
+        panel[field] = panel[field].ffill()
+    for field in ('volume', 'turn'):
+        panel[field] = panel[field].fillna(0).where(listed)
+    return panel
+
+
+def _ema(frame, span):
+    return frame.ewm(span=span, adjust=False).mean()
+
+
+def _ma(panel):
+    """
+    均线
+    """
+    close = panel['close']
+    return {f'MA{period}': close.rolling(period).mean() for period in (5, 10, 20, 60)}
+
+
+def _macd(panel):
+    """
+    MACD
+    """
+    close = panel['close']
+    macd = _ema(close, 12) - _ema(close, 26)
+    signal = _ema(macd, 9)
+    return {'MACD': macd, 'MACD_SIGNAL': signal, 'MACD_HIST': macd - signal}
+
+
+def _rsi(panel):
+    """
+    RSI（Wilder平滑）
+    """
+    delta = panel['close'].diff()
+    avg_gain = delta.clip(lower=0).ewm(alpha=1 / 14, adjust=False).mean()
+    avg_loss = (-delta.clip(upper=0)).ewm(alpha=1 / 14, adjust=False).mean()
+    return {'RSI': 100 - 100 / (1 + avg_gain / avg_loss)}
+
+
+def _bbands(panel):
+    """
+    布林带（总体标准差）
+    """
+    close = panel['close']
+    middle = close.rolling(20).mean()
+    std = close.rolling(20).std(ddof=0)
+    return {'BB_UPPER': middle + 2 * std, 'BB_MIDDLE': middle, 'BB_LOWER': middle - 2 * std}
+
+
+def _kdj(panel):
+    """
+    KDJ（与talib.STOCH默认参数一致：5, 3, 3）
+    """
+    lowest, highest = panel['low'].rolling(5).min(), panel['high'].rolling(5).max()
+    fast_k = 100 * (panel['close'] - lowest) / (highest - lowest)
+    k = fast_k.rolling(3).mean()
+    d = k.rolling(3).mean()
+    return {'KDJ_K': k, 'KDJ_D': d, 'KDJ_J': 3 * k - 2 * d}
+
+
+def _volume_ma(panel):
+    """
+    成交量和换手率均线
+    """
+    result = {}
+    for period in (5, 10):
+        result[f'VOL_MA{period}'] = panel['volume'].rolling(period).mean()
+        result[f'TURN_MA{period}'] = panel['turn'].rolling(period).mean()
+    return result
+
+
+def _bars(panel):
+    """
+    每只股票已有的K线数量
+    """
+    return {'BARS': panel['close'].notna().cumsum()}
+
+
+# 指标组：组名 -> (计算代价, 计算函数, 产出的列)
+INDICATOR_GROUPS = {
+    'BARS': (0, _bars, ['BARS']),
+    'MA': (1, _ma, ['MA5', 'MA10', 'MA20', 'MA60']),
+    'VOL_MA': (1, _volume_ma, ['VOL_MA5', 'VOL_MA10', 'TURN_MA5', 'TURN_MA10']),
+    'RSI': (2, _rsi, ['RSI']),
+    'BBANDS': (2, _bbands, ['BB_UPPER', 'BB_MIDDLE', 'BB_LOWER']),
+    'KDJ': (3, _kdj, ['KDJ_K', 'KDJ_D', 'KDJ_J']),
+    'MACD': (3, _macd, ['MACD', 'MACD_SIGNAL', 'MACD_HIST'])
+}
+
+# 指标列 -> 指标组
+INDICATOR_COLUMNS = {col: group for group, (_, _, cols) in INDICATOR_GROUPS.items() for col in cols}
+
+
+def compute_panel_indicators(panel):
+    """
+    对整个面板一次性计算全部战法指标，与compute_indicators的列名一致
+
+    Args:
+        panel (dict): build_panel返回的面板
+
+    Returns:
+        dict: {指标名: pd.DataFrame(index=日期, columns=股票代码)}，包含原始行情字段
+    """
+    ind = dict(panel)
+    for _, func, _ in INDICATOR_GROUPS.values():
+        ind.update(func(panel))
+    return ind
+
+
+class PanelContext:
+    """
+    面板计算上下文：指标按需计算，且只计算给定股票子集，已算过的部分缓存复用
+    """
+    def __init__(self, panel):
+        """
+        初始化计算上下文
+
+        Args:
+            panel (dict): {字段名: pd.DataFrame(index=日期, columns=股票代码)}
+        """
+        self.fields = dict(panel)
+        self.codes = self.fields['close'].columns
+        # 指标组 -> 已计算的股票代码
+        self._computed = {}
+
+    @classmethod
+    def from_frame(cls, df, code='_'):
+        """
+        由单只股票的DataFrame构建上下文，已有的指标列直接使用
+
+        Args:
+            df (pd.DataFrame): 小写列名的K线数据，可包含已计算的指标
+            code (str): 股票代码
+
+        Returns:
+            PanelContext: 计算上下文
+        """
+        numeric = df.select_dtypes(include='number')
+        return cls({col: numeric[[col]].set_axis([code], axis=1) for col in numeric.columns})
+
+    def _missing(self, name, codes):
+        """
+        获取尚未计算该指标的股票代码
+        """
+        group = INDICATOR_COLUMNS.get(name)
+        if group is None or (name in self.fields and group not in self._computed):
+            # 原始行情字段，或构建上下文时已提供的指标列
+            return codes[:0]
+        done = self._computed.get(group)
+        return codes if done is None else codes.difference(done)
+
+    def cost(self, names):
+        """
+        估算计算一组指标的代价，已计算的指标不计
+        """
+        groups = {INDICATOR_COLUMNS[name] for name in names
+                  if name in INDICATOR_COLUMNS and len(self._missing(name, self.codes))}
+        return sum(INDICATOR_GROUPS[group][0] for group in groups)
+
+    def frame(self, name, codes):
+        """
+        获取指标在给定股票上的时间序列，必要时只为缺失的股票计算
+
+        Args:
+            name (str): 指标名或行情字段名
+            codes (pd.Index): 股票代码
+
+        Returns:
+            pd.DataFrame: index=日期, columns=股票代码
+        """
+        missing = self._missing(name, codes)
+        if len(missing):
+            group = INDICATOR_COLUMNS[name]
+            _, func, cols = INDICATOR_GROUPS[group]
+            subset = {field: self.fields[field][missing] for field in PANEL_FIELDS if field in self.fields}
+            result = func(subset)
+            for col in cols:
+                if col in self.fields and group in self._computed:
+                    self.fields[col] = pd.concat([self.fields[col], result[col]], axis=1)
+                else:
+                    self.fields[col] = result[col]
+            done = self._computed.get(group)
+            self._computed[group] = missing if done is None else done.union(missing)
+        return self.fields[name][codes]
+
+    def series(self, name, codes, lag=0):
+        """
+        获取指标在倒数第lag+1个交易日的截面值
+
+        Returns:
+            pd.Series: 以股票代码为索引
+        """
+        return self.frame(name, codes).iloc[-1 - lag]
+
+    def window(self, name, codes, lag=0, length=None):
+        """
+        获取截至倒数第lag+1个交易日、长度为length的历史窗口（None表示全部历史）
+
+        Returns:
+            pd.DataFrame: index=日期, columns=股票代码
+        """
+        frame = self.frame(name, codes)
+        end = len(frame) - lag
+        start = 0 if length is None else max(0, end - length)
+        return frame.iloc[start:end]
+
+
+def screen(ctx, mask_func, min_bars=60):
+    """
+    按截面条件筛选股票
+
+    Args:
+        ctx (PanelContext): 计算上下文
+        mask_func (function): 截面条件 mask_func(ctx, codes)，返回以股票代码为索引的布尔Series
+        min_bars (int): 最少K线数量
+
+    Returns:
+        list: 与逐只分析相同格式的结果列表
+    """
+    codes = ctx.codes[(ctx.series('BARS', ctx.codes) >= min_bars).values]
+    mask = mask_func(ctx, codes)
+    hits = mask.index[mask.fillna(False).astype(bool).values]
+    if len(hits) == 0:
+        return []
+
+    close = ctx.series('close', hits)
+    volume = ctx.series('volume', hits)
+    results = pd.DataFrame({
+        'code': hits,
+        'name': hits,
+        'price': close.values,
+        'rsi': ctx.series('RSI', hits).values,
+        'volume_ratio': (volume / ctx.series('VOL_MA5', hits)).values,
+        'turnover_rate': ctx.series('turn', hits).values,
+        'action': np.where(close < ctx.series('close', hits, lag=1), '主力出货', '主力吃单')
+    })
+    return results.to_dict('records')
@@ -0,0 +1,368 @@
+"""
+战法规则：用表达式描述选股条件，编译为面板上的向量化布尔运算
+
+表达式示例：
+    close <= BB_LOWER * 1.02 & RSI < 30 & cross_up(MACD, MACD_SIGNAL) & volume > VOL_MA5 * 1.5
+
+支持的语法：
+    - 字段：open/high/low/close/volume/turn 以及 strategy.panel.INDICATOR_COLUMNS 中的指标
+    - 运算：+ - * /，比较 < <= > >= == !=，逻辑 & | ~（也可写作 and / or / not）
+    - 函数：prev(x, n=1)             n个交易日前的值
+            cross_up(a, b)           a上穿b（前一日a<b，当日a>b）
+            cross_down(a, b)         a下穿b
+            highest(字段, n=None)     最近n日最高值（None为全部历史）
+            lowest(字段, n=None)      最近n日最低值
+            abs(x)
+
+与（&）条件按计算代价从低到高依次求值，每一步只在仍满足条件的股票上继续计算，
+大部分股票在计算MACD等较贵的指标之前就已被排除。
+"""
+import ast
+import io
+import json
+import operator
+import os
+import tokenize
+
+import pandas as pd
+
+from strategy.panel import INDICATOR_COLUMNS, PANEL_FIELDS, PanelContext
+
+# 表达式中可用的字段
+KNOWN_NAMES = set(PANEL_FIELDS) | set(INDICATOR_COLUMNS)
+
+# 自定义规则文件（JSON：{战法名称: 表达式}），可通过环境变量指定
+RULES_FILE = os.environ.get('GPJY_STRATEGY_RULES', '')
+
+_BIN_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv
+}
+
+_CMP_OPS = {
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne
+}
+
+
+def _as_mask(value, codes):
+    """
+    将求值结果统一为以股票代码为索引的布尔Series，缺失值视为不满足
+    """
+    if not isinstance(value, pd.Series):
+        return pd.Series(bool(value), index=codes)
+    return value.fillna(False).astype(bool)
+
+
+class _Node:
+    """
+    编译后的表达式节点，eval(ctx, codes, lag) 返回以股票代码为索引的Series或标量
+    """
+    names = frozenset()
+
+    def eval(self, ctx, codes, lag):
+        raise NotImplementedError
+
+
+class _Const(_Node):
+    def __init__(self, value):
+        self.value = value
+
+    def eval(self, ctx, codes, lag):
+        return self.value
+
+
+class _Name(_Node):
+    def __init__(self, name):
+        self.name = name
+        self.names = frozenset([name])
+
+    def eval(self, ctx, codes, lag):
+        return ctx.series(self.name, codes, lag)
+
+
+class _BinOp(_Node):
+    def __init__(self, op, left, right):
+        self.op, self.left, self.right = op, left, right
+        self.names = left.names | right.names
+
+    def eval(self, ctx, codes, lag):
+        return self.op(self.left.eval(ctx, codes, lag), self.right.eval(ctx, codes, lag))
+
+
+class _Neg(_Node):
+    def __init__(self, operand):
+        self.operand = operand
+        self.names = operand.names
+
+    def eval(self, ctx, codes, lag):
+        return -self.operand.eval(ctx, codes, lag)
+
+
+class _Compare(_Node):
+    def __init__(self, operands, ops):
+        self.operands, self.ops = operands, ops
+        self.names = frozenset().union(*(node.names for node in operands))
+
+    def eval(self, ctx, codes, lag):
+        values = [node.eval(ctx, codes, lag) for node in self.operands]
+        result = pd.Series(True, index=codes)
+        for op, left, right in zip(self.ops, values, values[1:]):
+            result &= _as_mask(op(left, right), codes)
+        return result
+
+
+class _And(_Node):
+    def __init__(self, children):
+        self.children = children
+        self.names = frozenset().union(*(node.names for node in children))
+
+    def eval(self, ctx, codes, lag):
+        alive = codes
+        remaining = list(self.children)
+        while remaining and len(alive):
+            # 每次选择当前代价最低的条件，只在仍满足条件的股票上求值
+            child = min(remaining, key=lambda node: ctx.cost(node.names))
+            remaining.remove(child)
+            mask = _as_mask(child.eval(ctx, alive, lag), alive)
+            alive = alive[mask.values]
+        return pd.Series(codes.isin(alive), index=codes)
+
+
+class _Or(_Node):
+    def __init__(self, children):
+        self.children = children
+        self.names = frozenset().union(*(node.names for node in children))
+
+    def eval(self, ctx, codes, lag):
+        pending = codes
+        remaining = list(self.children)
+        while remaining and len(pending):
+            # 已满足任一条件的股票不再计算其余条件
+            child = min(remaining, key=lambda node: ctx.cost(node.names))
+            remaining.remove(child)
+            mask = _as_mask(child.eval(ctx, pending, lag), pending)
+            pending = pending[~mask.values]
+        return pd.Series(~codes.isin(pending), index=codes)
+
+
+class _Not(_Node):
+    def __init__(self, operand):
+        self.operand = operand
+        self.names = operand.names
+
+    def eval(self, ctx, codes, lag):
+        return ~_as_mask(self.operand.eval(ctx, codes, lag), codes)
+
+
+class _Prev(_Node):
+    def __init__(self, operand, n):
+        self.operand, self.n = operand, n
+        self.names = operand.names
+
+    def eval(self, ctx, codes, lag):
+        return self.operand.eval(ctx, codes, lag + self.n)
+
+
+class _Cross(_Node):
+    def __init__(self, left, right, up):
+        self.left, self.right, self.up = left, right, up
+        self.names = left.names | right.names
+
+    def eval(self, ctx, codes, lag):
+        now_l, now_r = self.left.eval(ctx, codes, lag), self.right.eval(ctx, codes, lag)
+        prev_l, prev_r = self.left.eval(ctx, codes, lag + 1), self.right.eval(ctx, codes, lag + 1)
+        if self.up:
+            return _as_mask(prev_l < prev_r, codes) & _as_mask(now_l > now_r, codes)
+        return _as_mask(prev_l > prev_r, codes) & _as_mask(now_l < now_r, codes)
+
+
+class _Extreme(_Node):
+    def __init__(self, name, length, highest):
+        self.name, self.length, self.highest = name, length, highest
+        self.names = frozenset([name])
+
+    def eval(self, ctx, codes, lag):
+        window = ctx.window(self.name, codes, lag, self.length)
+        return window.max() if self.highest else window.min()
+
+
+class _Abs(_Node):
+    def __init__(self, operand):
+        self.operand = operand
+        self.names = operand.names
+
+    def eval(self, ctx, codes, lag):
+        return abs(self.operand.eval(ctx, codes, lag))
+
+
+def _translate(expr):
+    """
+    将 & | ~ 转换为 and / or / not，使其优先级低于比较运算
+    """
+    replace = {'&': 'and', '|': 'or', '~': 'not'}
+    tokens = []
+    for tok in tokenize.generate_tokens(io.StringIO(expr).readline):
+        if tok.type == tokenize.OP and tok.string in replace:
+            tokens.append((tokenize.NAME, replace[tok.string]))
+        else:
+            tokens.append((tok.type, tok.string))
+    return tokenize.untokenize(tokens).strip()
+
+
+def _const_arg(node, expr):
+    if not isinstance(node, ast.Constant):
+        raise ValueError(f"规则 {expr!r} 中函数参数必须是常数")
+    return node.value
+
+
+def _compile(node, expr):
+    """
+    将Python语法树编译为表达式节点，只允许规则语法中的结构
+    """
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+        return _Const(node.value)
+    if isinstance(node, ast.Name):
+        if node.id not in KNOWN_NAMES:
+            raise ValueError(f"规则 {expr!r} 中存在未知字段: {node.id}")
+        return _Name(node.id)
+    if isinstance(node, ast.BinOp) and type(node.op) in _BIN_OPS:
+        return _BinOp(_BIN_OPS[type(node.op)], _compile(node.left, expr), _compile(node.right, expr))
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        return _Neg(_compile(node.operand, expr))
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+        return _Not(_compile(node.operand, expr))
+    if isinstance(node, ast.Compare) and all(type(op) in _CMP_OPS for op in node.ops):
+        operands = [_compile(node.left, expr)] + [_compile(c, expr) for c in node.comparators]
+        return _Compare(operands, [_CMP_OPS[type(op)] for op in node.ops])
+    if isinstance(node, ast.BoolOp):
+        children = [_compile(value, expr) for value in node.values]
+        return _And(children) if isinstance(node.op, ast.And) else _Or(children)
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+        func, args = node.func.id, node.args
+        if func == 'prev' and len(args) in (1, 2):
+            n = _const_arg(args[1], expr) if len(args) == 2 else 1
+            return _Prev(_compile(args[0], expr), int(n))
+        if func in ('cross_up', 'cross_down') and len(args) == 2:
+            return _Cross(_compile(args[0], expr), _compile(args[1], expr), up=(func == 'cross_up'))
+        if func in ('highest', 'lowest') and len(args) in (1, 2):
+            target = _compile(args[0], expr)
+            if not isinstance(target, _Name):
+                raise ValueError(f"规则 {expr!r} 中 {func} 的第一个参数必须是字段名")
+            length = _const_arg(args[1], expr) if len(args) == 2 else None
+            return _Extreme(target.name, length, highest=(func == 'highest'))
+        if func == 'abs' and len(args) == 1:
+            return _Abs(_compile(args[0], expr))
+    raise ValueError(f"规则 {expr!r} 中存在不支持的语法: {ast.dump(node)}")
+
+
+class Rule:
+    """
+    选股规则类
+    """
+    def __init__(self, name, expr):
+        """
+        编译选股规则
+
+        Args:
+            name (str): 规则名称
+            expr (str): 规则表达式
+
+        Raises:
+            ValueError: 表达式语法错误或包含未知字段
+        """
+        self.name = name
+        self.expr = expr
+        try:
+            tree = ast.parse(_translate(expr), mode='eval')
+        except (SyntaxError, tokenize.TokenError) as e:
+            raise ValueError(f"规则 {expr!r} 语法错误: {str(e)}")
+        self._root = _compile(tree.body, expr)
+        self.names = self._root.names
+
+    def evaluate(self, ctx, codes=None):
+        """
+        在面板上求值
+
+        Args:
+            ctx (PanelContext): 计算上下文
+            codes (pd.Index): 参与筛选的股票代码，默认为全部
+
+        Returns:
+            pd.Series: 以股票代码为索引的布尔Series
+        """
+        codes = ctx.codes if codes is None else codes
+        return _as_mask(self._root.eval(ctx, codes, 0), codes)
+
+    def __call__(self, df):
+        """
+        对单只股票的K线数据求值，可直接作为逐只分析的策略函数
+
+        Args:
+            df (pd.DataFrame): 小写列名的K线数据，可包含已计算的指标
+
+        Returns:
+            bool: 最新交易日是否满足规则
+        """
+        ctx = PanelContext.from_frame(df)
+        return bool(self.evaluate(ctx).iloc[0])
+
+    def __getstate__(self):
+        # 只序列化名称和表达式，子进程中重新编译
+        return {'name': self.name, 'expr': self.expr}
+
+    def __setstate__(self, state):
+        self.__init__(state['name'], state['expr'])
+
+    def __repr__(self):
+        return f"Rule({self.name!r}, {self.expr!r})"
+
+
+# 内置战法规则
+DEFAULT_RULES = {
+    '低吸战法': 'close <= BB_LOWER * 1.02 & RSI < 30 & cross_up(MACD, MACD_SIGNAL) & volume > VOL_MA5 * 1.5',
+    '龙头战法': 'close > prev(highest(close)) & RSI > 70 & MACD > MACD_SIGNAL & volume > VOL_MA5 * 1.2',
+    '首板战法': '(close - prev(close)) / prev(close) > 0.095 & volume > VOL_MA5 * 2 & RSI > 60',
+    '接力战法': 'close > prev(close) & RSI > 50 & MACD > MACD_SIGNAL & volume > VOL_MA5 * 1.3',
+    '主力行为': ('volume > VOL_MA5 * 1.5 & turn > TURN_MA5 * 1.5 & ('
+                '(close < prev(close) & close < open) | '
+                '(close > prev(close) & close > open & close - low > (high - low) * 0.8)'
+                ')')
+}
+
+
+def load_rules(path):
+    """
+    从JSON文件加载规则
+
+    Args:
+        path (str): 文件路径，内容为 {战法名称: 表达式}
+
+    Returns:
+        dict: {战法名称: Rule}
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        specs = json.load(f)
+    return {name: Rule(name, expr) for name, expr in specs.items()}
+
+
+def get_strategy_rules():
+    """
+    获取全部战法规则：内置规则，加上RULES_FILE中的自定义规则（同名覆盖）
+
+    Returns:
+        dict: {战法名称: Rule}
+    """
+    rules = {name: Rule(name, expr) for name, expr in DEFAULT_RULES.items()}
+    if RULES_FILE and os.path.exists(RULES_FILE):
+        try:
+            rules.update(load_rules(RULES_FILE))
+        except Exception as e:
+            print(f"加载自定义战法规则出错: {str(e)}")
+    return rules
@@ -0,0 +1,176 @@
+"""
+收盘指标快照
+
+收盘后批量计算全部主板股票的战法指标，每只股票只保留最近N个交易日，
+以长表（code, date, 行情字段, 指标列）写入一个Parquet文件。
+盘中选股直接读取快照并按规则过滤，不再逐只获取数据和计算指标。
+
+命令行用法（收盘数据更新后运行）：
+    python -m strategy.snapshot [--rows 120] [--workers 16]
+"""
+import argparse
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from data.bar_store import complete_until
+from data.storage import cache_path, read_json, read_parquet, write_json, write_parquet
+from strategy.panel import PRICE_FIELDS
+
+# 每只股票保留的交易日数量，规则中不限长度的 highest()/lowest() 只覆盖这些交易日
+SNAPSHOT_ROWS = 120
+
+# 快照文件（相对缓存根目录）
+SNAPSHOT_FILE = ('snapshots', 'cn_daily.parquet')
+SNAPSHOT_META_FILE = ('snapshots', 'cn_daily.json')
+
+# 快照中保存的行情字段，其余数值列按float32保存
+SNAPSHOT_BAR_FIELDS = ['open', 'high', 'low', 'close', 'volume', 'turn']
+
+
+def make_snapshot(frames, rows=SNAPSHOT_ROWS):
+    """
+    将已计算指标的K线合并为快照长表
+
+    Args:
+        frames (dict): {股票代码: pd.DataFrame}，小写行情列名加指标列，基于完整历史计算
+        rows (int): 每只股票保留的交易日数量
+
+    Returns:
+        pd.DataFrame: 列为 code, date, 行情字段, 指标列, BARS（该股票截至当日的K线数量）
+    """
+    parts = []
+    for code, df in frames.items():
+        if df is None or df.empty:
+            continue
+        df = df.assign(BARS=np.arange(1, len(df) + 1)).tail(rows)
+        parts.append(df.assign(code=code))
+    if not parts:
+        return pd.DataFrame(columns=['code', 'date'])
+
+    snapshot = pd.concat(parts, ignore_index=True)
+    columns = ['code', 'date'] + [col for col in snapshot.columns
+                                  if col not in ('code', 'date', 'amount')
+                                  and pd.api.types.is_numeric_dtype(snapshot[col])]
+    snapshot = snapshot[columns]
+    # 价格保留float64，避免涨停等临界判断出现舍入误差；其余列用float32压缩体积
+    for col in columns[2:]:
+        if col not in PRICE_FIELDS:
+            snapshot[col] = snapshot[col].astype('float32')
+    snapshot['code'] = snapshot['code'].astype('category')
+    return snapshot
+
+
+def save_snapshot(snapshot):
+    """
+    保存快照及元数据
+
+    Args:
+        snapshot (pd.DataFrame): make_snapshot返回的快照
+
+    Returns:
+        dict: 快照元数据
+    """
+    meta = {
+        'trade_date': pd.Timestamp(snapshot['date'].max()).strftime('%Y-%m-%d'),
+        'created_at': datetime.now().isoformat(),
+        'codes': int(snapshot['code'].nunique()),
+        'rows': int(len(snapshot))
+    }
+    write_parquet(snapshot, cache_path(*SNAPSHOT_FILE))
+    write_json(meta, cache_path(*SNAPSHOT_META_FILE))
+    return meta
+
+
+def load_snapshot_meta():
+    """
+    读取快照元数据
+
+    Returns:
+        dict: 快照元数据，没有快照时返回空字典
+    """
+    return read_json(cache_path(*SNAPSHOT_META_FILE), default={})
+
+
+def load_snapshot():
+    """
+    读取快照
+
+    Returns:
+        tuple: (pd.DataFrame 或 None, dict 元数据)
+    """
+    snapshot = read_parquet(cache_path(*SNAPSHOT_FILE))
+    meta = load_snapshot_meta() if snapshot is not None else {}
+    return snapshot, meta
+
+
+def is_fresh(meta, now=None):
+    """
+    判断快照是否包含最近一个已收盘交易日的数据
+
+    没有交易日历，只跳过周末；节假日后快照会被视为过期，此时回退到实时计算。
+
+    Args:
+        meta (dict): 快照元数据
+        now (datetime): 当前时间，默认为系统时间
+
+    Returns:
+        bool: 快照是否为最新
+    """
+    if not meta.get('trade_date'):
+        return False
+    last_session = complete_until('A股', now)
+    while last_session.weekday() >= 5:
+        last_session -= timedelta(days=1)
+    return pd.Timestamp(meta['trade_date']) >= last_session
+
+
+def snapshot_panel(snapshot):
+    """
+    将快照长表转换为面板，停牌日的处理与build_panel一致
+
+    Args:
+        snapshot (pd.DataFrame): 快照
+
+    Returns:
+        dict: {字段名: pd.DataFrame(index=日期, columns=股票代码)}，包含指标列
+    """
+    snapshot = snapshot.assign(code=snapshot['code'].astype(str))
+    wide = snapshot.pivot(index='date', columns='code').astype(float)
+    fields = wide.columns.get_level_values(0).unique()
+    panel = {field: wide[field] for field in fields}
+
+    listed = panel['close'].ffill().notna()
+    for field in fields:
+        if field in ('volume', 'turn'):
+            panel[field] = panel[field].fillna(0).where(listed)
+        else:
+            # 价格和指标在停牌日沿用前一交易日
+            panel[field] = panel[field].ffill()
+    return panel
+
+
+def main(argv=None):
+    """
+    命令行入口：生成全部主板股票的收盘指标快照
+    """
+    parser = argparse.ArgumentParser(description='生成战法分析的收盘指标快照')
+    parser.add_argument('--rows', type=int, default=SNAPSHOT_ROWS, help='每只股票保留的交易日数量')
+    parser.add_argument('--workers', type=int, default=None, help='数据获取并发数')
+    args = parser.parse_args(argv)
+
+    # 分析器依赖本模块读取快照，这里延迟导入避免循环引用
+    from strategy.strategy_analyzer import StrategyAnalyzer
+
+    analyzer = StrategyAnalyzer()
+    meta = analyzer.build_snapshot(rows=args.rows, max_workers=args.workers)
+    if not meta:
+        print('生成快照失败：没有获取到股票数据')
+        return 1
+    print(f"快照已生成：{meta['trade_date']}，{meta['codes']} 只股票，{meta['rows']} 行")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -1,24 +1,183 @@
-import pandas as pd
 import numpy as np
-import baostock as bs
 import talib
 import threading
-from queue import Queue
 import time
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from queue import Queue, Empty, Full
+from datetime import datetime
+from functools import partial
+from analysis.indicators import IndicatorRegistry
+from data.baostock_session import get_baostock_session
+from data.bar_store import get_bar_store, normalize_code, normalize_columns, to_baostock_code, to_lower_columns
+from strategy.panel import PanelContext, build_panel, screen
+from strategy.rules import Rule, get_strategy_rules
+from strategy.snapshot import SNAPSHOT_ROWS, is_fresh, load_snapshot, make_snapshot, save_snapshot, snapshot_panel
+
+# 战法分析使用的历史数据起始日期
+HISTORY_START = '2023-01-01'
+
+# 并行分析的默认并发数和单只股票超时时间（秒）
+MAX_WORKERS = 8
+TASK_TIMEOUT = 30
+
+# 流水线模式：数据获取线程数、指标计算进程数、两阶段之间的队列长度
+# 所有baostock请求共用一个会话、依次执行，数据获取线程的并发只对读取本地K线存储（缓存命中）有效，
+# 线程数按本地读取设置；未缓存的股票无论线程数多少都是逐只请求
+IO_WORKERS = 16
+CPU_WORKERS = max(1, (multiprocessing.cpu_count() or 2) - 1)
+QUEUE_SIZE = 64
+
+# 计算指标所需的最少K线数量
+MIN_BARS = 60
+
+# 数据获取阶段结束标记
+_FETCH_DONE = object()
+
+
+# 战法分析使用的指标（talib计算，小写行情列名）
+STRATEGY_INDICATORS = IndicatorRegistry()
+
+# 分析结果中展示的指标，无论策略是否用到都需要计算
+RESULT_INDICATORS = ('RSI', 'VOL_MA5')
+
+
+def _register_ma(name, column, period):
+    """
+    注册指定列的简单移动平均
+    """
+    STRATEGY_INDICATORS.register(name, deps=(column,))(
+        lambda values: talib.MA(values, timeperiod=period)
+    )
+
+
+# 计算均线
+for _period in (5, 10, 20, 60):
+    _register_ma(f'MA{_period}', 'close', _period)
+
+# 计算成交量指标
+for _period in (5, 10):
+    _register_ma(f'VOL_MA{_period}', 'volume', _period)
+
+# 计算换手率指标
+for _period in (5, 10):
+    _register_ma(f'TURN_MA{_period}', 'turn', _period)
+
+
+# 计算MACD
+@STRATEGY_INDICATORS.register('MACD', 'MACD_SIGNAL', 'MACD_HIST', deps=('close',))
+def _macd(close):
+    macd, macd_signal, macd_hist = talib.MACD(close)
+    return {'MACD': macd, 'MACD_SIGNAL': macd_signal, 'MACD_HIST': macd_hist}
+
+
+# 计算RSI
+@STRATEGY_INDICATORS.register('RSI', deps=('close',))
+def _rsi(close):
+    return talib.RSI(close, timeperiod=14)
+
+
+# 计算布林带
+@STRATEGY_INDICATORS.register('BB_UPPER', 'BB_MIDDLE', 'BB_LOWER', deps=('close',))
+def _bbands(close):
+    upper, middle, lower = talib.BBANDS(close, timeperiod=20)
+    return {'BB_UPPER': upper, 'BB_MIDDLE': middle, 'BB_LOWER': lower}
+
+
+# 计算KDJ
+@STRATEGY_INDICATORS.register('KDJ_K', 'KDJ_D', 'KDJ_J', deps=('high', 'low', 'close'))
+def _kdj(high, low, close):
+    slowk, slowd = talib.STOCH(high, low, close)
+    return {'KDJ_K': slowk, 'KDJ_D': slowd, 'KDJ_J': 3 * slowk - 2 * slowd}
+
+
+def compute_indicators(df, names=None):
+    """
+    计算战法分析使用的技术指标
+    
+    Args:
+        df (pd.DataFrame): 股票数据（小写列名）
+        names (iterable): 需要的指标列，None表示全部指标
+        
+    Returns:
+        pd.DataFrame: 添加技术指标后的数据
+    """
+    return STRATEGY_INDICATORS.compute(df, names)
+
+
+def required_indicators(strategy_func):
+    """
+    获取策略需要计算的指标列
+
+    Args:
+        strategy_func (function): 策略函数，Rule会声明用到的指标
+
+    Returns:
+        list: 指标列，无法得知策略用到哪些指标时返回None（计算全部）
+    """
+    names = getattr(strategy_func, 'names', None)
+    if names is None:
+        return None
+    names = [name for name in names if name in STRATEGY_INDICATORS]
+    return sorted(set(names) | set(RESULT_INDICATORS))
+
+
+def evaluate_stock(stock_code, df, strategy_func):
+    """
+    计算指标并应用策略，可在子进程中执行
+    
+    Args:
+        stock_code (str): 股票代码
+        df (pd.DataFrame): 股票数据（小写列名）
+        strategy_func (function): 策略函数，需可被子进程序列化（模块级函数或Rule）
+        
+    Returns:
+        dict: 符合策略时返回分析结果，否则返回None
+    """
+    try:
+        df = compute_indicators(df, required_indicators(strategy_func))
+        
+        # 应用策略
+        if strategy_func(df):
+            return {
+                'code': stock_code,
+                'name': stock_code,  # 这里可以添加获取股票名称的逻辑
+                'price': df['close'].iloc[-1],
+                'rsi': df['RSI'].iloc[-1],
+                'volume_ratio': df['volume'].iloc[-1] / df['VOL_MA5'].iloc[-1],
+                'turnover_rate': df['turn'].iloc[-1],
+                'action': '主力出货' if df['close'].iloc[-1] < df['close'].iloc[-2] else '主力吃单'
+            }
+    except Exception as e:
+        print(f'分析股票 {stock_code} 时出错: {str(e)}')
+        
+    return None
+
 
 class StrategyAnalyzer:
     """
     股票战法分析器类
     """
-    def __init__(self):
+    def __init__(self, use_panel=True, use_snapshot=True):
         """
         初始化战法分析器
+        
+        Args:
+            use_panel (bool): 是否使用截面面板一次性筛选全部股票
+            use_snapshot (bool): 有最新的收盘指标快照时是否直接基于快照筛选
         """
+        self.use_panel = use_panel
+        self.use_snapshot = use_snapshot
+        # 最近一次筛选使用的快照交易日，未使用快照时为None
+        self.snapshot_date = None
         self.stop_flag = False
         self.progress = 0
         self.total_stocks = 0
         self.analyzed_stocks = 0
         self.results = []
+        self.timed_out = []
+        self._started = {}
         self._lock = threading.Lock()
     
     def stop_analysis(self):
@@ -39,87 +198,82 @@ class StrategyAnalyzer:
     
     def get_stock_list(self):
         """
-        获取A股股票列表
+        获取A股主板上市股票列表
         
         Returns:
-            pd.DataFrame: 股票列表
+            list: 股票代码（统一格式，如 600000.SH），获取失败时返回空列表
         """
         try:
-            # 登录系统
-            bs.login()
             # 获取证券信息
-            rs = bs.query_stock_basic(code_name="")
-            if rs.error_code != '0':
-                print(f'获取股票列表失败: {rs.error_msg}')
+            df = get_baostock_session().query('query_stock_basic', code_name="")
+            if df is None:
                 return []
-                
-            # 获取数据
-            data_list = []
-            while (rs.error_code == '0') & rs.next():
-                data_list.append(rs.get_row_data())
-                
-            # 转换为DataFrame
-            df = pd.DataFrame(data_list, columns=rs.fields)
-            
-            # 只保留主板股票（以6或0开头的股票）
-            df = df[df['code'].str.startswith(('6', '0'))]
             
-            # 登出系统
-            bs.logout()
+            # 只保留股票（type为1，不含指数、基金等），且为上市状态（status为1）
+            df = df[(df['type'] == '1') & (df['status'] == '1')]
+            # baostock代码格式为 sh.600000，按点号后的数字部分只保留主板股票（以6或0开头）
+            numbers = df['code'].str.split('.').str[-1]
+            df = df[numbers.str.startswith(('6', '0'))]
             
-            return df['code'].tolist()
+            return [normalize_code(code) for code in df['code']]
             
         except Exception as e:
             print(f'获取股票列表出错: {str(e)}')
             return []
     
-    def get_stock_data(self, stock_code):
+    def fetch_stock_data(self, stock_code, start, end):
         """
-        获取股票历史数据
+        从baostock获取股票日线数据
         
         Args:
-            stock_code (str): 股票代码
+            stock_code (str): 股票代码（统一格式，如 600000.SH）
+            start (datetime): 开始日期
+            end (datetime): 结束日期
             
         Returns:
-            pd.DataFrame: 股票数据
+            pd.DataFrame: 统一列名的股票数据，获取失败时返回None
         """
         try:
-            # 登录系统
-            bs.login()
-            
-            # 获取股票数据
-            rs = bs.query_history_k_data_plus(
-                stock_code,
+            # 获取股票数据（不复权）
+            df = get_baostock_session().query(
+                'query_history_k_data_plus',
+                to_baostock_code(stock_code),
                 "date,open,high,low,close,volume,amount,turn",
-                start_date='2023-01-01',
-                frequency="d"
+                start_date=start.strftime('%Y-%m-%d'),
+                end_date=end.strftime('%Y-%m-%d'),
+                frequency="d",
+                adjustflag="3"
             )
-            
-            if rs.error_code != '0':
-                print(f'获取股票数据失败: {rs.error_msg}')
+            if df is None:
                 return None
                 
-            # 获取数据
-            data_list = []
-            while (rs.error_code == '0') & rs.next():
-                data_list.append(rs.get_row_data())
-                
-            # 转换为DataFrame
-            df = pd.DataFrame(data_list, columns=rs.fields)
-            
-            # 转换数据类型
-            for col in ['open', 'high', 'low', 'close', 'volume', 'amount', 'turn']:
-                df[col] = pd.to_numeric(df[col])
-                
-            # 登出系统
-            bs.logout()
-            
-            return df
+            # 统一列名和数据类型
+            return normalize_columns(df)
             
         except Exception as e:
             print(f'获取股票数据出错: {str(e)}')
             return None
     
+    def get_stock_data(self, stock_code):
+        """
+        获取股票历史数据，优先读取与界面共用的本地K线存储
+        
+        Args:
+            stock_code (str): 股票代码
+            
+        Returns:
+            pd.DataFrame: 股票数据（小写列名）
+        """
+        code = normalize_code(stock_code)
+        df = get_bar_store().get_bars(
+            'A股', code, HISTORY_START, datetime.now(),
+            partial(self.fetch_stock_data, code),
+            require=('Turn',)
+        )
+        if df is None or df.empty:
+            return None
+        return to_lower_columns(df)
+    
     def analyze_stock(self, stock_code, strategy_func):
         """
         分析单个股票
@@ -127,111 +281,361 @@ class StrategyAnalyzer:
         Args:
             stock_code (str): 股票代码
             strategy_func (function): 策略函数
+            
+        Returns:
+            dict: 符合策略时返回分析结果，否则返回None
         """
         if self.stop_flag:
-            return
+            return None
             
         try:
             # 获取股票数据
             df = self.get_stock_data(stock_code)
-            if df is None or len(df) < 60:
-                return
-                
-            # 计算技术指标
-            df['MA5'] = talib.MA(df['close'], timeperiod=5)
-            df['MA10'] = talib.MA(df['close'], timeperiod=10)
-            df['MA20'] = talib.MA(df['close'], timeperiod=20)
-            df['MA60'] = talib.MA(df['close'], timeperiod=60)
+            if df is None or len(df) < MIN_BARS:
+                return None
+        except Exception as e:
+            print(f'获取股票 {stock_code} 数据时出错: {str(e)}')
+            return None
             
-            # 计算MACD
-            macd, macd_signal, macd_hist = talib.MACD(df['close'])
-            df['MACD'] = macd
-            df['MACD_SIGNAL'] = macd_signal
-            df['MACD_HIST'] = macd_hist
+        return evaluate_stock(stock_code, df, strategy_func)
+    
+    def _run_task(self, stock_code, task_func):
+        """
+        工作线程执行的任务，记录开始时间用于超时判断
+        """
+        with self._lock:
+            self._started[stock_code] = time.monotonic()
+        return task_func(stock_code)
+    
+    def _finish_task(self, stock_code):
+        """
+        单只股票处理完成（或超时）后更新进度
+        """
+        with self._lock:
+            self._started.pop(stock_code, None)
+            self.analyzed_stocks += 1
+            progress = int(self.analyzed_stocks / self.total_stocks * 100) if self.total_stocks else 100
+        self.update_progress(progress)
+    
+    def _reset_progress(self, stock_list):
+        """
+        重置进度统计
+        """
+        self.analyzed_stocks = 0
+        self.total_stocks = len(stock_list)
+        self.timed_out = []
+        self._started = {}
+        self.update_progress(0)
+    
+    def _iter_tasks(self, stock_list, task_func, max_workers, task_timeout):
+        """
+        使用线程池对每只股票执行task_func，按完成顺序返回
+        
+        任务从工作队列中依次取出，任一线程空闲即开始下一只股票，没有批次等待。
+        超时的任务不再等待其结果（线程无法强制终止，会在后台自行结束）。
+        
+        Yields:
+            tuple: (股票代码, 任务结果)，超时或出错的任务结果为None
+        """
+        pending_codes = iter(stock_list)
+        # 在途任务数上限，避免一次性提交全部股票
+        max_in_flight = max_workers * 2
+        futures = {}
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='strategy')
+        
+        def submit_more():
+            while len(futures) < max_in_flight and not self.stop_flag:
+                stock_code = next(pending_codes, None)
+                if stock_code is None:
+                    return
+                futures[executor.submit(self._run_task, stock_code, task_func)] = stock_code
+        
+        try:
+            submit_more()
+            while futures:
+                if self.stop_flag:
+                    break
+                    
+                done, _ = wait(list(futures), timeout=1, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stock_code = futures.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        print(f'处理股票 {stock_code} 时出错: {str(e)}')
+                        result = None
+                    yield stock_code, result
+                
+                # 检查运行超时的任务
+                if task_timeout is not None:
+                    now = time.monotonic()
+                    with self._lock:
+                        expired = [future for future, stock_code in futures.items()
+                                   if now - self._started.get(stock_code, now) > task_timeout]
+                    for future in expired:
+                        stock_code = futures.pop(future)
+                        print(f'处理股票 {stock_code} 超时')
+                        self.timed_out.append(stock_code)
+                        yield stock_code, None
+                
+                submit_more()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    def iter_analyze(self, stock_list, strategy_func, max_workers=MAX_WORKERS, task_timeout=TASK_TIMEOUT):
+        """
+        使用线程池分析多个股票（获取数据和计算指标在同一线程），每完成一只就立即返回其结果
+        
+        Args:
+            stock_list (list): 股票列表
+            strategy_func (function): 策略函数
+            max_workers (int): 最大并发数
+            task_timeout (float): 单只股票的超时时间（秒），None表示不限
             
-            # 计算RSI
-            df['RSI'] = talib.RSI(df['close'], timeperiod=14)
+        Yields:
+            dict: 符合策略的股票分析结果
+        """
+        self._reset_progress(stock_list)
+        task_func = partial(self.analyze_stock, strategy_func=strategy_func)
+        for stock_code, result in self._iter_tasks(stock_list, task_func, max_workers, task_timeout):
+            self._finish_task(stock_code)
+            if result:
+                yield result
+    
+    def iter_analyze_pipeline(self, stock_list, strategy_func, io_workers=IO_WORKERS,
+                              cpu_workers=CPU_WORKERS, queue_size=QUEUE_SIZE, task_timeout=TASK_TIMEOUT):
+        """
+        两阶段流水线分析多个股票，每完成一只就立即返回其结果
+        
+        数据获取阶段使用线程池，指标计算和策略判断在进程池中执行，
+        两阶段之间通过有界队列连接：计算跟不上时获取线程会阻塞等待，内存占用保持平稳。
+        数据获取的并发只对本地K线存储命中有效，未缓存的股票经共用的baostock会话逐只请求。
+        进程池不可用时关闭进程池，改为在线程中计算，进程池中未完成的股票重新提交。
+        
+        Args:
+            stock_list (list): 股票列表
+            strategy_func (function): 策略函数，需可被子进程序列化（模块级函数或Rule）
+            io_workers (int): 数据获取线程数
+            cpu_workers (int): 指标计算进程数
+            queue_size (int): 两阶段之间的队列长度
+            task_timeout (float): 单只股票获取数据的超时时间（秒）
+            
+        Yields:
+            dict: 符合策略的股票分析结果
+        """
+        self._reset_progress(stock_list)
+        bars_queue = Queue(maxsize=queue_size)
+        
+        def put(item):
+            # 队列已满时阻塞，停止分析后丢弃
+            while not self.stop_flag:
+                try:
+                    bars_queue.put(item, timeout=0.5)
+                    return
+                except Full:
+                    continue
+        
+        def produce():
+            try:
+                for stock_code, df in self._iter_tasks(stock_list, self.get_stock_data, io_workers, task_timeout):
+                    put((stock_code, df))
+            finally:
+                put(_FETCH_DONE)
+        
+        producer = threading.Thread(target=produce, name='strategy-fetch', daemon=True)
+        producer.start()
+        
+        # 使用spawn启动子进程，避免在已有网络线程的进程中fork
+        pool = ProcessPoolExecutor(max_workers=cpu_workers, mp_context=multiprocessing.get_context('spawn'))
+        max_in_flight = cpu_workers * 2
+        # 在途任务 {future: (股票代码, 行情数据)}，保留行情数据以便进程池不可用时重新提交
+        futures = {}
+        fetch_done = False
+        
+        def use_threads():
+            # 子进程异常退出时关闭进程池，改为在线程中计算，保证分析能够完成
+            nonlocal pool
+            print('指标计算进程池不可用，改为在当前进程中计算')
+            retry = [(future, item) for future, item in futures.items()
+                     if not future.done() or future.cancelled() or future.exception() is not None]
+            broken, pool = pool, ThreadPoolExecutor(max_workers=cpu_workers, thread_name_prefix='strategy-cpu')
+            broken.shutdown(wait=False, cancel_futures=True)
+            for future, (stock_code, df) in retry:
+                del futures[future]
+                futures[pool.submit(evaluate_stock, stock_code, df, strategy_func)] = (stock_code, df)
+        
+        def submit(stock_code, df):
+            try:
+                future = pool.submit(evaluate_stock, stock_code, df, strategy_func)
+            except BrokenProcessPool:
+                use_threads()
+                future = pool.submit(evaluate_stock, stock_code, df, strategy_func)
+            futures[future] = (stock_code, df)
+        
+        try:
+            while not self.stop_flag:
+                # 从队列取数据提交计算
+                while not fetch_done and len(futures) < max_in_flight:
+                    try:
+                        item = bars_queue.get(timeout=0.05 if futures else 0.5)
+                    except Empty:
+                        break
+                    if item is _FETCH_DONE:
+                        fetch_done = True
+                        break
+                    stock_code, df = item
+                    if df is None or len(df) < MIN_BARS:
+                        self._finish_task(stock_code)
+                        continue
+                    submit(stock_code, df)
+                
+                if not futures:
+                    if fetch_done:
+                        break
+                    continue
+                
+                done, _ = wait(list(futures), timeout=0.05, return_when=FIRST_COMPLETED)
+                for future in done:
+                    # 进程池不可用时已改为在线程中重新计算
+                    if future not in futures:
+                        continue
+                    stock_code = futures[future][0]
+                    try:
+                        result = future.result()
+                    except BrokenProcessPool:
+                        use_threads()
+                        continue
+                    except Exception as e:
+                        print(f'分析股票 {stock_code} 时出错: {str(e)}')
+                        result = None
+                    del futures[future]
+                    self._finish_task(stock_code)
+                    if result:
+                        yield result
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+    
+    def load_frames(self, stock_list, max_workers=IO_WORKERS, task_timeout=TASK_TIMEOUT):
+        """
+        并发加载多只股票的K线数据
+        
+        Args:
+            stock_list (list): 股票列表
+            max_workers (int): 最大并发数
+            task_timeout (float): 单只股票的超时时间（秒）
             
-            # 计算布林带
-            upper, middle, lower = talib.BBANDS(df['close'], timeperiod=20)
-            df['BB_UPPER'] = upper
-            df['BB_MIDDLE'] = middle
-            df['BB_LOWER'] = lower
+        Returns:
+            dict: {股票代码: pd.DataFrame}
+        """
+        self._reset_progress(stock_list)
+        frames = {}
+        for stock_code, df in self._iter_tasks(stock_list, self.get_stock_data, max_workers, task_timeout):
+            self._finish_task(stock_code)
+            if df is not None and not df.empty:
+                frames[stock_code] = df
+        return frames
+    
+    def screen_panel(self, stock_list, rule):
+        """
+        截面模式：加载全部股票为面板，按规则向量化筛选，指标只为仍可能满足条件的股票计算
+        
+        Args:
+            stock_list (list): 股票列表
+            rule (Rule): 选股规则
             
-            # 计算KDJ
-            slowk, slowd = talib.STOCH(df['high'], df['low'], df['close'])
-            df['KDJ_K'] = slowk
-            df['KDJ_D'] = slowd
-            df['KDJ_J'] = 3 * slowk - 2 * slowd
+        Returns:
+            list: 分析结果
+        """
+        self.results = []
+        self.stop_flag = False
+        
+        frames = self.load_frames(stock_list)
+        if not frames or self.stop_flag:
+            return self.results
             
-            # 计算成交量指标
-            df['VOL_MA5'] = talib.MA(df['volume'], timeperiod=5)
-            df['VOL_MA10'] = talib.MA(df['volume'], timeperiod=10)
+        ctx = PanelContext(build_panel(frames))
+        self.results = screen(ctx, rule.evaluate, min_bars=MIN_BARS)
+        return self.results
+    
+    def screen_snapshot(self, rule):
+        """
+        快照模式：读取收盘指标快照，只按规则过滤，不获取数据也不计算指标
+        
+        Args:
+            rule (Rule): 选股规则
             
-            # 计算换手率指标
-            df['TURN_MA5'] = talib.MA(df['turn'], timeperiod=5)
-            df['TURN_MA10'] = talib.MA(df['turn'], timeperiod=10)
+        Returns:
+            list: 分析结果，没有最新快照时返回None
+        """
+        snapshot, meta = load_snapshot()
+        if snapshot is None or snapshot.empty or not is_fresh(meta):
+            return None
             
-            # 应用策略
-            if strategy_func(df):
-                self.results.append({
-                    'code': stock_code,
-                    'name': stock_code,  # 这里可以添加获取股票名称的逻辑
-                    'price': df['close'].iloc[-1],
-                    'rsi': df['RSI'].iloc[-1],
-                    'volume_ratio': df['volume'].iloc[-1] / df['VOL_MA5'].iloc[-1],
-                    'turnover_rate': df['turn'].iloc[-1],
-                    'action': '主力出货' if df['close'].iloc[-1] < df['close'].iloc[-2] else '主力吃单'
-                })
-                
-        except Exception as e:
-            print(f'分析股票 {stock_code} 时出错: {str(e)}')
+        ctx = PanelContext(snapshot_panel(snapshot))
+        self.results = screen(ctx, rule.evaluate, min_bars=MIN_BARS)
+        self.snapshot_date = meta['trade_date']
+        return self.results
+    
+    def build_snapshot(self, rows=SNAPSHOT_ROWS, max_workers=None):
+        """
+        生成全部主板股票的收盘指标快照
+        
+        Args:
+            rows (int): 每只股票保留的交易日数量
+            max_workers (int): 数据获取并发数
             
-        finally:
-            with self._lock:
-                self.analyzed_stocks += 1
-                self.update_progress(int(self.analyzed_stocks / self.total_stocks * 100))
+        Returns:
+            dict: 快照元数据，没有获取到数据时返回空字典
+        """
+        stock_list = self.get_stock_list()
+        if not stock_list:
+            return {}
+            
+        frames = self.load_frames(stock_list, max_workers=max_workers or IO_WORKERS)
+        for stock_code, df in frames.items():
+            try:
+                # 指标基于完整历史计算，快照只保留最近的交易日
+                frames[stock_code] = compute_indicators(df)
+            except Exception as e:
+                print(f'计算股票 {stock_code} 指标时出错: {str(e)}')
+                frames[stock_code] = None
                 
-    def analyze_stocks_parallel(self, stock_list, strategy_func, max_threads=3):
+        snapshot = make_snapshot(frames, rows=rows)
+        if snapshot.empty:
+            return {}
+        return save_snapshot(snapshot)
+    
+    def analyze_stocks_parallel(self, stock_list, strategy_func, max_workers=MAX_WORKERS,
+                                task_timeout=TASK_TIMEOUT, on_result=None, pipeline=True):
         """
         并行分析多个股票
         
         Args:
             stock_list (list): 股票列表
             strategy_func (function): 策略函数
-            max_threads (int): 最大线程数
+            max_workers (int): 最大并发数（流水线模式下为数据获取线程数）
+            task_timeout (float): 单只股票的超时时间（秒）
+            on_result (function): 每得到一个结果时的回调
+            pipeline (bool): 是否使用“线程获取数据 + 进程计算指标”的两阶段流水线
             
         Returns:
             list: 分析结果
         """
         self.results = []
-        self.analyzed_stocks = 0
-        self.total_stocks = len(stock_list)
         self.stop_flag = False
         
-        # 创建线程池
-        threads = []
-        for i in range(0, len(stock_list), max_threads):
-            if self.stop_flag:
-                break
-                
-            batch = stock_list[i:i + max_threads]
-            for stock_code in batch:
-                if self.stop_flag:
-                    break
-                    
-                thread = threading.Thread(
-                    target=self.analyze_stock,
-                    args=(stock_code, strategy_func)
-                )
-                thread.start()
-                threads.append(thread)
-                
-            # 等待当前批次完成
-            for thread in threads:
-                thread.join()
+        if pipeline:
+            results = self.iter_analyze_pipeline(stock_list, strategy_func, io_workers=max(max_workers, IO_WORKERS),
+                                                 task_timeout=task_timeout)
+        else:
+            results = self.iter_analyze(stock_list, strategy_func, max_workers, task_timeout)
+            
+        for result in results:
+            self.results.append(result)
+            if on_result:
+                on_result(result)
                 
-            threads = []
+        return self.results
             
     def low_suction_strategy(self):
         """
@@ -240,34 +644,7 @@ class StrategyAnalyzer:
         Returns:
             list: 符合低吸战法的股票列表
         """
-        def strategy(df):
-            # 获取最新数据
-            latest = df.iloc[-1]
-            prev = df.iloc[-2]
-            
-            # 条件1：价格在布林带下轨附近
-            price_near_lower = latest['close'] <= latest['BB_LOWER'] * 1.02
-            
-            # 条件2：RSI超卖
-            rsi_oversold = latest['RSI'] < 30
-            
-            # 条件3：MACD金叉
-            macd_golden_cross = (prev['MACD'] < prev['MACD_SIGNAL'] and 
-                               latest['MACD'] > latest['MACD_SIGNAL'])
-            
-            # 条件4：成交量放大
-            volume_increase = latest['volume'] > latest['VOL_MA5'] * 1.5
-            
-            return price_near_lower and rsi_oversold and macd_golden_cross and volume_increase
-            
-        # 获取股票列表
-        stock_list = self.get_stock_list()
-        if not stock_list:
-            return []
-            
-        # 分析股票
-        self.analyze_stocks_parallel(stock_list, strategy)
-        return self.results
+        return self.run_rule('低吸战法')
     
     def leader_strategy(self):
         """
@@ -276,33 +653,7 @@ class StrategyAnalyzer:
         Returns:
             list: 符合龙头战法的股票列表
         """
-        def strategy(df):
-            # 获取最新数据
-            latest = df.iloc[-1]
-            prev = df.iloc[-2]
-            
-            # 条件1：价格创历史新高
-            price_new_high = latest['close'] > df['close'].max()
-            
-            # 条件2：RSI强势
-            rsi_strong = latest['RSI'] > 70
-            
-            # 条件3：MACD强势
-            macd_strong = latest['MACD'] > latest['MACD_SIGNAL']
-            
-            # 条件4：成交量放大
-            volume_increase = latest['volume'] > latest['VOL_MA5'] * 1.2
-            
-            return price_new_high and rsi_strong and macd_strong and volume_increase
-            
-        # 获取股票列表
-        stock_list = self.get_stock_list()
-        if not stock_list:
-            return []
-            
-        # 分析股票
-        self.analyze_stocks_parallel(stock_list, strategy)
-        return self.results
+        return self.run_rule('龙头战法')
     
     def first_board_strategy(self):
         """
@@ -311,30 +662,7 @@ class StrategyAnalyzer:
         Returns:
             list: 符合首板战法的股票列表
         """
-        def strategy(df):
-            # 获取最新数据
-            latest = df.iloc[-1]
-            prev = df.iloc[-2]
-            
-            # 条件1：涨停
-            price_limit_up = (latest['close'] - prev['close']) / prev['close'] > 0.095
-            
-            # 条件2：成交量放大
-            volume_increase = latest['volume'] > latest['VOL_MA5'] * 2
-            
-            # 条件3：RSI强势
-            rsi_strong = latest['RSI'] > 60
-            
-            return price_limit_up and volume_increase and rsi_strong
-            
-        # 获取股票列表
-        stock_list = self.get_stock_list()
-        if not stock_list:
-            return []
-            
-        # 分析股票
-        self.analyze_stocks_parallel(stock_list, strategy)
-        return self.results
+        return self.run_rule('首板战法')
     
     def relay_strategy(self):
         """
@@ -343,33 +671,7 @@ class StrategyAnalyzer:
         Returns:
             list: 符合接力战法的股票列表
         """
-        def strategy(df):
-            # 获取最新数据
-            latest = df.iloc[-1]
-            prev = df.iloc[-2]
-            
-            # 条件1：连续上涨
-            price_up = latest['close'] > prev['close']
-            
-            # 条件2：RSI强势
-            rsi_strong = latest['RSI'] > 50
-            
-            # 条件3：MACD强势
-            macd_strong = latest['MACD'] > latest['MACD_SIGNAL']
-            
-            # 条件4：成交量放大
-            volume_increase = latest['volume'] > latest['VOL_MA5'] * 1.3
-            
-            return price_up and rsi_strong and macd_strong and volume_increase
-            
-        # 获取股票列表
-        stock_list = self.get_stock_list()
-        if not stock_list:
-            return []
-            
-        # 分析股票
-        self.analyze_stocks_parallel(stock_list, strategy)
-        return self.results
+        return self.run_rule('接力战法')
     
     def volume_analysis_strategy(self):
         """
@@ -378,47 +680,38 @@ class StrategyAnalyzer:
         Returns:
             list: 符合主力行为特征的股票列表
         """
-        def strategy(df):
-            # 获取最新数据
-            latest = df.iloc[-1]
-            prev = df.iloc[-2]
-            
-            # 计算价格变化
-            price_change = (latest['close'] - prev['close']) / prev['close']
-            
-            # 计算成交量变化
-            volume_change = latest['volume'] / latest['VOL_MA5']
-            
-            # 计算换手率变化
-            turnover_change = latest['turn'] / latest['TURN_MA5']
+        return self.run_rule('主力行为')
+    
+    def run_rule(self, name):
+        """
+        按名称执行战法规则
+        
+        Args:
+            name (str): 战法名称，见strategy.rules.get_strategy_rules
             
-            # 主力出货特征：
-            # 1. 价格下跌
-            # 2. 成交量放大
-            # 3. 换手率显著增加
-            # 4. 收盘价低于开盘价
-            is_selling = (
-                price_change < 0 and  # 价格下跌
-                volume_change > 1.5 and  # 成交量放大
-                turnover_change > 1.5 and  # 换手率显著增加
-                latest['close'] < latest['open']  # 收盘价低于开盘价
-            )
+        Returns:
+            list: 符合规则的股票列表
+        """
+        return self.run_strategy(get_strategy_rules()[name])
+    
+    def run_strategy(self, rule):
+        """
+        对全部主板股票执行选股规则
+        
+        Args:
+            rule (Rule): 选股规则，也可以是表达式字符串
             
-            # 主力吃单特征：
-            # 1. 价格上涨
-            # 2. 成交量放大
-            # 3. 换手率显著增加
-            # 4. 收盘价高于开盘价
-            # 5. 收盘价接近最高价
-            is_buying = (
-                price_change > 0 and  # 价格上涨
-                volume_change > 1.5 and  # 成交量放大
-                turnover_change > 1.5 and  # 换手率显著增加
-                latest['close'] > latest['open'] and  # 收盘价高于开盘价
-                (latest['close'] - latest['low']) / (latest['high'] - latest['low']) > 0.8  # 收盘价接近最高价
-            )
+        Returns:
+            list: 符合规则的股票列表
+        """
+        if isinstance(rule, str):
+            rule = Rule(rule, rule)
             
-            return is_selling or is_buying
+        self.snapshot_date = None
+        if self.use_snapshot:
+            results = self.screen_snapshot(rule)
+            if results is not None:
+                return results
             
         # 获取股票列表
         stock_list = self.get_stock_list()
@@ -426,5 +719,7 @@ class StrategyAnalyzer:
             return []
             
         # 分析股票
-        self.analyze_stocks_parallel(stock_list, strategy)
-        return self.results 
\ No newline at end of file
+        if self.use_panel:
+            return self.screen_panel(stock_list, rule)
+        self.analyze_stocks_parallel(stock_list, rule)
+        return self.results
\ No newline at end of file
@@ -0,0 +1,159 @@
+"""
+盘中分时会话测试
+
+会话先由当日的5分钟K线初始化，之后由实时行情的累计成交量增量合成K线，
+两者单位（股、元）必须一致，分时均价和累计成交量才不会失真。
+"""
+import pandas as pd
+import pytest
+
+from analysis.intraday import IntradaySession, VolumeCurve
+
+DAY = '2026-10-16'
+
+
+def seeded_session():
+    """
+    用开盘后前两根5分钟K线初始化的会话，价格在10元附近，成交量单位为股、成交额单位为元
+    """
+    bars = pd.DataFrame({
+        'time': pd.to_datetime([f'{DAY} 09:35:00', f'{DAY} 09:40:00']),
+        'open': [10.0, 10.05],
+        'high': [10.1, 10.1],
+        'low': [9.95, 10.0],
+        'close': [10.05, 10.0],
+        'volume': [120000.0, 80000.0],
+        'amount': [1203000.0, 801000.0]
+    })
+    session = IntradaySession('600519', DAY)
+    session.add_frame(bars)
+    return session
+
+
+def quote(clock, price, volume, amount):
+    return {'time': f'{DAY} {clock}', 'price': price, 'volume': volume, 'amount': amount}
+
+
+def test_quotes_extend_seeded_bars_in_the_same_units():
+    session = seeded_session()
+    seeded_volume = session.cum_volume
+
+    # 当日累计成交量（股）和成交额（元），第一条行情只作为基准
+    session.update_from_quote(quote('09:40:30', 10.0, 200000.0, 2004000.0))
+    session.update_from_quote(quote('09:41:30', 10.02, 230000.0, 2304600.0))
+    session.update_from_quote(quote('09:43:00', 10.04, 250000.0, 2505400.0))
+
+    assert [bar.time for bar in session.bars] == list(pd.to_datetime(
+        [f'{DAY} 09:35:00', f'{DAY} 09:40:00', f'{DAY} 09:45:00']
+    ))
+    assert session.cum_volume == pytest.approx(seeded_volume + 50000.0)
+    assert session.bars[-1].volume == pytest.approx(50000.0)
+    assert session.bars[-1].high == pytest.approx(10.04)
+    assert 9.9 < session.vwap < 10.1
+
+
+def test_relative_volume_compares_session_with_curve_in_shares():
+    history = [
+        pd.DataFrame({
+            'time': pd.to_datetime([f'{day} 09:35:00', f'{day} 09:40:00', f'{day} 09:45:00']),
+            'volume': [120000.0, 80000.0, 50000.0]
+        })
+        for day in ('2026-10-13', '2026-10-14', '2026-10-15')
+    ]
+    curve = VolumeCurve.from_frames(history)
+    session = seeded_session()
+    session.update_from_quote(quote('09:40:30', 10.0, 200000.0, 2004000.0))
+    session.update_from_quote(quote('09:43:00', 10.04, 250000.0, 2505400.0))
+
+    # 当日成交节奏与历史相同：截至当前K线结束时刻的累计成交量与预期一致
+    assert curve.expected(15) == pytest.approx(250000.0)
+    assert session.relative_volume(curve) == pytest.approx(1.0)
+
+
+def test_relative_volume_of_session_opened_mid_morning_uses_day_volume():
+    # 历史上每5分钟成交1万股，截至10:35累计13万股
+    history = [
+        pd.DataFrame({'time': pd.date_range(f'{day} 09:35', periods=13, freq='5min'), 'volume': 10000.0})
+        for day in ('2026-10-13', '2026-10-14', '2026-10-15')
+    ]
+    curve = VolumeCurve.from_frames(history)
+    # 10:30才有人查看，盘中没有当日分钟K线可以初始化会话，只能从行情开始累计
+    session = IntradaySession('600519', DAY)
+    session.update_from_quote(quote('10:30:00', 10.0, 120000.0, 1200000.0))
+    latest = quote('10:33:00', 10.02, 126000.0, 1260120.0)
+    session.update_from_quote(latest)
+
+    assert session.cum_volume == pytest.approx(6000.0)
+    assert curve.expected(63) == pytest.approx(126000.0)
+    assert session.relative_volume(curve) == pytest.approx(1.0)
+    assert session.relative_volume(curve, latest) == pytest.approx(1.0)
+    assert session.relative_volume(curve, quote('10:33:00', 10.02, 252000.0, 2520240.0)) == pytest.approx(2.0)
+
+
+def test_session_opened_mid_day_is_not_complete():
+    late = IntradaySession('600519', DAY)
+    late.update_from_quote(quote('10:30:00', 10.0, 120000.0, 1200000.0))
+    late.update_from_quote(quote('10:33:00', 10.02, 126000.0, 1260120.0))
+    seeded = seeded_session()
+    seeded.update_from_quote(quote('09:40:30', 10.0, 200000.0, 2004000.0))
+    seeded.update_from_quote(quote('09:43:00', 10.04, 250000.0, 2505400.0))
+
+    assert not IntradaySession('600519', DAY).complete
+    assert not late.complete
+    assert seeded_session().complete
+    assert seeded.complete
+
+
+def test_only_complete_sessions_are_saved_after_close(monkeypatch):
+    pytest.importorskip('baostock')
+    from data import minute_store
+
+    saved = []
+
+    class Store:
+        def save(self, symbol, market_type, freq, day, df):
+            saved.append((symbol, len(df)))
+
+    monkeypatch.setattr(minute_store, 'get_minute_store', Store)
+    after_close = pd.Timestamp(f'{DAY} 16:00:00')
+
+    late = IntradaySession('600519', DAY)
+    late.update_from_quote(quote('10:30:00', 10.0, 120000.0, 1200000.0))
+    late.update_from_quote(quote('10:33:00', 10.02, 126000.0, 1260120.0))
+    minute_store._persist(late, after_close)
+    assert saved == [] and not late.persisted
+
+    seeded = seeded_session()
+    minute_store._persist(seeded, after_close)
+    assert saved == [('600519', 2)] and seeded.persisted
+
+
+def test_realtime_quote_volume_matches_minute_bar_units(monkeypatch):
+    pytest.importorskip('tushare')
+    pytest.importorskip('yfinance')
+    pytest.importorskip('baostock')
+    from data import minute_store, realtime
+
+    # 新浪实时行情：成交量单位为股，成交额单位为元
+    def sina_quotes(symbol):
+        return pd.DataFrame({
+            'open': ['10.00'], 'high': ['10.10'], 'low': ['9.95'], 'price': [next(prices)],
+            'pre_close': ['9.98'], 'volume': [next(volumes)], 'amount': [next(amounts)],
+            'date': [DAY], 'time': [next(times)]
+        })
+
+    prices = iter(['10.00', '10.02', '10.04'])
+    volumes = iter(['200000', '230000', '250000'])
+    amounts = iter(['2004000.00', '2304600.00', '2505400.00'])
+    times = iter(['09:40:30', '09:41:30', '09:43:00'])
+    monkeypatch.setattr(realtime.ts, 'get_realtime_quotes', sina_quotes, raising=False)
+
+    session = seeded_session()
+    monkeypatch.setitem(minute_store._sessions, ('A股', '600519', minute_store.INTRADAY_FREQ), session)
+    # 盘中时间，收盘前不会保存会话K线
+    now = pd.Timestamp(f'{DAY} 09:43:00')
+    for _ in range(3):
+        minute_store.record_quote('600519', 'A股', realtime.fetch_realtime_quote('600519', 'A股'), now=now)
+
+    assert session.cum_volume == pytest.approx(250000.0)
+    assert 9.9 < session.vwap < 10.1
@@ -0,0 +1,66 @@
+"""
+新闻来源响应解析测试
+
+fixtures/news 下保存了各来源接口的响应样本（原始文本），解析结果应为统一格式的新闻表。
+"""
+import os
+
+import pandas as pd
+import pytest
+
+from news.parsers import NEWS_COLUMNS, parse_10jqka, parse_eastmoney, parse_sina, parse_xueqiu
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'news')
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding='utf-8') as f:
+        return f.read()
+
+
+def test_parse_eastmoney_jsonp():
+    df = parse_eastmoney(load_fixture('eastmoney_600519.txt'))
+
+    assert list(df.columns) == NEWS_COLUMNS
+    assert df['title'].tolist() == [
+        '贵州茅台:2026年第一次临时股东大会决议公告',
+        '贵州茅台:2026年第三季度主要经营数据公告'
+    ]
+    assert df['datetime'].tolist() == [pd.Timestamp('2026-10-15'), pd.Timestamp('2026-10-12')]
+    assert (df['source'] == '东方财富网').all()
+
+
+def test_parse_sina():
+    df = parse_sina(load_fixture('sina_sh600519.json'))
+
+    assert list(df.columns) == NEWS_COLUMNS
+    assert df['title'].tolist() == ['茅台批价企稳 渠道库存回落至合理区间', '北向资金连续三日净买入白酒板块']
+    assert df['datetime'].tolist() == [pd.Timestamp('2026-10-16 09:42:18'), pd.Timestamp('2026-10-15 15:21:03')]
+    assert (df['source'] == '新浪财经').all()
+
+
+def test_parse_xueqiu_millisecond_timestamps():
+    df = parse_xueqiu(load_fixture('xueqiu_SH600519.json'))
+
+    assert list(df.columns) == NEWS_COLUMNS
+    assert df['title'].tolist() == ['三季报前瞻：茅台直销占比继续提升', '白酒板块午后拉升，茅台涨超2%']
+    assert df['datetime'].tolist() == [pd.Timestamp('2026-10-16 01:50:00'), pd.Timestamp('2026-10-15 01:50:00')]
+    assert (df['source'] == '雪球').all()
+
+
+def test_parse_10jqka():
+    df = parse_10jqka(load_fixture('10jqka_600519.json'))
+
+    assert list(df.columns) == NEWS_COLUMNS
+    assert df['title'].tolist() == [
+        '贵州茅台：公司经营情况正常，内外部环境未发生重大变化',
+        '白酒股集体走强 贵州茅台成交额居前'
+    ]
+    assert df['datetime'].tolist() == [pd.Timestamp('2026-10-16 08:30:00'), pd.Timestamp('2026-10-15 10:05:12')]
+    assert (df['source'] == '同花顺').all()
+
+
+@pytest.mark.parametrize('parse', [parse_eastmoney, parse_sina, parse_xueqiu, parse_10jqka])
+@pytest.mark.parametrize('text', ['', '<html>502 Bad Gateway</html>', '{"error": "rate limited"}'])
+def test_unexpected_responses_parse_as_empty(parse, text):
+    assert parse(text).empty
@@ -0,0 +1,36 @@
+"""
+新闻情绪打分测试
+"""
+import pytest
+
+from news.sentiment import score_batch
+
+
+@pytest.mark.parametrize('title', [
+    '营收不断增长',
+    '业绩非常成功',
+    '无论市场如何，订单持续增长',
+    '无疑是重大利好',
+    '未来盈利有望改善',
+    '不仅扭亏还实现盈利'
+])
+def test_negation_characters_inside_ordinary_words_do_not_negate(title):
+    assert score_batch([title])['label'].iloc[0] == '利好'
+
+
+@pytest.mark.parametrize('title, expected', [
+    ('业绩不增长', '利空'),
+    ('未能盈利', '利空'),
+    ('并非亏损', '利好'),
+    ('公司否认存在风险', '利好'),
+    ('公司不再盈利', '利空')
+])
+def test_negation_words_flip_the_following_term(title, expected):
+    assert score_batch([title])['label'].iloc[0] == expected
+
+
+def test_batch_scores_follow_input_order():
+    scored = score_batch(['营收不断增长', '业绩非常成功', '业绩下滑'])
+
+    assert scored['score'].tolist() == [1.0, 1.0, -1.0]
+    assert scored['label'].tolist() == ['利好', '利好', '利空']
@@ -0,0 +1,96 @@
+"""
+请求限速工具
+
+用令牌桶控制对同一主机（或同一接口）的请求频率，代替固定的time.sleep：
+请求不频繁时不需要等待，只有超过速率时才等到下一个令牌。
+"""
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    令牌桶
+    """
+    def __init__(self, rate, capacity=1):
+        """
+        初始化令牌桶
+
+        Args:
+            rate (float): 每秒补充的令牌数
+            capacity (int): 桶容量，即允许的突发请求数
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """
+        预定一个令牌
+
+        Returns:
+            float: 需要等待的秒数
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # 令牌可以预支为负数，多个线程按预定顺序依次等待
+            self._tokens -= 1
+            return 0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self):
+        """
+        获取一个令牌，必要时阻塞等待
+
+        Returns:
+            float: 实际等待的秒数
+        """
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+
+class RateLimiter:
+    """
+    按键（如主机名）分别限速的限速器
+    """
+    def __init__(self, rate, capacity=1, limits=None):
+        """
+        初始化限速器
+
+        Args:
+            rate (float): 默认每秒请求数
+            capacity (int): 默认允许的突发请求数
+            limits (dict): 单独设置的限速 {键: (每秒请求数, 突发请求数)}
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.limits = dict(limits or {})
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, key):
+        """
+        获取键对应的令牌桶
+        """
+        with self._lock:
+            if key not in self._buckets:
+                rate, capacity = self.limits.get(key, (self.rate, self.capacity))
+                self._buckets[key] = TokenBucket(rate, capacity)
+            return self._buckets[key]
+
+    def acquire(self, key):
+        """
+        获取键对应的令牌，必要时阻塞等待
+
+        Args:
+            key (str): 限速键
+
+        Returns:
+            float: 实际等待的秒数
+        """
+        return self.bucket(key).acquire()
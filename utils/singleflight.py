@@ -0,0 +1,96 @@
+"""
+请求合并（single-flight）
+
+多个线程（包括Streamlit的不同会话）同时以相同参数调用同一个函数时，只有第一个调用真正执行，
+其余调用等待并共享它的结果或异常。调用结束后不保留结果，之后的调用重新执行，
+缓存交给调用方自己处理。
+"""
+import copy
+import functools
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """
+    请求合并组：同一个键同时只有一个调用在执行
+    """
+    def __init__(self):
+        # 进行中的调用 {键: Future}
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, *args, **kwargs):
+        """
+        执行调用，相同键的调用正在进行时等待其结果
+
+        Args:
+            key: 调用的键，需可哈希
+            func (function): 被调用的函数
+            *args: 函数参数
+            **kwargs: 函数参数
+
+        Returns:
+            tuple: (函数返回值, 是否共享了其他线程的调用结果)
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._calls[key] = future
+
+        if not owner:
+            return future.result(), True
+
+        try:
+            future.set_result(func(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+        return future.result(), False
+
+    def in_flight(self):
+        """
+        获取进行中的调用数
+        """
+        with self._lock:
+            return len(self._calls)
+
+
+# 进程内共用的请求合并组
+_default_group = SingleFlight()
+
+
+def singleflight(func=None, *, group=None, copy_result=True):
+    """
+    装饰器：按 (函数, 参数) 合并同时进行的相同调用
+
+    参数不可哈希时不合并，直接调用。
+
+    Args:
+        func (function): 被装饰的函数
+        group (SingleFlight): 请求合并组，默认使用进程内共用的组
+        copy_result (bool): 是否给共享结果的调用方返回深拷贝，避免修改互相影响
+
+    Returns:
+        function: 装饰后的函数
+    """
+    if func is None:
+        return functools.partial(singleflight, group=group, copy_result=copy_result)
+
+    name = f"{func.__module__}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        key = (name, args, tuple(sorted(kwargs.items())))
+        try:
+            hash(key)
+        except TypeError:
+            return func(*args, **kwargs)
+        result, shared = (group or _default_group).do(key, func, *args, **kwargs)
+        return copy.deepcopy(result) if shared and copy_result else result
+
+    return wrapper